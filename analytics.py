@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+
+"""Aggregate reports run on worker processes with read-only connections.
+
+    python3 analytics.py hires_per_chef --limit 20
+    python3 analytics.py all --workers 4 --snapshot
+    python3 analytics.py most_requested_cuisines --json
+
+Each report splits its table into id ranges. Worker processes aggregate the
+ranges over their own read-only connections (mode=ro), and the partial
+counts are summed in the parent. The interactive app's connection pool is
+never used. In WAL mode readers do not block the writer, and the workers run
+at a lower CPU priority, so hires and browsing keep their latency while a
+report runs.
+
+Without --snapshot, each range is read from the live database at a slightly
+different moment. With --snapshot the database is first copied with the
+SQLite backup API, and every worker reads that frozen copy (immutable=1, no
+locking at all).
+
+In sharded mode (see sharding.py) the hire reports read Chef_Hires from
+every shard and add the shards' counts together; chef names and recipes
+come from the catalog.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+import database
+import sharding
+
+# Worker processes per report run.
+WORKERS = int(os.environ.get("FORKS_AND_FOLKS_ANALYTICS_WORKERS", str(os.cpu_count() or 1)))
+
+# Id ranges per worker; more ranges even out skew between them.
+PARTITIONS_PER_WORKER = 4
+
+# Niceness added to worker processes so interactive requests get the CPU first.
+WORKER_NICENESS = int(os.environ.get("FORKS_AND_FOLKS_ANALYTICS_NICE", "10"))
+
+# Pages copied per backup step when taking a snapshot; the source is
+# released between steps so writers are not held up.
+SNAPSHOT_PAGES_PER_STEP = 4096
+
+# Most values bound in one IN (...) list when looking up labels.
+MAX_IN_PARAMS = 500
+
+# Tables whose rows live on the shards, not in the catalog, in sharded mode.
+SHARDED_TABLES = ("Chef_Hires",)
+
+# Each report aggregates `query` over one id range of `table`; the first
+# column is the group key and the rest are counts that add up across ranges.
+# `labels` optionally turns keys into names; `order` sorts the merged rows
+# by the first count ("count") or by the key ("key").
+REPORTS = {
+    "hires_per_chef": {
+        "table": "Chef_Hires",
+        "id_column": "hire_id",
+        "query": '''
+            SELECT chef_id, COUNT(*), SUM(response IS 'accept'), SUM(response IS 'decline'), SUM(response IS NULL)
+            FROM Chef_Hires WHERE hire_id BETWEEN ? AND ? GROUP BY chef_id
+        ''',
+        "columns": ("chef", "hires", "accepted", "declined", "pending"),
+        "labels": '''
+            SELECT Chefs.chef_id, Users.username FROM Chefs
+            INNER JOIN Users ON Users.user_id = Chefs.user_id WHERE Chefs.chef_id IN ({})
+        ''',
+        "order": "count",
+    },
+    "recipes_per_chef": {
+        "table": "Recipes",
+        "id_column": "recipe_id",
+        # Recipes.chef_id holds the author's user id.
+        "query": "SELECT chef_id, COUNT(*) FROM Recipes WHERE recipe_id BETWEEN ? AND ? GROUP BY chef_id",
+        "columns": ("chef", "recipes"),
+        "labels": "SELECT user_id, username FROM Users WHERE user_id IN ({})",
+        "order": "count",
+    },
+    "most_requested_cuisines": {
+        "table": "Chef_Hires",
+        "id_column": "hire_id",
+        "query": '''
+            SELECT Chef_Cuisines.cuisine, COUNT(*), SUM(Chef_Hires.response IS 'accept')
+            FROM Chef_Hires
+            INNER JOIN Chef_Cuisines ON Chef_Cuisines.chef_id = Chef_Hires.chef_id
+            WHERE Chef_Hires.hire_id BETWEEN ? AND ?
+            GROUP BY Chef_Cuisines.cuisine
+        ''',
+        "columns": ("cuisine", "hires", "accepted"),
+        "labels": None,
+        "order": "count",
+    },
+    "hires_per_month": {
+        "table": "Chef_Hires",
+        "id_column": "hire_id",
+        "query": '''
+            SELECT substr(hire_date, 1, 7), COUNT(*), SUM(response IS 'accept')
+            FROM Chef_Hires WHERE hire_id BETWEEN ? AND ? GROUP BY substr(hire_date, 1, 7)
+        ''',
+        "columns": ("month", "hires", "accepted"),
+        "labels": None,
+        "order": "key",
+    },
+}
+
+
+# Opens a connection that can only read the database.
+def connect_read_only(path, immutable=False):
+    """Returns a sqlite3 connection opened with mode=ro (and immutable=1 for snapshots)."""
+    uri = Path(path).resolve().as_uri() + "?mode=ro" + ("&immutable=1" if immutable else "")
+    conn = sqlite3.connect(uri, uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+# Copies the database to a file with the backup API, a few pages at a time.
+def snapshot_database(path, target):
+    """Writes a consistent copy of path to target and returns target."""
+    source = connect_read_only(path)
+    copy = sqlite3.connect(target)
+    try:
+        source.backup(copy, pages=SNAPSHOT_PAGES_PER_STEP, sleep=0.001)
+    finally:
+        copy.close()
+        source.close()
+    return target
+
+
+# Splits [low, high] into at most `count` contiguous ranges.
+def id_ranges(low, high, count):
+    """Returns [(first, last)] covering low..high inclusive."""
+    if low is None or high is None:
+        return []
+    count = max(1, min(count, high - low + 1))
+    step = (high - low + 1) / count
+    bounds = [low + round(step * i) for i in range(count)] + [high + 1]
+    return [(bounds[i], bounds[i + 1] - 1) for i in range(count) if bounds[i] < bounds[i + 1]]
+
+
+# Read-only connections of this worker, by database file, and how to open new ones.
+_worker_conns = {}
+_worker_immutable = False
+
+
+# Runs once in each worker process.
+def _init_worker(immutable, niceness):
+    global _worker_immutable
+    if niceness:
+        try:
+            os.nice(niceness)
+        except OSError:
+            pass
+    _worker_immutable = immutable
+
+
+# Aggregates one id range of one database file; runs in a worker process.
+def _aggregate_range(task):
+    """Returns (report name, [(key, count, ...)]) for one range."""
+    name, source, first, last = task
+    conn = _worker_conns.get(source)
+    if conn is None:
+        conn = _worker_conns[source] = connect_read_only(source, _worker_immutable)
+    return name, conn.execute(REPORTS[name]["query"], (first, last)).fetchall()
+
+
+# Closes the connections opened by _aggregate_range() in this process.
+def _close_worker_conns():
+    for conn in _worker_conns.values():
+        conn.close()
+    _worker_conns.clear()
+
+
+# Adds partial counts into the running totals of a report.
+def _merge(totals, rows):
+    for key, *counts in rows:
+        current = totals.get(key)
+        totals[key] = [a + (b or 0) for a, b in zip(current, counts)] if current else [c or 0 for c in counts]
+
+
+# Replaces group keys with names where a report has a label query.
+def _label(conn, report, keys):
+    if not report["labels"] or not keys:
+        return {}
+    names = {}
+    keys = [key for key in keys if key is not None]
+    for start in range(0, len(keys), MAX_IN_PARAMS):
+        chunk = keys[start:start + MAX_IN_PARAMS]
+        query = report["labels"].format(", ".join("?" for _ in chunk))
+        names.update(conn.execute(query, chunk).fetchall())
+    return names
+
+
+# Runs several reports over one worker pool.
+def run_reports(names, path=None, workers=WORKERS, partitions=None, snapshot=False, limit=None):
+    """Returns {name: summary} for each report.
+
+    A summary holds the report's columns, its rows (best first, or by key for
+    time series), the number of id ranges it was split into and the seconds
+    the whole run took. With limit only the top rows are kept. workers=0
+    aggregates in the calling process instead of worker processes, which
+    starts faster but competes with anything else that process is doing.
+    Without path in sharded mode, hire reports cover every shard.
+    """
+    global _worker_immutable
+    for name in names:
+        if name not in REPORTS:
+            raise ValueError(f"Unknown report {name!r}; choose from {', '.join(sorted(REPORTS))}.")
+    sharded = path is None and sharding.enabled()
+    path = path or database.DATABASE_PATH
+    shards = sharding.shard_paths() if sharded else []
+    for source in [path] + shards:
+        if not os.path.exists(source):
+            raise ValueError(f"No database at {source}.")
+    start = time.perf_counter()
+    workers = max(0, workers)
+    partitions = partitions or max(1, workers) * PARTITIONS_PER_WORKER
+
+    with tempfile.TemporaryDirectory() as directory:
+        sources = {}
+        for index, original in enumerate([path] + shards):
+            sources[original] = (snapshot_database(original, os.path.join(directory, f"snapshot-{index}.db"))
+                                 if snapshot else original)
+        catalog = sources[path]
+        conn = connect_read_only(catalog, immutable=snapshot)
+        try:
+            tasks, ranges = [], {}
+            for name in names:
+                report = REPORTS[name]
+                ranges[name] = 0
+                on_shards = sharded and report["table"] in SHARDED_TABLES
+                for source in ([sources[shard] for shard in shards] if on_shards else [catalog]):
+                    source_conn = conn if source == catalog else connect_read_only(source, immutable=snapshot)
+                    try:
+                        low, high = source_conn.execute(
+                            f"SELECT MIN({report['id_column']}), MAX({report['id_column']}) FROM {report['table']}"
+                        ).fetchone()
+                    finally:
+                        if source_conn is not conn:
+                            source_conn.close()
+                    source_ranges = id_ranges(low, high, partitions)
+                    ranges[name] += len(source_ranges)
+                    tasks.extend((name, source, first, last) for first, last in source_ranges)
+
+            totals = {name: {} for name in names}
+            if workers == 0 or not tasks:
+                _worker_immutable = snapshot
+                try:
+                    for task in tasks:
+                        name, rows = _aggregate_range(task)
+                        _merge(totals[name], rows)
+                finally:
+                    _close_worker_conns()
+            else:
+                with multiprocessing.Pool(workers, _init_worker, (snapshot, WORKER_NICENESS)) as pool:
+                    for name, rows in pool.imap_unordered(_aggregate_range, tasks):
+                        _merge(totals[name], rows)
+
+            results = {}
+            for name in names:
+                report = REPORTS[name]
+                if report["order"] == "key":
+                    keys = sorted(totals[name], key=lambda key: (key is None, key))
+                else:
+                    keys = sorted(totals[name], key=lambda key: (-totals[name][key][0], str(key)))
+                keys = keys[:limit] if limit else keys
+                labels = _label(conn, report, keys)
+                results[name] = {
+                    "columns": report["columns"],
+                    "rows": [(labels.get(key, key), *totals[name][key]) for key in keys],
+                    "partitions": ranges[name],
+                }
+        finally:
+            conn.close()
+
+    seconds = time.perf_counter() - start
+    for summary in results.values():
+        summary["workers"] = workers
+        summary["seconds"] = seconds
+    return results
+
+
+# Runs one report.
+def run_report(name, path=None, workers=WORKERS, partitions=None, snapshot=False, limit=None):
+    """Returns the summary dict described in run_reports()."""
+    return run_reports([name], path, workers, partitions, snapshot, limit)[name]
+
+
+# Prints a report as an aligned table.
+def print_report(name, summary):
+    columns = summary["columns"]
+    rows = [[str(value) for value in row] for row in summary["rows"]]
+    widths = [max([len(column)] + [len(row[i]) for row in rows]) for i, column in enumerate(columns)]
+    print(f"\n{name} ({len(rows)} rows, {summary['partitions']} ranges on {summary['workers']} workers, "
+          f"{summary['seconds']:.2f}s)")
+    print("  ".join(column.ljust(width) if i == 0 else column.rjust(width) for i, (column, width) in enumerate(zip(columns, widths))))
+    for row in rows:
+        print("  ".join(value.ljust(width) if i == 0 else value.rjust(width) for i, (value, width) in enumerate(zip(row, widths))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run aggregate reports on read-only worker processes.")
+    parser.add_argument("report", choices=sorted(REPORTS) + ["all"])
+    parser.add_argument("--db", help=f"database file (default: {database.DATABASE_PATH})")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="worker processes; 0 runs in this process")
+    parser.add_argument("--partitions", type=int, help=f"id ranges per report (default: {PARTITIONS_PER_WORKER} per worker)")
+    parser.add_argument("--snapshot", action="store_true", help="report on a consistent copy taken with the backup API")
+    parser.add_argument("--limit", type=int, help="show only the top rows")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+    names = sorted(REPORTS) if args.report == "all" else [args.report]
+    try:
+        results = run_reports(names, args.db, args.workers, args.partitions, args.snapshot, args.limit)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        return 2
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name in names:
+            print_report(name, results[name])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
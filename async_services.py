@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+"""asyncio wrappers around services.py.
+
+SQLite calls and password hashing block, so each operation runs on a
+thread pool and the event loop stays free to serve other clients. Login
+looks the user up on the database pool and checks the password on the
+passwords.py verification pool, so slow hashes never hold a database
+worker while hires queue behind them. Given a
+write_queue.WriteQueue, hires and responses go through it instead and are
+committed in batches.
+"""
+
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import services
+from database import POOL_SIZE
+from passwords import dummy_verify_async, needs_rehash, verify_password_async
+
+# Threads running database work; more than the pool size would only queue
+# on connection checkout.
+DB_WORKERS = int(os.environ.get("FORKS_AND_FOLKS_DB_WORKERS", str(POOL_SIZE)))
+
+
+# Runs the blocking service calls on a worker pool for asyncio callers.
+class AsyncHiringService:
+    """Awaitable versions of the login and hiring operations."""
+
+    def __init__(self, workers=DB_WORKERS, write_queue=None):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self.write_queue = write_queue
+
+    async def _run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+    async def login(self, username, password):
+        """Returns a services.Session, or None if the credentials are wrong."""
+        credentials = await self._run(services.find_credentials, username)
+        if credentials is None:
+            # Spend the same time as a real check so unknown usernames are not revealed.
+            await asyncio.wrap_future(dummy_verify_async(password))
+            return None
+        if not await asyncio.wrap_future(verify_password_async(credentials.password, password)):
+            return None
+        if needs_rehash(credentials.password):
+            await self._run(services.upgrade_password_hash, credentials.user_id, credentials.password, password)
+        return credentials.session()
+
+    async def list_chefs(self, after=None, before=None):
+        """Returns ([(chef_id, username, portfolio_details)], has_more)."""
+        return await self._run(services.fetch_chef_page, after=after, before=before)
+
+    async def recommend_chefs(self, cuisine=None, limit=10):
+        """Returns the top chefs as services.ChefRecommendation tuples."""
+        return await self._run(services.recommend_chefs, cuisine, limit)
+
+    async def hire_chef(self, consumer_id, chef_id):
+        """Returns the new hire_id, or None if there is no such chef."""
+        if self.write_queue:
+            return await asyncio.wrap_future(self.write_queue.hire_chef(consumer_id, chef_id))
+        return await self._run(services.hire_chef, consumer_id, chef_id)
+
+    async def hiring_status(self, consumer_id, after=None, before=None, status=None):
+        """Returns ([(hire_id, chef_name, response, message, hire_date)], has_more)."""
+        return await self._run(services.fetch_hire_status_page, consumer_id, after=after, before=before, status=status)
+
+    async def notifications(self, chef_id, after=None, before=None, status=None):
+        """Returns ([(hire_id, consumer_name, hire_date, response)], has_more)."""
+        return await self._run(services.fetch_notification_page, chef_id, after=after, before=before, status=status)
+
+    async def check_inbox(self, session, mark_seen=True):
+        """Returns the hires or answers the user has not seen yet."""
+        return await self._run(services.check_inbox, session, mark_seen)
+
+    async def respond_to_hire(self, hire_id, response, message, chef_id=None):
+        """Returns True if the hire was updated."""
+        if self.write_queue:
+            return await asyncio.wrap_future(self.write_queue.respond_to_hire(hire_id, response, message, chef_id))
+        return await self._run(services.respond_to_hire, hire_id, response, message, chef_id)
+
+    def close(self):
+        """Waits for running operations and stops the worker threads."""
+        self._executor.shutdown(wait=True)
+        if self.write_queue:
+            self.write_queue.close()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""Report run time per worker count, and interactive latency during reports.
+
+Generates synthetic data, then for each worker count runs every analytics
+report while a foreground thread keeps browsing recipes and hiring chefs.
+Reports the run time of the reports and the foreground p50/p95 latency,
+next to the foreground latency with no report running.
+
+    python3 -m benchmarks.analytics_reports --scale 100k --workers 1,2,4
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import services
+import analytics
+import synthetic_data
+
+
+# Browses and hires until stop is set; returns the latency of each round.
+def foreground(data, stop, seconds=None):
+    """Runs browse + hire rounds and returns their durations in seconds."""
+    rng = random.Random(7)
+    chef_ids = range(*data["chef_ids"])
+    consumer_ids = range(*data["consumer_ids"])
+    samples = []
+    deadline = time.perf_counter() + seconds if seconds else None
+    while not stop.is_set() and (deadline is None or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        services.fetch_recipe_page.uncached(after=rng.randrange(data["counts"]["recipes"]))
+        services.hire_chef(rng.choice(consumer_ids), rng.choice(chef_ids))
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+# p50 and p95 of a list of durations, in milliseconds.
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0, 0.0
+    return (ordered[len(ordered) // 2] * 1000, ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(synthetic_data.SCALES), default="100k")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--snapshot", action="store_true", help="run the reports on a backup-API snapshot")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    worker_counts = [int(count) for count in args.workers.split(",")]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "analytics.db")
+        data = synthetic_data.generate(path, args.scale, args.seed)
+        database.set_database_path(path)
+        print(f"{os.cpu_count()} CPUs; {data['counts']['hires']} hires, {data['counts']['recipes']} recipes")
+
+        idle = foreground(data, threading.Event(), seconds=2)
+        p50, p95 = percentiles(idle)
+        print(f"\n{'workers':>8}{'report s':>10}{'fg p50 ms':>11}{'fg p95 ms':>11}{'fg rounds':>11}")
+        print(f"{'idle':>8}{'-':>10}{p50:>11.3f}{p95:>11.3f}{len(idle):>11}")
+
+        for workers in worker_counts:
+            stop = threading.Event()
+            samples = []
+            thread = threading.Thread(target=lambda: samples.extend(foreground(data, stop)))
+            thread.start()
+            try:
+                start = time.perf_counter()
+                analytics.run_reports(sorted(analytics.REPORTS), path, workers=workers, snapshot=args.snapshot)
+                seconds = time.perf_counter() - start
+            finally:
+                stop.set()
+                thread.join()
+            p50, p95 = percentiles(samples)
+            print(f"{workers:>8}{seconds:>10.2f}{p50:>11.3f}{p95:>11.3f}{len(samples):>11}")
+        database.close_all_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+"""Read throughput while a writer keeps responding to hires.
+
+Runs the view_hiring_status query from several reader threads while one
+writer thread inserts hires and sends responses, once per storage profile,
+and reports reads/second, writes/second and lock errors for each.
+
+    python3 -m benchmarks.concurrent_reads --readers 8 --seconds 5
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import sqlite3
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ConnectionPool, storage_profile, execute_query, fetch_all, transaction
+
+CONSUMERS = 200
+CHEFS = 50
+
+READ_QUERY = '''
+    SELECT Chef_Hires.hire_id, Users.username AS chef_name, Chef_Hires.response, Chef_Hires.message, Chef_Hires.hire_date
+    FROM Chef_Hires
+    INNER JOIN Users ON Chef_Hires.chef_id = Users.user_id
+    WHERE Chef_Hires.consumer_id = ?
+'''
+
+
+# Builds a small database with users and a backlog of hires.
+def seed(pool, hires):
+    """Creates the tables the benchmark touches and fills them."""
+    with pool.acquire() as conn, transaction(conn):
+        conn.execute('''
+            CREATE TABLE Users (
+                user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL UNIQUE,
+                password TEXT NOT NULL,
+                role TEXT NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE Chef_Hires (
+                hire_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chef_id INTEGER,
+                consumer_id INTEGER,
+                hire_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+                response TEXT,
+                message TEXT
+            )
+        ''')
+        conn.executemany(
+            "INSERT INTO Users (username, password, role) VALUES (?, 'x', ?)",
+            [(f"user{i}", "Chef" if i <= CHEFS else "Consumer") for i in range(1, CHEFS + CONSUMERS + 1)],
+        )
+        rng = random.Random(7)
+        conn.executemany(
+            "INSERT INTO Chef_Hires (chef_id, consumer_id) VALUES (?, ?)",
+            [(rng.randint(1, CHEFS), rng.randint(CHEFS + 1, CHEFS + CONSUMERS)) for _ in range(hires)],
+        )
+
+
+# Runs readers and one writer against a fresh database for one profile.
+def run_profile(name, readers, seconds, hires, directory):
+    """Returns throughput figures for one storage profile."""
+    path = os.path.join(directory, f"{name}.db")
+    pool = ConnectionPool(path, max_size=readers + 1, profile=storage_profile(name))
+    seed(pool, hires)
+
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+    lock = threading.Lock()
+
+    def reader(seed_value):
+        rng = random.Random(seed_value)
+        reads = errors = 0
+        conn = pool.acquire()
+        while not stop.is_set():
+            try:
+                cursor = conn.execute(READ_QUERY, (rng.randint(CHEFS + 1, CHEFS + CONSUMERS),))
+                fetch_all(cursor)
+                reads += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        conn.close()
+        with lock:
+            counts["reads"] += reads
+            counts["read_errors"] += errors
+
+    def writer():
+        rng = random.Random(99)
+        writes = errors = 0
+        conn = pool.acquire()
+        while not stop.is_set():
+            try:
+                with transaction(conn):
+                    execute_query(conn, "INSERT INTO Chef_Hires (chef_id, consumer_id) VALUES (?, ?)",
+                                  (rng.randint(1, CHEFS), rng.randint(CHEFS + 1, CHEFS + CONSUMERS)))
+                with transaction(conn):
+                    execute_query(conn, "UPDATE Chef_Hires SET response = 'accept', message = 'See you soon' WHERE hire_id = ?",
+                                  (rng.randint(1, hires),))
+                writes += 2
+            except sqlite3.OperationalError:
+                errors += 1
+        conn.close()
+        with lock:
+            counts["writes"] += writes
+            counts["write_errors"] += errors
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    pool_stats = pool.stats()
+    pool.close()
+
+    return {
+        "profile": name,
+        "reads_per_sec": counts["reads"] / seconds,
+        "writes_per_sec": counts["writes"] / seconds,
+        "read_errors": counts["read_errors"],
+        "write_errors": counts["write_errors"],
+        "busy_retries": pool_stats["busy_retries"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--hires", type=int, default=20000)
+    parser.add_argument("--profiles", nargs="+", default=["legacy", "concurrent", "durable"])
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'profile':<12}{'reads/s':>12}{'writes/s':>12}{'read err':>10}{'write err':>11}{'retries':>9}")
+        for name in args.profiles:
+            result = run_profile(name, args.readers, args.seconds, args.hires, directory)
+            print(f"{result['profile']:<12}{result['reads_per_sec']:>12.0f}{result['writes_per_sec']:>12.0f}"
+                  f"{result['read_errors']:>10}{result['write_errors']:>11}{result['busy_retries']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+"""Hire submissions and responses per second through the asyncio hire server.
+
+Starts hire_server.py on a scratch database, then for each concurrency
+level connects that many consumer clients, which keep submitting hires,
+and a fifth as many chef clients, which poll their inbox and accept
+every new hire. Reports throughput and request latency.
+
+    python3 -m benchmarks.hire_load --clients 1,10,50 --seconds 5
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database
+import migrations
+from database import transaction
+from passwords import hash_password
+
+CHEFS = 50
+CONSUMERS = 500
+
+
+# Adds chefs and consumers that all share one password.
+def seed(password):
+    """Creates the users; returns (chef names, consumer names, {chef name: chef_id})."""
+    # One hash at the current settings, reused, so logins do not trigger rehashing.
+    hashed = hash_password(password)
+    chefs = [f"chef{i}" for i in range(CHEFS)]
+    consumers = [f"consumer{i}" for i in range(CONSUMERS)]
+    with transaction() as conn:
+        conn.executemany("INSERT INTO Users (username, password, role) VALUES (?, ?, 'Chef')",
+                         [(name, hashed) for name in chefs])
+        conn.executemany("INSERT INTO Users (username, password, role) VALUES (?, ?, 'Consumer')",
+                         [(name, hashed) for name in consumers])
+        conn.executemany('''
+            INSERT INTO Chefs (user_id, portfolio_details)
+            SELECT user_id, 'Benchmark chef' FROM Users WHERE username = ?
+        ''', [(name,) for name in chefs])
+        chef_ids = dict(conn.execute('''
+            SELECT Users.username, Chefs.chef_id FROM Chefs
+            INNER JOIN Users ON Chefs.user_id = Users.user_id
+        '''))
+    return chefs, consumers, chef_ids
+
+
+# A connected protocol client.
+class Client:
+    """Sends one JSON request at a time and records its latency."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.latencies = []
+
+    @classmethod
+    async def connect(cls, port, username, password):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        client = cls(reader, writer)
+        reply = await client.request(op="login", username=username, password=password)
+        if not reply["ok"]:
+            raise RuntimeError(reply["error"])
+        client.latencies.clear()
+        return client
+
+    async def request(self, **fields):
+        start = time.perf_counter()
+        self.writer.write(json.dumps(fields).encode() + b"\n")
+        await self.writer.drain()
+        reply = json.loads(await self.reader.readline())
+        self.latencies.append(time.perf_counter() - start)
+        return reply
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+# Submits hires until the deadline.
+async def consumer_loop(client, chef_ids, deadline, rng):
+    hires = 0
+    while time.perf_counter() < deadline:
+        reply = await client.request(op="hire", chef_id=rng.choice(chef_ids))
+        hires += reply["ok"]
+    return hires
+
+
+# Accepts new hires, read from the chef's inbox, until the deadline.
+async def chef_loop(client, deadline):
+    responses = 0
+    while time.perf_counter() < deadline:
+        reply = await client.request(op="inbox")
+        if not reply["items"]:
+            await asyncio.sleep(0.01)
+            continue
+        for hire_id, *_ in reply["items"]:
+            answer = await client.request(op="respond", hire_id=hire_id, response="accept", message="See you then")
+            responses += answer["ok"]
+    return responses
+
+
+# Runs one concurrency level against the server.
+async def run_level(port, consumers, chefs, chef_ids, password, seconds):
+    """Returns (hires/s, responses/s, p50 ms, p99 ms)."""
+    rng = random.Random(len(consumers))
+    consumer_clients = await asyncio.gather(*(Client.connect(port, name, password) for name in consumers))
+    chef_clients = await asyncio.gather(*(Client.connect(port, name, password) for name in chefs))
+    deadline = time.perf_counter() + seconds
+    results = await asyncio.gather(
+        *(consumer_loop(client, chef_ids, deadline, rng) for client in consumer_clients),
+        *(chef_loop(client, deadline) for client in chef_clients),
+    )
+    clients = consumer_clients + chef_clients
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    for client in clients:
+        await client.close()
+    hires = sum(results[:len(consumer_clients)])
+    responses = sum(results[len(consumer_clients):])
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+    return hires / seconds, responses / seconds, p50, p99
+
+
+# Picks a port nobody is listening on.
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", default="1,10,50", help="comma-separated consumer counts")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args(argv)
+    levels = [int(level) for level in args.clients.split(",")]
+    password = "correct horse battery staple"
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        database.set_database_path(path)
+        migrations.migrate()
+        chefs, consumers, chef_ids = seed(password)
+        database.close_all_pools()
+
+        port = free_port()
+        env = dict(os.environ, FORKS_AND_FOLKS_DB=path)
+        server = subprocess.Popen([sys.executable, "-u", os.path.join(ROOT, "hire_server.py"), "--port", str(port)],
+                                  env=env, stdout=subprocess.PIPE, text=True)
+        try:
+            server.stdout.readline()
+            print(f"{'consumers':>10}{'chefs':>7}{'hires/s':>10}{'responses/s':>13}{'p50 ms':>9}{'p99 ms':>9}")
+            for level in levels:
+                chef_count = max(1, level // 5)
+                # Consumers only hire the chefs that are online to answer.
+                online = chefs[:chef_count]
+                result = asyncio.run(run_level(port, consumers[:level], online, [chef_ids[name] for name in online],
+                                               password, args.seconds))
+                print(f"{level:>10}{chef_count:>7}{result[0]:>10.1f}{result[1]:>13.1f}{result[2]:>9.2f}{result[3]:>9.2f}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""Ingredient search latency on a large synthetic catalog.
+
+Builds a catalog of recipes whose ingredients follow a skewed popularity
+curve, runs the Recipe_Ingredients migration, then times the all/any and
+pantry searches against the in-memory inverted index.
+
+    python3 -m benchmarks.ingredient_search --recipes 100000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import migrations
+import ingredient_search
+from database import transaction
+
+
+# Inserts synthetic recipes drawing ingredients from a Zipf-like vocabulary.
+def build_catalog(recipes, vocabulary, seed=11):
+    """Fills Recipes and returns the vocabulary used."""
+    rng = random.Random(seed)
+    names = [f"ingredient {i}" for i in range(vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    rows = (
+        (f"Recipe {i}", ", ".join(set(rng.choices(names, weights, k=rng.randint(5, 12)))), 3)
+        for i in range(recipes)
+    )
+    with transaction() as conn:
+        conn.executemany("INSERT INTO Recipes (recipe_name, ingredients, chef_id) VALUES (?, ?, ?)", rows)
+    return names
+
+
+# Mean and worst latency of a search over several random inputs.
+def measure(search, inputs):
+    """Returns (mean_ms, max_ms) of search(x) for every x in inputs."""
+    timings = []
+    for value in inputs:
+        start = time.perf_counter()
+        search(value)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sum(timings) / len(timings), max(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        database.set_database_path(os.path.join(directory, "bench.db"))
+        migrations.migrate(target=2)
+        names = build_catalog(args.recipes, args.vocabulary)
+
+        start = time.perf_counter()
+        migrations.migrate()
+        print(f"Backfill of {args.recipes} recipes: {time.perf_counter() - start:.2f} s")
+
+        start = time.perf_counter()
+        ingredient_search.get_ingredient_index()
+        print(f"Index load: {time.perf_counter() - start:.2f} s")
+
+        rng = random.Random(5)
+        # Pick from the popular half of the vocabulary so searches hit real work.
+        pairs = [rng.sample(names[:args.vocabulary // 2], 2) for _ in range(args.queries)]
+        triples = [rng.sample(names[:args.vocabulary // 2], 3) for _ in range(args.queries)]
+        pantries = [rng.sample(names, 15) for _ in range(args.queries)]
+
+        print(f"{'search':<34}{'mean':>10}{'max':>10}")
+        for label, search, inputs in [
+            ("all of 2 ingredients", lambda x: ingredient_search.find_recipes_by_ingredients(x, "all"), pairs),
+            ("any of 3 ingredients", lambda x: ingredient_search.find_recipes_by_ingredients(x, "any"), triples),
+            ("pantry of 15 ingredients", ingredient_search.recipes_from_pantry, pantries),
+            ("index lookup only (all of 2)", lambda x: ingredient_search.get_ingredient_index().recipes_with_all(x), pairs),
+        ]:
+            mean, worst = measure(search, inputs)
+            print(f"{label:<34}{mean:>8.3f}ms{worst:>8.3f}ms")
+        database.close_all_pools()
+
+
+if __name__ == "__main__":
+    main()
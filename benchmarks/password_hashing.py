@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""Logins per second at each password-hashing cost setting.
+
+For every setting, verifies a batch of passwords one after another (what a
+single blocking login loop can do) and then through the verification
+thread pool (what a burst of concurrent logins gets).
+
+    python3 -m benchmarks.password_hashing --logins 64
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import passwords
+
+SETTINGS = [
+    ("sha256 (legacy)", None, {}),
+    ("pbkdf2 100k", "pbkdf2_sha256", {"iterations": 100000}),
+    ("pbkdf2 600k", "pbkdf2_sha256", {"iterations": 600000}),
+    ("scrypt n=2^12", "scrypt", {"n": 2 ** 12}),
+    ("scrypt n=2^14", "scrypt", {"n": 2 ** 14}),
+    ("scrypt n=2^15", "scrypt", {"n": 2 ** 15}),
+]
+
+
+# Logins per second for a batch of verifications.
+def logins_per_second(stored, count, executor=None):
+    """Verifies `count` passwords serially, or on the executor if given."""
+    start = time.perf_counter()
+    if executor is None:
+        for _ in range(count):
+            passwords.verify_password(stored, "correct horse battery staple")
+    else:
+        futures = [executor.submit(passwords.verify_password, stored, "correct horse battery staple")
+                   for _ in range(count)]
+        for future in futures:
+            future.result()
+    return count / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=passwords.VERIFY_WORKERS)
+    args = parser.parse_args(argv)
+
+    print(f"{args.logins} logins per setting, {args.workers} verification workers")
+    print(f"{'setting':<18}{'serial/s':>12}{'pooled/s':>12}{'ms/login':>10}")
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for label, scheme, cost in SETTINGS:
+            if scheme is None:
+                stored = hashlib.sha256(b"correct horse battery staple").hexdigest()
+                count = args.logins * 1000
+            else:
+                stored = passwords.hash_password("correct horse battery staple", scheme=scheme, **cost)
+                count = args.logins
+            serial = logins_per_second(stored, count)
+            pooled = logins_per_second(stored, count, executor)
+            print(f"{label:<18}{serial:>12.1f}{pooled:>12.1f}{1000 / serial:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+"""Database size and recipe list/detail query time before and after compressed instructions.
+
+Builds a catalog at schema version 7, where instruction text sits in the
+Recipes table, measures it, then applies the later migrations (which move
+the text to the zlib-compressed Recipe_Instructions table) to a copy and
+measures again. Both files are vacuumed first, so sizes compare fairly.
+Queries run on plain connections with SQLite's default 2 MB page cache.
+
+    python3 -m benchmarks.recipe_storage --recipes 100000 --steps 20
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import migrations
+import synthetic_data
+from database import fetch_page, transaction
+from recipe_storage import unpack_instructions
+
+# Schema version that still stores Recipes.instructions.
+ROW_STORAGE_VERSION = 7
+
+# The recipe detail query of each layout; the compact one also needs unpacking.
+DETAIL_QUERIES = {
+    "row": "SELECT recipe_name, ingredients, instructions FROM Recipes WHERE recipe_id = ?",
+    "compact": '''
+        SELECT Recipes.recipe_name, Recipes.ingredients, Recipe_Instructions.body
+        FROM Recipes
+        LEFT JOIN Recipe_Instructions ON Recipe_Instructions.recipe_id = Recipes.recipe_id
+        WHERE Recipes.recipe_id = ?
+    ''',
+}
+
+
+# Fills Recipes at schema version 7 with recipes of `steps` instruction lines.
+def build_catalog(path, recipes, steps, seed):
+    """Returns the recipe ids written."""
+    rng = random.Random(seed)
+    migrations.migrate(path, target=ROW_STORAGE_VERSION)
+    names = [synthetic_data.ingredient_name(i) for i in range(1000)]
+
+    def rows():
+        for i in range(recipes):
+            chosen = rng.sample(names, rng.randint(3, 8))
+            lines = [rng.choice(synthetic_data.STEPS).format(a=rng.choice(chosen), b=rng.choice(chosen),
+                                                             n=rng.randint(5, 90), t=rng.choice((160, 180, 200)))
+                     for _ in range(steps)]
+            instructions = "\n".join(f"{n}. {line}" for n, line in enumerate(lines, 1))
+            yield f"Benchmark recipe {i}", ", ".join(chosen), instructions, None
+
+    conn = database.create_connection(path)
+    try:
+        with transaction(conn):
+            conn.executemany("INSERT INTO Recipes (recipe_name, ingredients, instructions, chef_id) VALUES (?, ?, ?, ?)",
+                             rows())
+        return [row[0] for row in conn.execute("SELECT recipe_id FROM Recipes")]
+    finally:
+        database.close_connection(conn)
+
+
+# File size and the space used by the tables that hold recipe text.
+def measure_size(path):
+    """Returns (file MB, {table: MB})."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("VACUUM")
+        tables = dict(conn.execute('''
+            SELECT name, SUM(pgsize) / 1048576.0 FROM dbstat
+            WHERE name IN ('Recipes', 'Recipe_Instructions', 'Recipe_Search_content', 'Recipe_Search_data')
+            GROUP BY name
+        '''))
+    finally:
+        conn.close()
+    return os.path.getsize(path) / 1048576, tables
+
+
+# Times a full scan of the list view, paging through every recipe name, and detail lookups.
+def measure_queries(path, layout, recipe_ids, details, seed):
+    """Returns (full list scan ms, mean ms per list page, mean ms per detail view)."""
+    conn = sqlite3.connect(path)
+    try:
+        start = time.perf_counter()
+        conn.execute("SELECT recipe_id, recipe_name FROM Recipes ORDER BY recipe_id").fetchall()
+        scan = (time.perf_counter() - start) * 1000
+
+        pages, after = 0, None
+        start = time.perf_counter()
+        while True:
+            rows, has_more = fetch_page(conn, "SELECT recipe_id, recipe_name FROM Recipes", "recipe_id", after=after)
+            pages += 1
+            if not has_more:
+                break
+            after = rows[-1][0]
+        page = (time.perf_counter() - start) * 1000 / pages
+
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        for _ in range(details):
+            name, ingredients, instructions = conn.execute(DETAIL_QUERIES[layout], (rng.choice(recipe_ids),)).fetchone()
+            if layout == "compact":
+                instructions = unpack_instructions(instructions)
+        detail = (time.perf_counter() - start) * 1000 / details
+    finally:
+        conn.close()
+    return scan, page, detail
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=50000)
+    parser.add_argument("--steps", type=int, default=20, help="instruction lines per recipe")
+    parser.add_argument("--details", type=int, default=2000, help="detail views to time")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        before = os.path.join(directory, "row.db")
+        after = os.path.join(directory, "compact.db")
+        recipe_ids = build_catalog(before, args.recipes, args.steps, args.seed)
+        database.close_all_pools()
+        shutil.copyfile(before, after)
+        start = time.perf_counter()
+        migrations.migrate(after)
+        migration_seconds = time.perf_counter() - start
+        database.close_all_pools()
+
+        print(f"{args.recipes} recipes, {args.steps} instruction lines each; migration took {migration_seconds:.2f}s")
+        print(f"\n{'layout':>8}{'file MB':>9}{'Recipes':>9}{'instr.':>8}{'fts':>7}"
+              f"{'scan ms':>9}{'page ms':>9}{'detail ms':>11}")
+        for layout, path in (("row", before), ("compact", after)):
+            size, tables = measure_size(path)
+            scan, page, detail = measure_queries(path, layout, recipe_ids, args.details, args.seed)
+            fts = tables.get("Recipe_Search_content", 0) + tables.get("Recipe_Search_data", 0)
+            print(f"{layout:>8}{size:>9.1f}{tables.get('Recipes', 0):>9.1f}{tables.get('Recipe_Instructions', 0):>8.1f}"
+                  f"{fts:>7.1f}{scan:>9.2f}{page:>9.3f}{detail:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+"""Headless latency and memory benchmarks of the menu actions at scale.
+
+For each scale, generates synthetic data (see synthetic_data.py) and runs
+the data operations behind login, browse_recipes, browse_ingredients,
+view_and_hire_chefs, view_hiring_status and view_hiring_notifications with
+random users and pages. Reports latency percentiles and the peak Python
+memory of each action, and saves everything as JSON so runs can be
+compared.
+
+    python3 -m benchmarks.run_benchmarks --scales 10k,100k
+    python3 -m benchmarks.run_benchmarks --scales 1m --data-dir ~/.cache/forks-bench
+    python3 -m benchmarks.run_benchmarks --compare benchmarks/results/run-20240101-120000.json
+
+List and detail reads bypass the in-process cache so they measure the
+database. Every run works on a fresh copy of the data, so the hires and
+responses it writes do not leak into the next run.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database
+import services
+import synthetic_data
+from migrations import migrate
+from ingredient_search import plan_shopping
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+# Latency summary of a list of durations in seconds.
+def summarize(samples):
+    """Returns mean, p50, p95, p99 and max in milliseconds."""
+    ordered = sorted(samples)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "iterations": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(percentile(0.50), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "p99_ms": round(percentile(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+# The menu actions, each as one call of the operations it runs.
+def scenarios(data, password, rng):
+    """Returns {name: callable} for a generated database."""
+    chef_ids = range(*data["chef_ids"])
+    chef_user_ids = range(*data["chef_user_ids"])
+    consumer_ids = range(*data["consumer_ids"])
+    consumers = len(consumer_ids)
+    recipes, ingredients = data["max_recipe_id"], data["max_ingredient_id"]
+
+    def consumer_session():
+        i = rng.randrange(consumers)
+        return services.Session(consumer_ids[i], synthetic_data.consumer_username(i), "Consumer")
+
+    def chef_session():
+        i = rng.randrange(len(chef_ids))
+        return services.Session(chef_user_ids[i], synthetic_data.chef_username(i), "Chef", chef_ids[i])
+
+    def login():
+        services.login(synthetic_data.consumer_username(rng.randrange(consumers)), password)
+
+    def browse_recipes():
+        rows, _ = services.fetch_recipe_page.uncached(after=rng.randrange(recipes))
+        if rows:
+            services.fetch_recipe.uncached(rng.choice(rows)[0])
+
+    def shopping_plan():
+        plan_shopping([rng.randrange(1, recipes + 1) for _ in range(3)])
+
+    def browse_ingredients():
+        services.fetch_ingredient_page.uncached(after=rng.randrange(ingredients))
+
+    def view_and_hire_chefs():
+        rows, _ = services.fetch_chef_page.uncached(after=rng.randrange(chef_ids.start - 1, chef_ids.stop))
+        if rows:
+            services.hire_chef(consumer_session().user_id, rng.choice(rows)[0])
+
+    def recommend_chefs():
+        services.recommend_chefs(rng.choice((None, "kenyan", "italian", "thai")))
+
+    def view_hiring_status():
+        session = consumer_session()
+        services.check_inbox(session, mark_seen=False)
+        services.fetch_hire_status_page(session.user_id)
+
+    def view_hiring_notifications():
+        session = chef_session()
+        services.check_inbox(session, mark_seen=False)
+        pending, _ = services.fetch_notification_page(session.chef_id, status="pending")
+        if pending:
+            services.respond_to_hire(pending[0][0], "accept", "See you then!", session.chef_id)
+
+    return {
+        "login": login,
+        "browse_recipes": browse_recipes,
+        "browse_ingredients": browse_ingredients,
+        "shopping_plan": shopping_plan,
+        "view_and_hire_chefs": view_and_hire_chefs,
+        "recommend_chefs": recommend_chefs,
+        "view_hiring_status": view_hiring_status,
+        "view_hiring_notifications": view_hiring_notifications,
+    }
+
+
+# Times one action and measures its peak Python allocations.
+def run_scenario(action, iterations, memory_iterations):
+    """Returns the latency summary plus peak traced memory in KiB."""
+    action()  # warm up connections and the page cache
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        action()
+        samples.append(time.perf_counter() - start)
+    result = summarize(samples)
+    # tracemalloc slows Python down several times, so memory is measured on
+    # a separate, shorter pass.
+    tracemalloc.start()
+    for _ in range(memory_iterations):
+        action()
+    result["peak_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    tracemalloc.stop()
+    return result
+
+
+# Generates (or reuses) the data for one scale and returns a working copy.
+def prepare_data(scale, seed, directory, data_dir):
+    """Returns (database path, generation summary)."""
+    template = os.path.join(data_dir or directory, f"synthetic-{scale}-seed{seed}.db")
+    summary_path = template + ".json"
+    if not (data_dir and os.path.exists(template) and os.path.exists(summary_path)):
+        for stale in (template, template + "-wal", template + "-shm"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        data = synthetic_data.generate(template, scale, seed)
+        with sqlite3.connect(template) as conn:
+            data["max_recipe_id"] = conn.execute("SELECT MAX(recipe_id) FROM Recipes").fetchone()[0]
+            data["max_ingredient_id"] = conn.execute("SELECT MAX(ingredient_id) FROM Ingredients").fetchone()[0]
+        database.close_all_pools()
+        with open(summary_path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+    with open(summary_path, encoding="utf-8") as file:
+        data = json.load(file)
+    working = os.path.join(directory, f"run-{scale}.db")
+    if working != template:
+        shutil.copyfile(template, working)
+    # Data kept from an older version of the app gets the current schema.
+    migrate(working)
+    return working, data
+
+
+# Describes the code and machine a run was made on.
+def run_metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "iterations": args.iterations,
+        "login_iterations": args.login_iterations,
+        "storage_profile": database.STORAGE_PROFILE,
+    }
+
+
+# Prints how each action's latency changed against an earlier run.
+def print_comparison(before, after):
+    print(f"\n{'scale':<6}{'action':<28}{'p50 before':>11}{'p50 after':>11}{'p95 before':>11}{'p95 after':>11}{'p95 x':>7}")
+    for scale, results in after["scales"].items():
+        old_scale = before.get("scales", {}).get(scale)
+        if not old_scale:
+            continue
+        for name, stats in results["scenarios"].items():
+            old = old_scale["scenarios"].get(name)
+            if not old:
+                continue
+            ratio = stats["p95_ms"] / old["p95_ms"] if old["p95_ms"] else float("inf")
+            print(f"{scale:<6}{name:<28}{old['p50_ms']:>11.3f}{stats['p50_ms']:>11.3f}"
+                  f"{old['p95_ms']:>11.3f}{stats['p95_ms']:>11.3f}{ratio:>7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="10k", help=f"comma-separated, from {', '.join(synthetic_data.SCALES)}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--login-iterations", type=int, default=20, help="logins are slow by design")
+    parser.add_argument("--memory-iterations", type=int, default=10)
+    parser.add_argument("--data-dir", help="keep generated databases here and reuse them across runs")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/run-<time>.json)")
+    parser.add_argument("--compare", help="an earlier results file to compare against")
+    args = parser.parse_args(argv)
+    scales = [scale.strip().lower() for scale in args.scales.split(",")]
+    for scale in scales:
+        if scale not in synthetic_data.SCALES:
+            parser.error(f"unknown scale {scale!r}")
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+
+    results = {"meta": run_metadata(args), "scales": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in scales:
+            start = time.perf_counter()
+            path, data = prepare_data(scale, args.seed, directory, args.data_dir)
+            prepare_seconds = time.perf_counter() - start
+            database.set_database_path(path)
+            rng = random.Random(args.seed)
+            print(f"\nScale {scale}: " + ", ".join(f"{value} {name}" for name, value in data["counts"].items())
+                  + f" (ready in {prepare_seconds:.1f}s, {os.path.getsize(path) / 2 ** 20:.1f} MiB)")
+            print(f"{'action':<28}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'peak KiB':>10}")
+            scale_results = {"counts": data["counts"], "generate_seconds": round(data["seconds"], 2),
+                             "db_bytes": os.path.getsize(path), "scenarios": {}}
+            for name, action in scenarios(data, synthetic_data.DEFAULT_PASSWORD, rng).items():
+                iterations = args.login_iterations if name == "login" else args.iterations
+                memory_iterations = min(args.memory_iterations, iterations)
+                stats = run_scenario(action, iterations, memory_iterations)
+                scale_results["scenarios"][name] = stats
+                print(f"{name:<28}{stats['mean_ms']:>9.3f}{stats['p50_ms']:>9.3f}{stats['p95_ms']:>9.3f}"
+                      f"{stats['p99_ms']:>9.3f}{stats['max_ms']:>9.3f}{stats['peak_kib']:>10.1f}")
+            database.close_all_pools()
+            results["scales"][scale] = scale_results
+    # ru_maxrss is reported in KiB on Linux.
+    results["meta"]["max_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    output = args.output or os.path.join(RESULTS_DIR, f"run-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"\nPeak process RSS {results['meta']['max_rss_kib'] / 1024:.1f} MiB. Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            print_comparison(json.load(file), results)
+
+
+if __name__ == "__main__":
+    main()
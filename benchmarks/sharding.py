@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+"""Hire throughput and hire-list latency on one database vs sharded files.
+
+Generates synthetic data once, then for each layout -- the single file,
+and that file converted by sharding.py into each requested shard count --
+runs client threads that hire chefs spread over the whole directory (one
+transaction per hire, no write queue), and afterwards times the reads that
+sharding turns into scatter-gather (a consumer's hire status page and
+chef recommendations) next to one that stays on a single shard (a chef's
+notification page).
+
+    python3 -m benchmarks.sharding --shards 2,4 --threads 8 --seconds 3 --profile durable
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import services
+import sharding
+import synthetic_data
+
+# Reads of each kind timed per layout.
+READS = 300
+
+
+# One client thread: hires random chefs until the deadline.
+def client(data, seed, deadline, samples):
+    """Appends the latency of each hire to samples."""
+    rng = random.Random(seed)
+    chef_ids = range(*data["chef_ids"])
+    consumer_ids = range(*data["consumer_ids"])
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        services.hire_chef(rng.choice(consumer_ids), rng.choice(chef_ids))
+        samples.append(time.perf_counter() - start)
+
+
+# Runs `threads` hiring clients for `seconds`.
+def run_hires(data, threads, seconds):
+    """Returns a list of per-hire durations in seconds."""
+    samples = []
+    deadline = time.perf_counter() + seconds
+    workers = [threading.Thread(target=client, args=(data, i, deadline, samples)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return samples
+
+
+# Mean latency of each read, in milliseconds.
+def time_reads(data, seed):
+    """Returns (status page ms, recommendations ms, notification page ms)."""
+    rng = random.Random(seed)
+    consumer_ids = range(*data["consumer_ids"])
+    chef_ids = range(*data["chef_ids"])
+    timings = []
+    for read in (lambda: services.fetch_hire_status_page(rng.choice(consumer_ids)),
+                 lambda: services.recommend_chefs(limit=10),
+                 lambda: services.fetch_notification_page(rng.choice(chef_ids))):
+        start = time.perf_counter()
+        for _ in range(READS):
+            read()
+        timings.append((time.perf_counter() - start) * 1000 / READS)
+    return timings
+
+
+# p50 and p95 of a list of durations, in milliseconds.
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0, 0.0
+    return (ordered[len(ordered) // 2] * 1000, ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(synthetic_data.SCALES), default="10k")
+    parser.add_argument("--shards", default="2,4", help="comma-separated shard counts")
+    parser.add_argument("--threads", type=int, default=8, help="hiring client threads")
+    parser.add_argument("--seconds", type=float, default=3.0, help="length of each hiring round")
+    parser.add_argument("--profile", choices=sorted(database.STORAGE_PROFILES), default=database.STORAGE_PROFILE)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    database.set_storage_profile(args.profile)
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source.db")
+        data = synthetic_data.generate(source, args.scale, args.seed)
+        layouts = [(1, None)]
+        for count in (int(count) for count in args.shards.split(",")):
+            layouts.append((count, sharding.convert(source, os.path.join(directory, f"shards-{count}"), count)))
+        print(f"{args.profile} profile; {data['counts']['hires']} hires, {args.threads} hiring threads")
+        print(f"\n{'shards':>7}{'hires/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'status ms':>11}{'recommend ms':>14}{'notify ms':>11}")
+
+        for count, paths in layouts:
+            if paths is None:
+                sharding.configure(None)
+                database.set_database_path(source)
+            else:
+                sharding.configure(os.path.dirname(paths[0]))
+            samples = run_hires(data, args.threads, args.seconds)
+            p50, p95 = percentiles(samples)
+            status, recommend, notify = time_reads(data, args.seed)
+            print(f"{count:>7}{len(samples) / args.seconds:>9.0f}{p50:>9.3f}{p95:>9.3f}"
+                  f"{status:>11.3f}{recommend:>14.3f}{notify:>11.3f}")
+            database.close_all_pools()
+        sharding.configure(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""Time from launch until create_environment.py could show its first menu.
+
+Each run starts a new Python process that imports create_environment and
+calls create_database(), the work done before the first menu appears.
+Cases: a new database built by running every migration, a new database
+cloned from the template, and an existing, up-to-date database. The
+in-process time of create_database() is reported next to the whole
+process time, which also includes interpreter start and imports.
+
+    python3 -m benchmarks.startup --runs 10
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database
+import migrations
+
+# Runs in the child process; prints how long imports and create_database() took.
+CHILD = '''
+import json, time
+start = time.perf_counter()
+import create_environment
+imported = time.perf_counter()
+create_environment.create_database()
+done = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "create_ms": (done - imported) * 1000}))
+'''
+
+
+# Launches one child process against a database and a template.
+def launch(path, template):
+    """Returns (process ms, import ms, create_database ms)."""
+    env = dict(os.environ, FORKS_AND_FOLKS_DB=path, FORKS_AND_FOLKS_TEMPLATE_DB=template,
+               PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    total = (time.perf_counter() - start) * 1000
+    timings = json.loads(output.strip().splitlines()[-1])
+    return total, timings["import_ms"], timings["create_ms"]
+
+
+# Removes a database file and its WAL companions.
+def remove_database(path):
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+# Median of each column of a list of timing tuples.
+def medians(samples):
+    return [sorted(column)[len(column) // 2] for column in zip(*samples)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="launches per case")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "app.db")
+        template = os.path.join(directory, "template.db")
+        start = time.perf_counter()
+        migrations.build_template(template)
+        database.close_all_pools()
+        print(f"Template built in {(time.perf_counter() - start) * 1000:.0f} ms "
+              f"({os.path.getsize(template) / 1024:.0f} KiB, fingerprint {migrations.SCHEMA_FINGERPRINT})")
+
+        cases = {
+            "new, migrations": lambda: launch(path, os.path.join(directory, "no-template.db")),
+            "new, template": lambda: launch(path, template),
+            "existing": lambda: launch(path, template),
+        }
+        print(f"\n{'case':<18}{'process ms':>12}{'import ms':>11}{'create ms':>11}")
+        for name, run in cases.items():
+            samples = []
+            for _ in range(args.runs):
+                if name != "existing":
+                    remove_database(path)
+                samples.append(run())
+            total, imported, created = medians(samples)
+            print(f"{name:<18}{total:>12.1f}{imported:>11.1f}{created:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
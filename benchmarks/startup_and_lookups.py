@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""Startup cost and hire-lookup latency before and after the migrations.
+
+Startup compares re-running the original create_database() body on every
+launch with the migration runner's up-to-date check. Lookups time the
+view_hiring_status and view_hiring_notifications queries on a large
+Chef_Hires table without and with the migration 2 indexes.
+
+    python3 -m benchmarks.startup_and_lookups --hires 200000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import migrations
+from database import create_connection, close_connection, transaction
+
+CONSUMER_STATUS_QUERY = '''
+    SELECT Chef_Hires.hire_id, Users.username AS chef_name, Chef_Hires.response, Chef_Hires.message, Chef_Hires.hire_date
+    FROM Chef_Hires
+    INNER JOIN Users ON Chef_Hires.chef_id = Users.user_id
+    WHERE Chef_Hires.consumer_id = ?
+'''
+
+CHEF_NOTIFICATIONS_QUERY = '''
+    SELECT Chef_Hires.hire_id, Users.username AS consumer_name, Chef_Hires.hire_date
+    FROM Chef_Hires
+    INNER JOIN Users ON Chef_Hires.consumer_id = Users.user_id
+    WHERE Chef_Hires.chef_id = ?
+'''
+
+
+# Average wall time of a callable, in milliseconds.
+def time_ms(function, repeat):
+    """Runs function `repeat` times and returns the mean duration in ms."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+# Fills Chef_Hires with random hires between the sample users.
+def add_hires(count, users):
+    """Inserts `count` hires in one transaction."""
+    rng = random.Random(3)
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO Chef_Hires (chef_id, consumer_id) VALUES (?, ?)",
+            ((rng.randint(1, users), rng.randint(1, users)) for _ in range(count)),
+        )
+
+
+# Times both hire lookups for a sample of ids.
+def lookup_latency(users, repeat):
+    """Returns mean (status_ms, notifications_ms) for random ids."""
+    rng = random.Random(5)
+    conn = create_connection()
+    try:
+        status = time_ms(lambda: conn.execute(CONSUMER_STATUS_QUERY, (rng.randint(1, users),)).fetchall(), repeat)
+        notifications = time_ms(lambda: conn.execute(CHEF_NOTIFICATIONS_QUERY, (rng.randint(1, users),)).fetchall(), repeat)
+    finally:
+        close_connection(conn)
+    return status, notifications
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hires", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        database.set_database_path(os.path.join(directory, "bench.db"))
+        migrations.migrate(target=1)
+
+        def rerun_create_database():
+            with transaction() as conn:
+                migrations._base_schema(conn)
+
+        print("Startup")
+        print(f"  re-run create_database(): {time_ms(rerun_create_database, args.repeat):8.3f} ms")
+        print(f"  migrate() when current:   {time_ms(lambda: migrations.migrate(target=1), args.repeat):8.3f} ms")
+
+        add_hires(args.hires, args.users)
+        before = lookup_latency(args.users, args.repeat)
+        migrations.migrate()
+        after = lookup_latency(args.users, args.repeat)
+
+        print(f"Hire lookups over {args.hires} hires (mean of {args.repeat})")
+        print(f"  {'query':<26}{'no index':>12}{'indexed':>12}")
+        print(f"  {'view_hiring_status':<26}{before[0]:>10.3f}ms{after[0]:>10.3f}ms")
+        print(f"  {'view_hiring_notifications':<26}{before[1]:>10.3f}ms{after[1]:>10.3f}ms")
+        database.close_all_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+"""Hire and response throughput with one commit per write vs the write queue.
+
+Generates synthetic data, then for each thread count runs two rounds of the
+same workload: consumers hiring a few popular chefs and those chefs
+accepting earlier hires. The direct round calls services.hire_chef() and
+services.respond_to_hire(), one transaction each; the queued round submits
+them to write_queue.WriteQueue and waits for each future. Reports writes
+per second, p50/p95 latency and the mean batch size.
+
+    python3 -m benchmarks.write_queue --threads 1,8,32 --seconds 3 --profile durable
+    python3 -m benchmarks.write_queue --threads 32 --batch-size 16 --batch-delay-ms 2
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import services
+import synthetic_data
+from write_queue import WRITE_BATCH_DELAY_MS, WRITE_BATCH_SIZE, WriteQueue
+
+# Chefs that receive every hire, so the writes contend like a burst on a popular chef.
+POPULAR_CHEFS = 5
+
+# One write in this many is a response to an earlier hire.
+RESPONSE_EVERY = 4
+
+
+# One client thread: hires and responds until the deadline.
+def client(data, seed, deadline, hire, respond, samples):
+    """Appends the latency of each write to samples."""
+    rng = random.Random(seed)
+    chef_ids = range(data["chef_ids"][0], data["chef_ids"][0] + POPULAR_CHEFS)
+    consumer_ids = range(*data["consumer_ids"])
+    hires = []
+    count = 0
+    while time.perf_counter() < deadline:
+        count += 1
+        start = time.perf_counter()
+        if hires and count % RESPONSE_EVERY == 0:
+            hire_id, chef_id = hires.pop()
+            respond(hire_id, "accept", "See you then", chef_id)
+        else:
+            chef_id = rng.choice(chef_ids)
+            hires.append((hire(rng.choice(consumer_ids), chef_id), chef_id))
+        samples.append(time.perf_counter() - start)
+
+
+# Runs `threads` clients for `seconds` and collects their latencies.
+def run_round(data, threads, seconds, hire, respond):
+    """Returns a list of per-write durations in seconds."""
+    samples = []
+    deadline = time.perf_counter() + seconds
+    workers = [threading.Thread(target=client, args=(data, i, deadline, hire, respond, samples))
+               for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return samples
+
+
+# p50 and p95 of a list of durations, in milliseconds.
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0, 0.0
+    return (ordered[len(ordered) // 2] * 1000, ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(synthetic_data.SCALES), default="10k")
+    parser.add_argument("--threads", default="1,8,32", help="comma-separated client thread counts")
+    parser.add_argument("--seconds", type=float, default=3.0, help="length of each round")
+    parser.add_argument("--profile", choices=sorted(database.STORAGE_PROFILES), default=database.STORAGE_PROFILE)
+    parser.add_argument("--batch-size", type=int, default=WRITE_BATCH_SIZE, help="most writes per queued transaction")
+    parser.add_argument("--batch-delay-ms", type=float, default=WRITE_BATCH_DELAY_MS,
+                        help="how long a queued batch waits to fill")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    thread_counts = [int(count) for count in args.threads.split(",")]
+    database.set_storage_profile(args.profile)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "write_queue.db")
+        data = synthetic_data.generate(path, args.scale, args.seed)
+        database.set_database_path(path)
+        print(f"{args.profile} profile; {data['counts']['hires']} hires, {POPULAR_CHEFS} popular chefs")
+        print(f"\n{'threads':>8}{'mode':>8}{'writes/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'batch':>7}")
+
+        for threads in thread_counts:
+            samples = run_round(data, threads, args.seconds, services.hire_chef, services.respond_to_hire)
+            p50, p95 = percentiles(samples)
+            print(f"{threads:>8}{'direct':>8}{len(samples) / args.seconds:>10.0f}{p50:>9.3f}{p95:>9.3f}{1:>7}")
+
+            queue = WriteQueue(path, args.batch_size, args.batch_delay_ms)
+            try:
+                samples = run_round(data, threads, args.seconds,
+                                    lambda *args: queue.hire_chef(*args).result(),
+                                    lambda *args: queue.respond_to_hire(*args).result())
+            finally:
+                queue.close()
+            p50, p95 = percentiles(samples)
+            print(f"{threads:>8}{'queued':>8}{len(samples) / args.seconds:>10.0f}{p50:>9.3f}{p95:>9.3f}"
+                  f"{queue.stats()['mean_batch']:>7.1f}")
+        database.close_all_pools()
+
+
+if __name__ == "__main__":
+    main()
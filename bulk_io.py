@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+
+"""Bulk import and export of recipes, ingredients and chefs.
+
+    python3 bulk_io.py import recipes recipes.csv
+    python3 bulk_io.py import chefs chefs.jsonl --rejects chefs.rejects.jsonl
+    python3 bulk_io.py export recipes recipes.jsonl
+    python3 bulk_io.py export --query "SELECT recipe_name FROM Recipes" names.csv
+
+Files are CSV (with a header row) or JSON Lines, chosen by extension
+(.csv, .jsonl, .ndjson) or --format.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import sqlite3
+import argparse
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+from database import create_connection, close_connection, execute_many, transaction
+import sharding
+from migrations import prepare_database
+from passwords import VERIFY_WORKERS, hash_password
+from cache import invalidate
+from ingredient_search import index_recipe_ingredients, invalidate_ingredient_index, normalize_ingredient
+from recipe_storage import store_instructions, unpack_instructions
+
+# Rows parsed and inserted per executemany call.
+CHUNK_SIZE = 5000
+
+# Rows written before committing, to bound the size of the WAL.
+ROWS_PER_TRANSACTION = 100000
+
+# Most values bound in one IN (...) list; SQLite before 3.32 allows 999 variables per statement.
+MAX_IN_PARAMS = 500
+
+# Rows pulled per round trip when exporting.
+EXPORT_BATCH_SIZE = 5000
+
+# Exportable tables; password hashes are deliberately left out.
+EXPORT_QUERIES = {
+    "recipes": '''
+        SELECT Recipes.recipe_id, Recipes.recipe_name, Recipes.ingredients,
+               Recipe_Instructions.body AS instructions, Recipes.chef_id
+        FROM Recipes
+        LEFT JOIN Recipe_Instructions ON Recipe_Instructions.recipe_id = Recipes.recipe_id
+        ORDER BY Recipes.recipe_id
+    ''',
+    "ingredients": "SELECT ingredient_id, ingredient_name, location FROM Ingredients ORDER BY ingredient_id",
+    "chefs": '''
+        SELECT Chefs.chef_id, Users.username, Chefs.portfolio_details
+        FROM Chefs
+        INNER JOIN Users ON Chefs.user_id = Users.user_id
+        ORDER BY Chefs.chef_id
+    ''',
+    "hires": '''
+        SELECT hire_id, chef_id, consumer_id, hire_date, response, message
+        FROM Chef_Hires
+        ORDER BY hire_id
+    ''',
+}
+
+# Columns decoded on export, by table: (column index, decoder).
+EXPORT_DECODERS = {
+    "recipes": [(3, unpack_instructions)],
+}
+
+
+# Picks CSV or JSON Lines from an explicit format or the file extension.
+def detect_format(path, file_format=None):
+    """Returns 'csv' or 'jsonl'."""
+    if file_format:
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of {path}; pass --format csv or --format jsonl.")
+
+
+# Streams (line_number, record, error) triples from an input file.
+def read_records(path, file_format):
+    """Yields one dict per input row; malformed rows come back with an error."""
+    with open(path, newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            for record in reader:
+                yield reader.line_num, record, None
+        else:
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, None, f"invalid JSON: {e.msg}"
+                    continue
+                if not isinstance(record, dict):
+                    yield line_number, None, "expected a JSON object"
+                    continue
+                yield line_number, record, None
+
+
+# Reads a text field, treating blanks as missing.
+def _field(record, name):
+    value = record.get(name)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+# Reads rows for a long list of values with a few bounded IN (...) queries.
+def _select_in(conn, query, values):
+    """Runs query, whose one {} is filled with placeholders, over values in chunks."""
+    rows = []
+    for start in range(0, len(values), MAX_IN_PARAMS):
+        chunk = values[start:start + MAX_IN_PARAMS]
+        rows.extend(conn.execute(query.format(", ".join("?" for _ in chunk)), chunk).fetchall())
+    return rows
+
+
+# Turns a chunk of ingredient records into insert parameters.
+def _prepare_ingredients(conn, records):
+    rows, rejects = [], []
+    for line_number, record in records:
+        name = _field(record, "ingredient_name")
+        if name is None:
+            rejects.append((line_number, "missing ingredient_name"))
+            continue
+        rows.append((name, _field(record, "location"), normalize_ingredient(name)))
+    return rows, rejects
+
+
+# Turns a chunk of recipe records into insert parameters, resolving chefs.
+def _prepare_recipes(conn, records):
+    usernames = {_field(record, "chef_username") for _, record in records} - {None}
+    chef_ids = {}
+    if usernames:
+        chef_ids = dict(_select_in(
+            conn, "SELECT username, user_id FROM Users WHERE role = 'Chef' AND username IN ({})", sorted(usernames)))
+    rows, rejects = [], []
+    for line_number, record in records:
+        name = _field(record, "recipe_name")
+        if name is None:
+            rejects.append((line_number, "missing recipe_name"))
+            continue
+        chef_id = _field(record, "chef_id")
+        username = _field(record, "chef_username")
+        if username is not None:
+            chef_id = chef_ids.get(username)
+            if chef_id is None:
+                rejects.append((line_number, f"unknown chef {username!r}"))
+                continue
+        elif chef_id is not None:
+            if not chef_id.isdigit():
+                rejects.append((line_number, f"chef_id {chef_id!r} is not a number"))
+                continue
+            chef_id = int(chef_id)
+        rows.append((name, _field(record, "ingredients"), _field(record, "instructions"), chef_id))
+    return rows, rejects
+
+
+# Turns a chunk of chef records into user parameters, hashing passwords in parallel.
+def _prepare_chefs(conn, records):
+    rows, rejects, to_hash = [], [], []
+    for line_number, record in records:
+        username = _field(record, "username")
+        password_hash = _field(record, "password_hash")
+        password = _field(record, "password")
+        if username is None:
+            rejects.append((line_number, "missing username"))
+        elif password_hash is None and password is None:
+            rejects.append((line_number, "missing password or password_hash"))
+        else:
+            rows.append([username, password_hash, _field(record, "portfolio_details")])
+            if password_hash is None:
+                to_hash.append((len(rows) - 1, password))
+    if to_hash:
+        # Strong hashes take tens of milliseconds each; spread them over cores.
+        with ThreadPoolExecutor(max_workers=VERIFY_WORKERS) as executor:
+            hashes = executor.map(hash_password, [password for _, password in to_hash])
+            for (position, _), hashed in zip(to_hash, hashes):
+                rows[position][1] = hashed
+    return [tuple(row) for row in rows], rejects
+
+
+# Inserts prepared ingredient rows; returns how many were new.
+def _insert_ingredients(conn, rows):
+    cursor = execute_many(conn, "INSERT OR IGNORE INTO Ingredients (ingredient_name, location, normalized_name) VALUES (?, ?, ?)", rows)
+    return cursor.rowcount
+
+
+# Inserts prepared recipe rows and indexes their ingredients; returns how many were new.
+def _insert_recipes(conn, rows):
+    names = sorted({row[0] for row in rows})
+    existing = {name for (name,) in _select_in(conn, "SELECT recipe_name FROM Recipes WHERE recipe_name IN ({})", names)}
+    cursor = execute_many(conn, '''
+        INSERT OR IGNORE INTO Recipes (recipe_name, ingredients, chef_id)
+        VALUES (?, ?, ?)
+    ''', [(name, ingredients, chef_id) for name, ingredients, _, chef_id in rows])
+    # Index what is now stored under each name, which for duplicates is the
+    # existing recipe rather than the input row; indexing is idempotent.
+    stored = _select_in(conn, "SELECT recipe_id, recipe_name, ingredients FROM Recipes WHERE recipe_name IN ({})", names)
+    for recipe_id, _, ingredients in stored:
+        index_recipe_ingredients(conn, recipe_id, ingredients)
+    # Only new recipes take their instructions from the file; the first row of a repeated name wins.
+    instructions = {}
+    for name, _, text, _ in rows:
+        instructions.setdefault(name, text)
+    store_instructions(conn, [(recipe_id, instructions[name]) for recipe_id, name, _ in stored if name not in existing])
+    return cursor.rowcount
+
+
+# Inserts prepared chefs as Chef users plus their portfolios; returns how many were new.
+def _insert_chefs(conn, rows):
+    execute_many(conn, "INSERT OR IGNORE INTO Users (username, password, role) VALUES (?, ?, 'Chef')",
+                 [(username, password_hash) for username, password_hash, _ in rows])
+    cursor = execute_many(conn, '''
+        INSERT INTO Chefs (user_id, portfolio_details)
+        SELECT user_id, ? FROM Users
+        WHERE username = ? AND role = 'Chef'
+          AND NOT EXISTS (SELECT 1 FROM Chefs WHERE Chefs.user_id = Users.user_id)
+    ''', [(portfolio, username) for username, _, portfolio in rows])
+    return cursor.rowcount
+
+
+# How each entity is validated and inserted, and which caches it touches.
+IMPORTERS = {
+    "recipes": (_prepare_recipes, _insert_recipes, ("recipes",)),
+    "ingredients": (_prepare_ingredients, _insert_ingredients, ("ingredients",)),
+    "chefs": (_prepare_chefs, _insert_chefs, ("chefs",)),
+}
+
+
+# Streams a CSV/JSON Lines file into one of the catalog tables.
+def import_file(entity, path, file_format=None, rejects_path=None, chunk_size=CHUNK_SIZE,
+                rows_per_transaction=ROWS_PER_TRANSACTION, progress=None):
+    """Imports a file and returns a summary dict.
+
+    Rows are parsed and validated chunk by chunk, inserted with executemany
+    and committed every rows_per_transaction rows, so memory stays flat and
+    an interrupted import keeps what was committed. Rows that fail
+    validation are rejected (and written to rejects_path as JSON Lines if
+    given); rows that already exist are counted as duplicates.
+    """
+    if entity == "chefs" and sharding.enabled():
+        # Imported users would need rows on their shards too; import before converting instead.
+        raise ValueError("Chefs cannot be imported into a sharded database; import them before running sharding.py convert.")
+    prepare, insert, namespaces = IMPORTERS[entity]
+    file_format = detect_format(path, file_format)
+    summary = {"entity": entity, "rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0}
+    records = read_records(path, file_format)
+    rejects_file = open(rejects_path, "w", encoding="utf-8") if rejects_path else None
+    conn = create_connection()
+    start = time.perf_counter()
+    try:
+        finished = False
+        while not finished:
+            with transaction(conn):
+                pending = 0
+                while pending < rows_per_transaction:
+                    chunk = list(islice(records, chunk_size))
+                    if not chunk:
+                        finished = True
+                        break
+                    parsed = [(line, record) for line, record, error in chunk if error is None]
+                    rejects = [(line, error) for line, record, error in chunk if error is not None]
+                    rows, invalid = prepare(conn, parsed)
+                    rejects.extend(invalid)
+                    inserted = insert(conn, rows) if rows else 0
+                    summary["rows"] += len(chunk)
+                    summary["inserted"] += inserted
+                    summary["duplicates"] += len(rows) - inserted
+                    summary["rejected"] += len(rejects)
+                    if rejects_file:
+                        for line, reason in rejects:
+                            rejects_file.write(json.dumps({"line": line, "reason": reason}) + "\n")
+                    pending += len(chunk)
+                    if progress:
+                        progress(summary)
+    finally:
+        close_connection(conn)
+        if rejects_file:
+            rejects_file.close()
+        # Drop cached reads even after a partial import; committed rows are visible.
+        invalidate(*namespaces)
+        if entity == "recipes":
+            invalidate_ingredient_index()
+    summary["seconds"] = time.perf_counter() - start
+    summary["rows_per_sec"] = summary["rows"] / summary["seconds"] if summary["seconds"] else 0.0
+    return summary
+
+
+# Streams the rows of a query along with its column names.
+def stream_with_columns(query, params=(), batch_size=EXPORT_BATCH_SIZE):
+    """Returns (columns, rows) where rows is a generator over the result set."""
+    conn = create_connection()
+    try:
+        cursor = conn.execute(query, params)
+    except Exception:
+        close_connection(conn)
+        raise
+    columns = [description[0] for description in cursor.description or ()]
+
+    def rows():
+        try:
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            close_connection(conn)
+
+    return columns, rows()
+
+
+# Applies the export decoders of a table to one row.
+def _decode(row, decoders):
+    row = list(row)
+    for index, decode in decoders:
+        row[index] = decode(row[index])
+    return row
+
+
+# Streams a table or an arbitrary query out to a CSV/JSON Lines file.
+def export_file(path, table=None, query=None, params=(), file_format=None):
+    """Exports rows without loading them all into memory; returns a summary dict."""
+    if (table is None) == (query is None):
+        raise ValueError("Pass exactly one of table or query.")
+    if table is not None:
+        if table not in EXPORT_QUERIES:
+            raise ValueError(f"Unknown table {table!r}; choose from {', '.join(EXPORT_QUERIES)}.")
+        query = EXPORT_QUERIES[table]
+    file_format = detect_format(path, file_format)
+    start = time.perf_counter()
+    columns, rows = stream_with_columns(query, params)
+    decoders = EXPORT_DECODERS.get(table)
+    if decoders:
+        rows = (_decode(row, decoders) for row in rows)
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if file_format == "csv":
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                file.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+                count += 1
+    seconds = time.perf_counter() - start
+    return {"rows": count, "seconds": seconds, "rows_per_sec": count / seconds if seconds else 0.0}
+
+
+# Prints a one-line import or export summary.
+def print_summary(action, summary):
+    """Prints row counts and throughput."""
+    line = f"{action}: {summary['rows']} rows in {summary['seconds']:.2f}s ({summary['rows_per_sec']:.0f} rows/s)"
+    if "inserted" in summary:
+        line += f", {summary['inserted']} inserted, {summary['duplicates']} duplicates, {summary['rejected']} rejected"
+    print(line)
+
+
+# Non-interactive command line for imports and exports.
+def main(argv=None):
+    """Runs `import <entity> <file>` or `export (<table> | --query SQL) <file>`."""
+    parser = argparse.ArgumentParser(prog="bulk_io", description="Bulk import and export for Forks and Folks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="load recipes, ingredients or chefs from a file")
+    importer.add_argument("entity", choices=sorted(IMPORTERS))
+    importer.add_argument("file")
+    importer.add_argument("--format", choices=("csv", "jsonl"))
+    importer.add_argument("--rejects", help="write rejected rows to this JSON Lines file")
+    importer.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    importer.add_argument("--rows-per-transaction", type=int, default=ROWS_PER_TRANSACTION)
+
+    exporter = commands.add_parser("export", help="write a table or query result to a file")
+    exporter.add_argument("table", nargs="?", choices=sorted(EXPORT_QUERIES))
+    exporter.add_argument("file")
+    exporter.add_argument("--query", help="export the result of this SELECT instead of a table")
+    exporter.add_argument("--format", choices=("csv", "jsonl"))
+
+    args = parser.parse_args(argv)
+    try:
+        prepare_database()
+        if args.command == "import":
+            summary = import_file(args.entity, args.file, args.format, args.rejects,
+                                  args.chunk_size, args.rows_per_transaction)
+            print_summary(f"Imported {args.entity}", summary)
+            return 1 if summary["rejected"] else 0
+        summary = export_file(args.file, table=args.table, query=args.query, file_format=args.format)
+        print_summary(f"Exported {args.table or 'query'}", summary)
+        return 0
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import threading
+import functools
+from collections import OrderedDict
+
+# Most entries kept before the least recently used ones are evicted.
+CACHE_MAX_ENTRIES = int(os.environ.get("FORKS_AND_FOLKS_CACHE_ENTRIES", "1024"))
+
+# Seconds an entry may be served; bounds staleness from writes made by other processes.
+CACHE_TTL = float(os.environ.get("FORKS_AND_FOLKS_CACHE_TTL", "60"))
+
+
+# A thread-safe LRU cache whose entries also expire after a time-to-live.
+class LRUCache:
+    """Size-bounded, TTL-bounded cache with namespace invalidation."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def generation(self, namespace):
+        """Returns the current generation of a namespace."""
+        return self._generations.get(namespace, 0)
+
+    def get(self, key):
+        """Returns (True, value) on a fresh hit, else (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, value
+
+    def put(self, key, value):
+        """Stores a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, namespace):
+        """Makes every entry cached under a namespace unreachable."""
+        with self._lock:
+            # Keys carry the generation they were read under, so bumping it
+            # orphans old entries in O(1); they age out of the LRU order.
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        """Drops every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+    def stats(self):
+        """Returns hit/miss/eviction counters and the current size."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = snapshot["hits"] / lookups if lookups else 0.0
+        return snapshot
+
+
+_cache = LRUCache()
+
+
+# Returns a cached value, loading and storing it on a miss.
+def cached(namespace, key, loader):
+    """Read-through lookup of key within namespace."""
+    # Read the generation before loading so a write that lands while the
+    # query runs leaves this result under the old, unreachable generation.
+    full_key = (namespace, _cache.generation(namespace), key)
+    hit, value = _cache.get(full_key)
+    if hit:
+        return value
+    value = loader()
+    _cache.put(full_key, value)
+    return value
+
+
+# Decorates a read function so its results are cached per argument list.
+def read_through(namespace):
+    """Caches a function's return values under namespace until invalidated."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (function.__qualname__, args, tuple(sorted(kwargs.items())))
+            return cached(namespace, key, lambda: function(*args, **kwargs))
+        wrapper.uncached = function
+        return wrapper
+    return decorate
+
+
+# Drops cached reads after a write to the underlying tables.
+def invalidate(*namespaces):
+    """Invalidates every given namespace."""
+    for namespace in namespaces:
+        _cache.invalidate(namespace)
+
+
+# Reports cache effectiveness.
+def cache_stats():
+    """Returns hits, misses, evictions, expirations, invalidations and size."""
+    return _cache.stats()
@@ -1,215 +1,61 @@
 #!/usr/bin/env python3
 
-import os
+import sys
 import sqlite3
-import hashlib
-# let's first create connection to database.
-def create_connection():
-    """Creates and returns a database connection."""
-    return sqlite3.connect("forks_and_folks.db")
-
-def close_connection(conn):
-    """Closes a database connection."""
-    if conn:
-        conn.close()
-
-# Defining the function executes queries  for executing SQL queries
-def execute_query(conn, query, params=None):
-    """Executes a SQL query."""
-    cursor = conn.cursor()
-    try:
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        conn.commit()
-        return cursor
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return None
-
-""" notes:
-Fetches all rows of data from the result set of a previously executed SQL query. 
-   Returns None if the cursor is invalid.
-"""
-
-# Fetches a single row of data from the result set of a previously executed SQL query.
-def fetch_all(cursor):
-    """Fetches all results from a cursor."""
-    if cursor:
-        return cursor.fetchall()
-    return None
-
-# Fetches a single row of data from the result set of a previously executed SQL query.   
-def fetch_one(cursor):
-    """ Fetches a single result from a cursor."""
-    if cursor:
-        return cursor.fetchone()
-    return None
- # Hashes a password using SHA-256.
-def hash_password(password):
-    """Hashes a password using SHA-256."""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-#   Verifies a hashed password against a provided password.
-def verify_password(stored_password, provided_password):
-    """Verifies a hashed password."""
-    hashed_provided_password = hash_password(provided_password)
-    return stored_password == hashed_provided_password
+from migrations import prepare_database
+from recipe_search import search_recipes
+from ingredient_search import find_recipes_by_ingredients, plan_shopping, recipes_from_pantry
+from instrumentation import action
+import services
+from services import (
+    fetch_chef_page,
+    fetch_ingredient_page,
+    fetch_notification_page,
+    fetch_recipe,
+    fetch_recipe_page,
+)
 
 # Creates the database schema and populates it with dummy data.
 def create_database():
-    """Creates the database schema and populates it with dummy data."""
-    conn = create_connection()
-    cursor = conn.cursor()
-
- # Create tables
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Users (
-            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            password TEXT NOT NULL,
-            role TEXT NOT NULL CHECK (role IN ('Chef', 'Consumer'))
-        )
-    ''')
-     # Create the Recipes table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Recipes (
-            recipe_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            recipe_name TEXT NOT NULL UNIQUE,
-            ingredients TEXT,
-            instructions TEXT,
-            chef_id INTEGER,
-            FOREIGN KEY (chef_id) REFERENCES Users(user_id)
-        )
-    ''')
-
-# Create the Ingredients table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Ingredients (
-            ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ingredient_name TEXT NOT NULL UNIQUE,
-            location TEXT
-        )
-    ''')
-
-# Create the Chefs table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Chefs (
-            chef_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            portfolio_details TEXT,
-            FOREIGN KEY (user_id) REFERENCES Users(user_id)
-        )
-    ''')
-
-# Create the Chef_Hires table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Chef_Hires (
-            hire_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chef_id INTEGER,
-            consumer_id INTEGER,
-            hire_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-            response TEXT,
-            message TEXT,            
-            FOREIGN KEY (chef_id) REFERENCES Users(user_id),
-            FOREIGN KEY (consumer_id) REFERENCES Users(user_id)
-        )
-    ''')
-
-# Insert sample data
-    cursor.execute("INSERT OR IGNORE INTO Users (username, password, role) VALUES ('Gabriella', ?, 'Consumer')", (hash_password('password'),))
-    cursor.execute("INSERT OR IGNORE INTO Users (username, password, role) VALUES ('Jessica', ?, 'Consumer')", (hash_password('password'),))
-    cursor.execute("INSERT OR IGNORE INTO Users (username, password, role) VALUES ('Santhiana', ?, 'Chef')", (hash_password('pass'),))
-    cursor.execute("INSERT OR IGNORE INTO Users (username, password, role) VALUES ('Buke', ?, 'Chef')", (hash_password('pass'),))
-    cursor.execute("INSERT OR IGNORE INTO Users (username, password, role) VALUES ('Janviere', ?, 'Consumer')", (hash_password('password'),))
-    cursor.execute("INSERT OR IGNORE INTO Users (username, password, role) VALUES ('Thierry', ?, 'Chef')", (hash_password('pass'),))
-    cursor.execute("INSERT OR IGNORE INTO Users (username, password, role) VALUES ('Dhieu', ?, 'Chef')", (hash_password('pass'),))
-    cursor.execute("INSERT OR IGNORE INTO Users (username, password, role) VALUES ('Herve', ?, 'Consumer')", (hash_password('password'),))
-    cursor.execute("INSERT OR IGNORE INTO Chefs (user_id, portfolio_details) VALUES (3, 'Specializes in Burundian cuisine.')")
-    cursor.execute("INSERT OR IGNORE INTO Chefs (user_id, portfolio_details) VALUES (4, 'Specializes in Kenyan cuisine.')")
-    cursor.execute("INSERT OR IGNORE INTO Chefs (user_id, portfolio_details) VALUES (6, 'Specializes in Rwandan cuisine.')")
-    cursor.execute("INSERT OR IGNORE INTO Chefs (user_id, portfolio_details) VALUES (7, 'Specializes in Sudani cuisine.')")
-
-# Insert sample recipes
-    recipes = [
-        ("Spaghetti Carbonara", "spaghetti, eggs, pecorino cheese, pancetta, black pepper", "1. Cook pasta\n2. Fry pancetta\n3. Mix eggs and cheese\n4. Combine all ingredients\n", 3),
-        ("Classic Burger", "ground beef, burger buns, lettuce, tomato, onion, cheese", "1. Form patties\n2. Grill until done\n3. Assemble with toppings\n", 4),
-        ("Caesar Salad", "romaine lettuce, croutons, parmesan, caesar dressing", "1. Chop lettuce\n2. Add croutons and cheese\n3. Toss with dressing\n", 6),
-        ("Chocolate Chip Cookies", "flour, butter, sugar, eggs, chocolate chips", "1. Mix ingredients\n2. Form cookies\n3. Bake at 350F for 12 minutes\n", 7),
-        ("Chicken Stir Fry", "chicken breast, vegetables, soy sauce, oil, garlic", "1. Cut chicken\n2. Stir fry vegetables\n3. Add chicken and sauce\n", 4)
-    ]
-
-# Insert sample recipes
-    for recipe in recipes:
-        cursor.execute('''
-            INSERT OR IGNORE INTO Recipes (recipe_name, ingredients, instructions, chef_id)
-            VALUES (?, ?, ?, ?)
-        ''', recipe)
-
-# Insert sample ingredients
-    ingredients = [
-        ("Tomatoes", "Kimironko Market"),
-        ("Spaghetti", "250 Stores"),
-        ("Chicken Breast", "Farmer's Choice Butcher Shop"),
-        ("Flour", "Simba Kisimenti Supermarket"),
-        ("Lettuce", "Kimironko Market"),
-        ("Croutons", "T2000 Supermarket"),
-        ("Butter", "Zoe's Bakery"),
-        ("Ground Beef", "Kimironko Market"),
-        ("Cheese", "T2000 Supermarket"),
-        ("Chocolate Chips", "Zoe's Bakery"),
-        ("Buns", "250 Stores"),
-        ("Soy Sauce", "Simba Kimironko")
-    ]
-
-# Insert sample ingredients
-    for ingredient in ingredients:
-        cursor.execute('''
-            INSERT OR IGNORE INTO Ingredients (ingredient_name, location)
-            VALUES (?, ?)
-        ''', ingredient)
-
-    conn.commit()
-    close_connection(conn)
+    """Creates or upgrades the database schema; a header check once it is current.
+
+    A new database is cloned from the template (see migrations.build_template)
+    when one is present, instead of being built statement by statement.
+    """
+    prepare_database()
 
 # Registers a new user in the database.
+@action
 def signup(username, password, role):
     """Registers a new user."""
-    conn = create_connection()
-    hashed_password = hash_password(password)
-    query = "INSERT INTO Users (username, password, role) VALUES (?, ?, ?)"
-    params = (username, hashed_password, role)
-    execute_query(conn, query, params)
-    
     # Prompt for portfolio details, if the user signs up as a chef.
-    if role.lower() == "chef":
-        cursor = conn.cursor()
-        cursor.execute("SELECT user_id FROM Users WHERE username = ?", (username,))
-        user = fetch_one(cursor)
-        if user:
-            user_id = user[0]
-            portfolio_details = input("Enter your portfolio details (e.g., specialties, experience): ")
-            chef_query = "INSERT INTO Chefs (user_id, portfolio_details) VALUES (?, ?)"
-            execute_query(conn, chef_query, (user_id, portfolio_details))
-            print("Portfolio created successfully!")
-    
-    close_connection(conn)
+    # This happens before any database work so no lock is held while typing.
+    portfolio_details = ""
+    if role == "Chef":
+        portfolio_details = input("Enter your portfolio details (e.g., specialties, experience): ")
+
+    try:
+        user_id = services.signup(username, password, role, portfolio_details)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
+
+    if user_id is None:
+        print("That username is taken. Please choose another.")
+        return
+    if role == "Chef":
+        print("Portfolio created successfully!")
     print("Signup successful!")
 
-# Logs in a user and returns their user ID, username, and role.
+# Logs in a user and returns their session.
+@action
 def login(username, password):
-    """Logs in a user."""
-    conn = create_connection()
-    query = "SELECT user_id, username, password, role FROM Users WHERE username = ?"
-    cursor = execute_query(conn, query, (username,))
-    user = fetch_one(cursor)
-    close_connection(conn)
-    if user:
-        user_id, username, stored_password, role = user
-        if verify_password(stored_password, password):
-            return user_id, username, role
-    return None, None, None
+    """Returns a services.Session, or None if the credentials are wrong."""
+    try:
+        return services.login(username, password)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
 
 # Allow saving of data
 def save_to_file(data, filename):
@@ -221,85 +67,246 @@ def save_to_file(data, filename):
     except Exception as e:
         print(f"Error saving data to file: {e}")
         
+# Shows rows one page at a time with next/previous navigation.
+def page_through(title, fetch, show, prompt, handle_choice, empty_message):
+    """Pages through fetch() results until the user exits.
+
+    fetch(after=..., before=...) returns (rows, has_more) for one page, keyed
+    on each row's first column. show(number, row) prints a row and
+    handle_choice(choice, rows) acts on any other input; it returns True to
+    leave the list.
+    """
+    after = before = None
+    while True:
+        try:
+            rows, has_more = fetch(after=after, before=before)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return
+        if not rows:
+            if after is None and before is None:
+                print(empty_message)
+                return
+            # The page emptied underneath us; start again from the top.
+            after = before = None
+            continue
+        has_next = has_more if before is None else True
+        has_previous = after is not None if before is None else has_more
+
+        print(f"\n{title}:")
+        for i, row in enumerate(rows, 1):
+            show(i, row)
+        navigation = []
+        if has_previous:
+            navigation.append("'p' for previous page")
+        if has_next:
+            navigation.append("'n' for next page")
+        if navigation:
+            print(f"({', '.join(navigation)})")
+
+        choice = input(prompt).strip()
+        if choice.lower() == 'exit':
+            return
+        if choice.lower() == 'n' and has_next:
+            after, before = rows[-1][0], None
+        elif choice.lower() == 'p' and has_previous:
+            after, before = None, rows[0][0]
+        elif handle_choice(choice, rows):
+            return
+
 # Allows consumers to browse recipes and view details.
+@action
 def browse_recipes():
     """Allows users to browse recipes and save them."""
-    conn = create_connection()
-    query = "SELECT recipe_name, ingredients, instructions FROM Recipes"
-    cursor = execute_query(conn, query)
-    recipes = fetch_all(cursor)
-    close_connection(conn)
-
-    # Display available recipes
-    if recipes:
-        print("\nAvailable Recipes:")
-        for i, (name, ingredients, instructions) in enumerate(recipes, 1):
-            print(f"{i}. {name}")
-        
-        # Allow user to select a recipe to view details
-        while True:
-            choice = input("\nEnter recipe number to view details (or 'exit' to go back): ")
-            if choice.lower() == 'exit':
-                break
-            if choice.isdigit() and 1 <= int(choice) <= len(recipes):
-                recipe = recipes[int(choice) - 1]
-                print(f"\nRecipe: {recipe[0]}")
-                print(f"Ingredients: {recipe[1]}")
-                print(f"Instructions:\n{recipe[2]}")
-                # Prompt to save the recipe
-                save_choice = input("Do you want to save this recipe to a file? (yes/no): ").lower()
-                if save_choice == 'yes':
-                    data = f"Recipe: {recipe[0]}\nIngredients: {recipe[1]}\nInstructions:\n{recipe[2]}"
-                    save_to_file(data, f"{recipe[0].replace(' ', '_')}_recipe.txt")
-            else:
-                print("Invalid choice. Please try again.")
-    else:
-        print("No recipes found.")
+    def show(i, row):
+        print(f"{i}. {row[1]}")
+
+    # Allow user to select a recipe to view details
+    def choose(choice, rows):
+        if choice.isdigit() and 1 <= int(choice) <= len(rows):
+            try:
+                recipe = fetch_recipe(rows[int(choice) - 1][0])
+            except sqlite3.Error as e:
+                print(f"Database error: {e}")
+                return False
+            if recipe is None:
+                print("That recipe is no longer available.")
+                return False
+            print(f"\nRecipe: {recipe[0]}")
+            print(f"Ingredients: {recipe[1]}")
+            print(f"Instructions:\n{recipe[2]}")
+            # Prompt to save the recipe
+            save_choice = input("Do you want to save this recipe to a file? (yes/no): ").lower()
+            if save_choice == 'yes':
+                data = f"Recipe: {recipe[0]}\nIngredients: {recipe[1]}\nInstructions:\n{recipe[2]}"
+                save_to_file(data, f"{recipe[0].replace(' ', '_')}_recipe.txt")
+            if input("Do you want a shopping plan for this recipe? (yes/no): ").lower() == 'yes':
+                print_shopping_plan([rows[int(choice) - 1][0]])
+        else:
+            print("Invalid choice. Please try again.")
+        return False
+
+    page_through("Available Recipes", fetch_recipe_page, show,
+                 "\nEnter recipe number to view details (or 'exit' to go back): ",
+                 choose, "No recipes found.")
 
 # Allows consumers to browse ingredients and view their locations.
+@action
 def browse_ingredients():
     """Allows users to browse ingredients' locations and save them."""
-    conn = create_connection()
-    query = "SELECT ingredient_name, location FROM Ingredients"
-    cursor = execute_query(conn, query)
-    ingredients = fetch_all(cursor)
-    close_connection(conn)
-    
-    # Display available ingredients
-    if ingredients:
-        print("\nAvailable Ingredients:")
-        for i, (ingredient_name, location) in enumerate(ingredients, 1):
-            print(f"{i}. {ingredient_name} - Location: {location}")
+    def show(i, row):
+        print(f"{i}. {row[1]} - Location: {row[2]}")
+
+    def choose(choice, rows):
+        if choice.isdigit() and 1 <= int(choice) <= len(rows):
+            ingredient = rows[int(choice) - 1][1:]
+            print(f"\nIngredient: {ingredient[0]}")
+            print(f"Location: {ingredient[1]}")
+
+            # Prompt to save the ingredient location
+            save_choice = input("Do you want to save this ingredient location to a file? (yes/no): ").lower()
+            if save_choice == 'yes':
+                data = f"Ingredient: {ingredient[0]}\nLocation: {ingredient[1]}"
+                save_to_file(data, f"{ingredient[0].replace(' ', '_')}_location.txt")
+        else:
+            print("Invalid choice! Please try again.")
+        return False
+
+    page_through("Available Ingredients", fetch_ingredient_page, show,
+                 "\nEnter ingredient number to view details (or 'exit' to go back): ",
+                 choose, "No ingredients found.")
+
+# Allows consumers to find recipes by the ingredients they have or want.
+@action
+def find_recipes_by_ingredient():
+    """Searches recipes by ingredient list or by pantry coverage."""
+    print("\n1. Recipes containing all of these ingredients")
+    print("2. Recipes containing any of these ingredients")
+    print("3. Recipes I can cook with my pantry")
+    mode = input("Choose a search type: ")
+    if mode not in ['1', '2', '3']:
+        print("Invalid choice! Please try again.")
+        return
+    ingredients = [name for name in input("Enter ingredients (comma-separated): ").split(",") if name.strip()]
+    if not ingredients:
+        print("No ingredients entered.")
+        return
+
+    if mode == '3':
+        try:
+            matches = recipes_from_pantry(ingredients)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return
+        if not matches:
+            print("No recipes use any of those ingredients.")
+        for recipe_id, recipe_name, coverage, missing in matches:
+            print(f"{recipe_name} - {coverage:.0%} covered")
+            if missing:
+                print(f"   Still needed: {', '.join(missing)}")
+        return
 
-        while True:
-            choice = input("\nEnter ingredient number to view details (or 'exit' to go back): ")
-            if choice.lower() == 'exit':
-                break
-            if choice.isdigit() and 1 <= int(choice) <= len(ingredients):
-                ingredient = ingredients[int(choice) - 1]
-                print(f"\nIngredient: {ingredient[0]}")
-                print(f"Location: {ingredient[1]}")
-
-                # Prompt to save the ingredient location
-                save_choice = input("Do you want to save this ingredient location to a file? (yes/no): ").lower()
-                if save_choice == 'yes':
-                    data = f"Ingredient: {ingredient[0]}\nLocation: {ingredient[1]}"
-                    save_to_file(data, f"{ingredient[0].replace(' ', '_')}_location.txt")
-            else:
-                print("Invalid choice! Please try again.")
-    else:
-        print("No ingredients found.")
+    try:
+        matches = find_recipes_by_ingredients(ingredients, match="all" if mode == '1' else "any")
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
+    if not matches:
+        print("No matching recipes found.")
+    for recipe_id, recipe_name, matched in matches:
+        print(f"{recipe_name} ({matched} of {len(ingredients)} ingredients)")
+
+# Allows consumers to search recipes by keyword.
+@action
+def search_recipe_catalog():
+    """Runs a ranked full-text search over the recipe catalog."""
+    text = input("\nEnter search words (partial words are fine): ")
+    try:
+        results = search_recipes(text)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
+    if not results:
+        print("No recipes matched your search.")
+        return
+    print("\nSearch Results:")
+    for i, (recipe_id, recipe_name, snippet) in enumerate(results, 1):
+        print(f"{i}. {recipe_name}")
+        print(f"   {' '.join(snippet.split())}")
+
+# Prints where to buy the ingredients of one or more recipes.
+def print_shopping_plan(recipe_ids, recipe_names=None):
+    """Shows the shopping plan store by store, then anything no store sells."""
+    try:
+        stops, unmatched = plan_shopping(recipe_ids)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
+    if not stops and not unmatched:
+        print("Those recipes list no ingredients.")
+        return
+    print(f"\nShopping Plan ({len(stops)} stop{'s' if len(stops) != 1 else ''}):")
+    for number, (location, items) in enumerate(stops, 1):
+        print(f"{number}. {location}")
+        # Several recipe ingredients can be the same product ("lettuce", "romaine lettuce").
+        products = {}
+        for ingredient, ingredient_name, needed_by in items:
+            aliases, recipes = products.setdefault(ingredient_name, ([], []))
+            if ingredient != ingredient_name.lower():
+                aliases.append(ingredient)
+            recipes.extend(recipe_id for recipe_id in needed_by if recipe_id not in recipes)
+        for ingredient_name, (aliases, recipes) in products.items():
+            line = f"   - {ingredient_name}"
+            if aliases:
+                line += f" (for {', '.join(aliases)})"
+            if recipe_names and len(recipe_ids) > 1:
+                line += f" - {', '.join(recipe_names[recipe_id] for recipe_id in sorted(recipes))}"
+            print(line)
+    if unmatched:
+        print(f"Not sold at any listed store: {', '.join(ingredient for ingredient, _ in unmatched)}")
+
+# Allows consumers to plan one shopping trip for several recipes.
+@action
+def plan_shopping_trip():
+    """Finds recipes by keyword, lets the user pick some and plans where to buy them."""
+    text = input("\nSearch for the recipes to shop for: ")
+    try:
+        results = search_recipes(text)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
+    if not results:
+        print("No recipes matched your search.")
+        return
+    for i, (recipe_id, recipe_name, snippet) in enumerate(results, 1):
+        print(f"{i}. {recipe_name}")
+    picks = input("Enter the recipe numbers to shop for (comma-separated): ").split(",")
+    chosen = {}
+    for pick in picks:
+        pick = pick.strip()
+        if pick.isdigit() and 1 <= int(pick) <= len(results):
+            recipe_id, recipe_name, _ = results[int(pick) - 1]
+            chosen[recipe_id] = recipe_name
+        elif pick:
+            print(f"Ignoring {pick!r}: not a recipe number.")
+    if not chosen:
+        print("No recipes chosen.")
+        return
+    print_shopping_plan(list(chosen), chosen)
 
 # Displays the consumer menu and allows them to choose actions.
-def consumer_menu(username):
+def consumer_menu(session):
     """Displays the consumer menu."""
     while True:
         print("\nConsumer Menu:")
         print("1. Browse Recipes")
         print("2. Browse Ingredients")
         print("3. View Chef Portfolios and Hire")
-        print("4. View Hiring Request Status")
-        print("5. Exit")
+        print(f"4. View Hiring Request Status{unread_label(session)}")
+        print("5. Find Recipes by Ingredients")
+        print("6. Search Recipes")
+        print("7. Plan a Shopping Trip")
+        print("8. Exit")
         
         # Prompt user for action
         choice = input("What do you wish to do?: ")
@@ -309,91 +316,161 @@ def consumer_menu(username):
         elif choice == '2':
             browse_ingredients()
         elif choice == '3':
-            view_and_hire_chefs(username)
+            view_and_hire_chefs(session)
         elif choice == '4':
-            view_hiring_status(username)
+            view_hiring_status(session)
         elif choice == '5':
+            find_recipes_by_ingredient()
+        elif choice == '6':
+            search_recipe_catalog()
+        elif choice == '7':
+            plan_shopping_trip()
+        elif choice == '8':
             print("Exiting consumer menu...")
             break
         else:
             print("Invalid choice! Try again.")
 
 # Allows consumers to view chef portfolios and hire chefs.
-def view_and_hire_chefs(username):
+@action
+def view_and_hire_chefs(session):
     """Allows consumers to view chef portfolios and hire chefs."""
-    conn = create_connection()
-    query = '''
-        SELECT Chefs.chef_id, Users.username, Chefs.portfolio_details
-        FROM Chefs
-        INNER JOIN Users ON Chefs.user_id = Users.user_id
-    '''
-    cursor = execute_query(conn, query)
-    chefs = fetch_all(cursor)
-    close_connection(conn)
-    
-    # Display available chefs
-    if chefs:
-        print("\nAvailable Chefs:")
-        for chef_id, chef_name, portfolio in chefs:
-            print(f"Chef ID: {chef_id}, Name: {chef_name}, Portfolio: {portfolio}")
-
-        chef_id = input("\nEnter the Chef ID to hire (or 'exit' to go back): ")
-
-        # Allow user to hire a chef
-        if chef_id.lower() == 'exit':
+    view = input("See (r)ecommended chefs or (a)ll chefs? [r]: ").strip().lower() or "r"
+    if view == "r":
+        recommend_and_hire_chefs(session)
+        return
+    if view != "a":
+        print("Invalid choice! Please try again.")
+        return
+
+    def show(i, row):
+        chef_id, chef_name, portfolio = row
+        print(f"Chef ID: {chef_id}, Name: {chef_name}, Portfolio: {portfolio}")
+
+    # Allow user to hire a chef
+    def choose(chef_id, rows):
+        hire_chef(session.user_id, chef_id)
+        return True
+
+    page_through("Available Chefs", fetch_chef_page, show,
+                 "\nEnter the Chef ID to hire (or 'exit' to go back): ",
+                 choose, "No chefs available.")
+
+# Shows the best-ranked chefs, optionally for one cuisine, and lets the consumer hire one.
+def recommend_and_hire_chefs(session):
+    """Lists the top chefs with their answer rate, speed and workload."""
+    try:
+        usual = services.favourite_cuisine(session.user_id)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
+    prompt = "Enter a cuisine (e.g. Kenyan), 'any' for every cuisine"
+    prompt += f" [{usual.capitalize()}]: " if usual else " [any]: "
+    cuisine = input(prompt).strip().lower() or usual or "any"
+    try:
+        chefs = services.recommend_chefs(None if cuisine == "any" else cuisine)
+        if not chefs and cuisine != "any" and cuisine not in services.list_cuisines():
+            print(f"Unknown cuisine. Try one of: {', '.join(name.capitalize() for name in services.list_cuisines())}")
             return
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
+    if not chefs:
+        print("No chefs available.")
+        return
+
+    print("\nRecommended Chefs:" if cuisine == "any" else f"\nRecommended {cuisine.capitalize()} Chefs:")
+    for chef in chefs:
+        accepts = f"{chef.acceptance_rate:.0%}" if chef.acceptance_rate is not None else "new"
+        speed = f"{chef.avg_response_hours:.1f}h" if chef.avg_response_hours is not None else "n/a"
+        print(f"Chef ID: {chef.chef_id}, Name: {chef.username}, Accepts: {accepts}, Answers in: {speed}, "
+              f"Pending: {chef.pending}, Recipes: {chef.recipes}")
+        print(f"   Portfolio: {chef.portfolio_details}")
+    choice = input("\nEnter the Chef ID to hire (or 'exit' to go back): ").strip()
+    if choice.lower() != 'exit':
+        hire_chef(session.user_id, choice)
+
+# Records a hiring request from a consumer to a chef.
+def hire_chef(consumer_id, chef_id):
+    """Sends a hiring request and reports the outcome."""
+    try:
+        chef_id = int(chef_id)
+    except ValueError:
+        print("Invalid Chef ID. Please enter a number.")
+        return
+    try:
+        hire_id = services.hire_chef(consumer_id, chef_id)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
 
-        conn = create_connection()
-        consumer_query = "SELECT user_id FROM Users WHERE username = ?"
-        consumer_cursor = execute_query(conn, consumer_query, (username,))
-        consumer = fetch_one(consumer_cursor)
-
-        conn = create_connection()
-        consumer_query = "SELECT user_id FROM Users WHERE username = ?"
-        consumer_cursor = execute_query(conn, consumer_query, (username,))
-        consumer = fetch_one(consumer_cursor)
-
-       #Check if the chef ID is valid
-        if consumer:
-            consumer_id = consumer[0]
-            hire_query = "INSERT INTO Chef_Hires (chef_id, consumer_id) VALUES (?, ?)"
-            execute_query(conn, hire_query, (chef_id, consumer_id))
-            print("Chef hired successfully!")
-        else:
-            print("Consumer not found.")
-        close_connection(conn)
+    if hire_id is None:
+        print("Chef not found.")
     else:
-        print("No chefs available.")
+        print("Chef hired successfully!")
+
+# Shows how many inbox items are waiting, for the menu labels.
+def unread_label(session):
+    """Returns ' (N new)' when the user has unseen hires or answers, else ''."""
+    try:
+        unread = services.count_unread(session)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return ""
+    return f" ({unread} new)" if unread else ""
+
+# Asks which hires a list should show.
+def ask_status_filter():
+    """Returns 'all', 'pending', 'accepted' or 'declined'."""
+    while True:
+        status = input("Show which requests? (all/pending/accepted/declined) [all]: ").strip().lower() or "all"
+        if status == "all" or status in services.STATUS_FILTERS:
+            return status
+        print("Invalid choice! Please enter all, pending, accepted or declined.")
 
 # Function to allow users to view their hiring request status
-def view_hiring_status(username):
+@action
+def view_hiring_status(session):
     """Allows consumers to view the status of their hiring requests."""
-    conn = create_connection()
-    query = '''
-        SELECT Chef_Hires.hire_id, Users.username AS chef_name, Chef_Hires.response, Chef_Hires.message, Chef_Hires.hire_date
-        FROM Chef_Hires
-        INNER JOIN Users ON Chef_Hires.chef_id = Users.user_id
-        WHERE Chef_Hires.consumer_id = (
-            SELECT user_id FROM Users WHERE username = ?
-        )
-    '''
-    cursor = execute_query(conn, query, (username,))
-    hires = fetch_all(cursor)
-    close_connection(conn)
-
-    if hires:
-        print("\nYour Hiring Requests:")
-        for hire_id, chef_name, response, message, hire_date in hires:
-            print(f"Hire ID: {hire_id}, Chef: {chef_name}, Date: {hire_date}")
-            print(f"Status: {response if response else 'Pending'}")
+    # Answers that arrived since the last visit come first; reading them marks them seen.
+    try:
+        updates = services.check_inbox(session)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
+    if updates:
+        print("\nNew Answers Since Your Last Check:")
+        for hire_id, chef_name, response, message, hire_date in updates:
+            print(f"Hire ID: {hire_id}, Chef: {chef_name}, Status: {response}")
             if message:
                 print(f"Message from Chef: {message}")
-            print("-" * 50)
-    else:
-        print("You have no hiring requests.") 
-        
+        if len(updates) == services.INBOX_LIMIT:
+            print("More new answers are waiting; open this list again to see them.")
+        print("-" * 50)
+
+    status = ask_status_filter()
+
+    def fetch(after=None, before=None):
+        return services.fetch_hire_status_page(session.user_id, after=after, before=before, status=status)
+
+    def show(i, row):
+        hire_id, chef_name, response, message, hire_date = row
+        print(f"Hire ID: {hire_id}, Chef: {chef_name}, Date: {hire_date}")
+        print(f"Status: {response if response else 'Pending'}")
+        if message:
+            print(f"Message from Chef: {message}")
+        print("-" * 50)
+
+    def choose(choice, rows):
+        print("Invalid input. Use 'n', 'p' or 'exit'.")
+        return False
+
+    page_through("Your Hiring Requests", fetch, show,
+                 "\nEnter 'n' or 'p' to change page (or 'exit' to go back): ",
+                 choose, "You have no hiring requests." if status == "all" else f"You have no {status} hiring requests.")
+
 # Displays the chef menu and allows them to choose actions.
-def chef_menu(username):
+def chef_menu(session):
     """Displays the chef menu."""
 
     # This function displays the chef menu and allows chefs to create recipes, view/edit their portfolio, and view hiring notifications.
@@ -401,18 +478,18 @@ def chef_menu(username):
         print("\nChef Menu:")
         print("1. Create Recipe")
         print("2. View/Edit Portfolio")
-        print("3. View and Respond to Hiring Notifications")
+        print(f"3. View and Respond to Hiring Notifications{unread_label(session)}")
         print("4. Exit")
 
         choice = input("What do you wish to do?: ")
         
         # Prompt user for action
         if choice == '1':
-            create_recipe(username)
+            create_recipe(session)
         elif choice == '2':
-            view_edit_portfolio(username)
+            view_edit_portfolio(session)
         elif choice == '3':
-            view_hiring_notifications(username)
+            view_hiring_notifications(session)
         elif choice == '4':
             print("Exiting chef menu...")
             break
@@ -420,119 +497,114 @@ def chef_menu(username):
             print("Invalid choice! Try again.")
 
 # Allows chefs to create a new recipe.
-def create_recipe(username):
+@action
+def create_recipe(session):
     """Allows chefs to create a recipe."""
-    conn = create_connection()
-    query = "SELECT user_id FROM Users WHERE username = ?"
-    cursor = execute_query(conn, query, (username,))
-    user = fetch_one(cursor)
-    
     # Check if the user is a chef
-    if user:
-        chef_id = user[0]
-        recipe_name = input("Enter recipe name: ")
-        ingredients = input("Enter ingredients (comma-separated): ")
-        instructions = input("Enter instructions: ")
+    if session.chef_id is None:
+        print("Chef not found.")
+        return
 
-        recipe_query = "INSERT INTO Recipes (recipe_name, ingredients, instructions, chef_id) VALUES (?, ?, ?, ?)"
-        execute_query(conn, recipe_query, (recipe_name, ingredients, instructions, chef_id))
-        print("Recipe created successfully!")
+    recipe_name = input("Enter recipe name: ")
+    ingredients = input("Enter ingredients (comma-separated): ")
+    instructions = input("Enter instructions: ")
 
-    # Check if the user is a chef
-    else:
-        print("Chef not found.")
-    close_connection(conn)
+    # Recipes.chef_id holds the author's user id.
+    try:
+        services.create_recipe(session.user_id, recipe_name, ingredients, instructions)
+    except ValueError as e:
+        print(e)
+        return
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
+    print("Recipe created successfully!")
 
 # Allows chefs to view or edit their portfolio.
-def view_edit_portfolio(username):
+@action
+def view_edit_portfolio(session):
     """Allows chefs to view or edit their portfolio."""
-    conn = create_connection()
-    query = '''
-        SELECT Chefs.portfolio_details
-        FROM Chefs
-        INNER JOIN Users ON Chefs.user_id = Users.user_id
-        WHERE Users.username = ?
-    '''
-    cursor = execute_query(conn, query, (username,))
-    portfolio = fetch_one(cursor)
+    try:
+        portfolio = services.fetch_portfolio(session.chef_id)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
 
     # Check if the user is a chef
-    if portfolio:
-        print(f"\nYour Portfolio: {portfolio[0]}")
-        edit_choice = input("Do you want to edit your portfolio? (yes/no): ").lower()
-        if edit_choice == 'yes':
-            new_portfolio = input("Enter new portfolio details: ")
-            update_query = '''
-                UPDATE Chefs
-                SET portfolio_details = ?
-                WHERE user_id = (SELECT user_id FROM Users WHERE username = ?)
-            '''
-            execute_query(conn, update_query, (new_portfolio, username))
-            print("Portfolio updated successfully!")
-    
-    # Check if the user is a chef
-    else:
+    if portfolio is None:
         print("Portfolio not found.")
-    close_connection(conn)
+        return
+
+    print(f"\nYour Portfolio: {portfolio}")
+    edit_choice = input("Do you want to edit your portfolio? (yes/no): ").lower()
+    if edit_choice == 'yes':
+        new_portfolio = input("Enter new portfolio details: ")
+        try:
+            updated = services.update_portfolio(session.chef_id, new_portfolio)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return
+        print("Portfolio updated successfully!" if updated else "Portfolio not found.")
 
 # Allows chefs to view and respond to hiring notifications.
-def view_hiring_notifications(username):
+@action
+def view_hiring_notifications(session):
     """Allows chefs to view hiring notifications and respond to them."""
-    conn = create_connection()
-    query = '''
-        SELECT Chef_Hires.hire_id, Users.username AS consumer_name, Chef_Hires.hire_date
-        FROM Chef_Hires
-        INNER JOIN Users ON Chef_Hires.consumer_id = Users.user_id
-        WHERE Chef_Hires.chef_id = (
-            SELECT chef_id FROM Chefs
-            INNER JOIN Users ON Chefs.user_id = Users.user_id
-            WHERE Users.username = ?
-        )
-    '''
-    cursor = execute_query(conn, query, (username,))
-    hires = fetch_all(cursor)
-
-    if hires:
-        print("\nHiring Notifications:")
-        for hire_id, consumer_name, hire_date in hires:
+    # Hires that arrived since the last visit come first; reading them marks them seen.
+    try:
+        new_hires = services.check_inbox(session)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return
+    if new_hires:
+        print("\nNew Hiring Requests Since Your Last Check:")
+        for hire_id, consumer_name, hire_date, response in new_hires:
             print(f"Hire ID: {hire_id}, Consumer: {consumer_name}, Hire Date: {hire_date}")
-
-        while True:
-            choice = input("\nEnter the Hire ID to respond to (or 'exit' to go back): ")
-            if choice.lower() == 'exit':
-                break
-            if choice.isdigit():
-                hire_id = int(choice)
-                # Check if the hire ID exists
-                if any(hire[0] == hire_id for hire in hires):
-                    response = input("Do you want to accept or decline this request? (accept/decline): ").lower()
-                    if response in ['accept', 'decline']:
-                        message = input("Enter a message for the consumer: ")
-                        send_response_to_consumer(hire_id, response, message)
+        if len(new_hires) == services.INBOX_LIMIT:
+            print("More new requests are waiting; open this list again to see them.")
+        print("-" * 50)
+
+    status = ask_status_filter()
+
+    def fetch(after=None, before=None):
+        return fetch_notification_page(session.chef_id, after=after, before=before, status=status)
+
+    def show(i, row):
+        hire_id, consumer_name, hire_date, response = row
+        print(f"Hire ID: {hire_id}, Consumer: {consumer_name}, Hire Date: {hire_date}, "
+              f"Status: {response if response else 'Pending'}")
+
+    def choose(choice, hires):
+        if choice.isdigit():
+            hire_id = int(choice)
+            # Check if the hire ID exists
+            if any(hire[0] == hire_id for hire in hires):
+                response = input("Do you want to accept or decline this request? (accept/decline): ").lower()
+                if response in ['accept', 'decline']:
+                    message = input("Enter a message for the consumer: ")
+                    if send_response_to_consumer(hire_id, response, message, session.chef_id):
                         print(f"Response '{response}' sent to the consumer.")
-                    else:
-                        print("Invalid response. Please enter 'accept' or 'decline'.")
                 else:
-                    print("Invalid Hire ID. Please try again.")
+                    print("Invalid response. Please enter 'accept' or 'decline'.")
             else:
-                print("Invalid input. Please enter a valid Hire ID.")
-    else:
-        print("No hiring notifications found.")
+                print("Invalid Hire ID. Please try again.")
+        else:
+            print("Invalid input. Please enter a valid Hire ID.")
+        return False
 
-    close_connection(conn)
+    page_through("Hiring Notifications", fetch, show,
+                 "\nEnter the Hire ID to respond to (or 'exit' to go back): ",
+                 choose, "No hiring notifications found." if status == "all" else f"No {status} hiring notifications found.")
 
 # Function to send responses to consumers.
-def send_response_to_consumer(hire_id, response, message):
+def send_response_to_consumer(hire_id, response, message, chef_id=None):
     """Sends the chef's response to the consumer."""
-    conn = create_connection()
-    query = '''
-        UPDATE Chef_Hires
-        SET response = ?, message = ?
-        WHERE hire_id = ?
-    '''
-    execute_query(conn, query, (response, message, hire_id))
-    close_connection(conn)
-    
+    try:
+        return services.respond_to_hire(hire_id, response, message, chef_id)
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return False
+
 # Main function to handle user interaction.
 def main():
         """Main function to handle user interaction."""
@@ -562,13 +634,13 @@ def main():
             elif choice == '2':
                 username = input("Enter username: ")
                 password = input("Enter password: ")
-                user_id, username, role = login(username, password)
-                if user_id:
-                    print(f"Welcome, {username} as a ({role})!")
-                    if role == "Consumer":
-                        consumer_menu(username)
-                    elif role == "Chef":
-                        chef_menu(username)
+                session = login(username, password)
+                if session:
+                    print(f"Welcome, {session.username} as a ({session.role})!")
+                    if session.role == "Consumer":
+                        consumer_menu(session)
+                    elif session.role == "Chef":
+                        chef_menu(session)
                 else:
                     print("Invalid username or password. Please try again.")
             elif choice == '3':
@@ -577,6 +649,10 @@ def main():
             else:
                 print("Invalid choice! Please try again.")
 
-# The main function is the entry point of the program.
+# The main function is the entry point of the program; arguments such as
+# `import recipes recipes.csv` run a bulk import or export instead.
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        import bulk_io
+        sys.exit(bulk_io.main(sys.argv[1:]))
     main()
@@ -0,0 +1,655 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+
+import instrumentation
+
+# Directory of a sharded deployment (see sharding.py); its catalog.db is
+# then the default database and user data is routed to the shard files.
+SHARD_DIR = os.environ.get("FORKS_AND_FOLKS_SHARD_DIR")
+
+# Default database file, overridable for deployments and benchmarks.
+DATABASE_PATH = (os.path.join(SHARD_DIR, "catalog.db") if SHARD_DIR
+                 else os.environ.get("FORKS_AND_FOLKS_DB", "forks_and_folks.db"))
+
+# Upper bound on open connections per database file.
+POOL_SIZE = int(os.environ.get("FORKS_AND_FOLKS_POOL_SIZE", "5"))
+
+# Seconds a caller waits for a free connection before giving up.
+CHECKOUT_TIMEOUT = float(os.environ.get("FORKS_AND_FOLKS_CHECKOUT_TIMEOUT", "5"))
+
+# Seconds a connection may stay checked out before it is reported as a leak.
+LEAK_THRESHOLD = float(os.environ.get("FORKS_AND_FOLKS_LEAK_THRESHOLD", "30"))
+
+# Rows shown per page in list views.
+PAGE_SIZE = int(os.environ.get("FORKS_AND_FOLKS_PAGE_SIZE", "10"))
+
+# Rows pulled from SQLite per round trip when streaming a result set.
+STREAM_BATCH_SIZE = 500
+
+# PRAGMAs applied once to every new connection, in order.
+CONNECTION_PRAGMAS = (
+    ("temp_store", "MEMORY"),
+)
+
+# Named storage profiles applied when a pooled connection is opened.
+# busy_retries/busy_backoff control how often (and how long, in seconds,
+# doubling each time) a statement is retried when SQLite reports the
+# database as busy or locked after busy_timeout has already expired.
+STORAGE_PROFILES = {
+    # What the app ran with before: rollback journal, fsync on every commit.
+    "legacy": {
+        "busy_timeout": 5000,
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "mmap_size": 0,
+        "cache_size": -2000,
+        "busy_retries": 0,
+        "busy_backoff": 0.0,
+    },
+    # WAL lets readers run alongside the single writer; NORMAL sync is
+    # still crash-safe in WAL mode, only the last commits may be lost on
+    # power failure.
+    "concurrent": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,
+        "busy_retries": 5,
+        "busy_backoff": 0.01,
+    },
+    # WAL concurrency without giving up durability of the last commit.
+    "durable": {
+        "busy_timeout": 10000,
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,
+        "busy_retries": 8,
+        "busy_backoff": 0.02,
+    },
+}
+
+# Profile used for new pools; individual settings can be overridden below.
+STORAGE_PROFILE = os.environ.get("FORKS_AND_FOLKS_STORAGE_PROFILE", "concurrent")
+
+# Environment overrides for single settings of the active profile.
+_STORAGE_OVERRIDES = {
+    "busy_timeout": "FORKS_AND_FOLKS_BUSY_TIMEOUT",
+    "synchronous": "FORKS_AND_FOLKS_SYNCHRONOUS",
+    "mmap_size": "FORKS_AND_FOLKS_MMAP_SIZE",
+    "cache_size": "FORKS_AND_FOLKS_CACHE_SIZE",
+}
+
+# Settings that are not PRAGMAs.
+_RETRY_SETTINGS = ("busy_retries", "busy_backoff")
+
+# SQLite primary result codes that mean "try again later".
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes free within the timeout."""
+
+
+# Resolves a storage profile name plus overrides into concrete settings.
+def storage_profile(name=None, **overrides):
+    """Returns the settings dict for a named storage profile."""
+    name = name or STORAGE_PROFILE
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile {name!r}; choose from {sorted(STORAGE_PROFILES)}.")
+    settings = dict(STORAGE_PROFILES[name])
+    if name == STORAGE_PROFILE:
+        for key, variable in _STORAGE_OVERRIDES.items():
+            if variable in os.environ:
+                settings[key] = os.environ[variable]
+    settings.update(overrides)
+    return settings
+
+
+# Turns a storage profile into the ordered PRAGMA list for new connections.
+def profile_pragmas(settings):
+    """Returns (name, value) PRAGMA pairs for a storage profile."""
+    # busy_timeout goes first so switching journal_mode can wait for locks.
+    names = ["busy_timeout"] + [key for key in settings if key != "busy_timeout"]
+    return tuple(
+        (key, settings[key]) for key in names
+        if key in settings and key not in _RETRY_SETTINGS
+    )
+
+
+# Tells whether an error is SQLite reporting lock contention.
+def is_busy_error(error):
+    """Returns True for SQLITE_BUSY/SQLITE_LOCKED errors."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (SQLITE_BUSY, SQLITE_LOCKED)
+    message = str(error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+# Runs an operation, retrying with exponential backoff while the database is busy.
+def retry_on_busy(operation, retries, backoff, pool=None):
+    """Calls operation() and retries it on SQLITE_BUSY up to `retries` times."""
+    attempt = 0
+    while True:
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if attempt >= retries or not is_busy_error(e):
+                if pool is not None and is_busy_error(e):
+                    pool._count("busy_failures")
+                raise
+            if pool is not None:
+                pool._count("busy_retries")
+            # Full jitter keeps retrying writers from waking up in lockstep.
+            time.sleep(random.uniform(0, backoff * (2 ** attempt)))
+            attempt += 1
+
+
+# Wraps a pooled sqlite3 connection so close() returns it to the pool.
+class PooledConnection:
+    """A checked-out connection; closing it hands it back to its pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        # Nesting level of transaction() blocks currently open on this connection.
+        self.transaction_depth = 0
+        # Whether statement errors raise even outside a transaction(); see strict_connection().
+        self.raise_errors = False
+        self.checked_out_at = time.monotonic()
+        self.checked_out_by = _caller_description()
+        # If the caller drops this object without closing it, reclaim the
+        # underlying connection instead of leaking it.
+        self._finalizer = weakref.finalize(self, pool._reclaim, raw)
+        self._finalizer.atexit = False
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a returned connection.")
+        return getattr(raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @property
+    def closed(self):
+        return self._raw is None
+
+    def close(self):
+        """Returns the connection to the pool."""
+        if self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        self._finalizer.detach()
+        self._pool._release(raw, self)
+
+
+# A bounded, thread-safe pool of connections to one database file.
+class ConnectionPool:
+    """Keeps up to max_size long-lived connections to a single database."""
+
+    def __init__(self, path, max_size=POOL_SIZE, timeout=CHECKOUT_TIMEOUT,
+                 pragmas=CONNECTION_PRAGMAS, leak_threshold=LEAK_THRESHOLD,
+                 profile=None):
+        self.path = path
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.profile = profile if isinstance(profile, dict) else storage_profile(profile)
+        self.pragmas = tuple(pragmas) + profile_pragmas(self.profile)
+        self.busy_retries = int(self.profile.get("busy_retries", 0))
+        self.busy_backoff = float(self.profile.get("busy_backoff", 0.0))
+        self.leak_threshold = leak_threshold
+        # Re-entrant because leak reclamation can run from the garbage
+        # collector while this thread already holds the lock.
+        self._condition = threading.Condition(threading.RLock())
+        self._idle = []
+        self._in_use = weakref.WeakSet()
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            "connections_opened": 0,
+            "checkouts": 0,
+            "returns": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "exhausted": 0,
+            "timeouts": 0,
+            "leaks_reclaimed": 0,
+            "busy_retries": 0,
+            "busy_failures": 0,
+        }
+
+    def _open(self):
+        """Opens and configures a new raw connection."""
+        raw = sqlite3.connect(self.path, check_same_thread=False)
+        for name, value in self.pragmas:
+            raw.execute(f"PRAGMA {name} = {value}")
+        with self._condition:
+            self._stats["connections_opened"] += 1
+        return raw
+
+    def _count(self, counter, amount=1):
+        """Bumps one of the pool counters."""
+        with self._condition:
+            self._stats[counter] += amount
+
+    def acquire(self):
+        """Checks out a connection, waiting up to the pool timeout."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        raw = None
+        with self._condition:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed.")
+            if not self._idle and self._size >= self.max_size:
+                self._stats["exhausted"] += 1
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"No database connection available after {self.timeout}s "
+                        f"({self._size} in use)."
+                    )
+                self._condition.wait(remaining)
+            if self._idle:
+                raw = self._idle.pop()
+            else:
+                # Reserve the slot now; the connection is opened outside the lock.
+                self._size += 1
+        if raw is None:
+            try:
+                raw = self._open()
+            except BaseException:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+        waited = time.monotonic() - start
+        conn = PooledConnection(self, raw)
+        with self._condition:
+            self._stats["checkouts"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+            self._in_use.add(conn)
+        return conn
+
+    def _reset(self, raw):
+        """Rolls back anything the previous holder left uncommitted."""
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+            return True
+        except sqlite3.Error:
+            raw.close()
+            return False
+
+    def _release(self, raw, conn=None):
+        """Puts a raw connection back into the idle list."""
+        reusable = self._reset(raw)
+        with self._condition:
+            if conn is not None:
+                self._in_use.discard(conn)
+            self._stats["returns"] += 1
+            if reusable and not self._closed:
+                self._idle.append(raw)
+            else:
+                if reusable:
+                    raw.close()
+                self._size -= 1
+            self._condition.notify()
+
+    def _reclaim(self, raw):
+        """Called when a checked-out connection was dropped without close()."""
+        with self._condition:
+            self._stats["leaks_reclaimed"] += 1
+        self._release(raw)
+
+    def leaked_connections(self, threshold=None):
+        """Lists connections held longer than the leak threshold."""
+        threshold = self.leak_threshold if threshold is None else threshold
+        now = time.monotonic()
+        with self._condition:
+            held = list(self._in_use)
+        return [
+            {"held_for": now - conn.checked_out_at, "checked_out_by": conn.checked_out_by}
+            for conn in held
+            if now - conn.checked_out_at >= threshold
+        ]
+
+    def stats(self):
+        """Returns a snapshot of the pool counters."""
+        with self._condition:
+            snapshot = dict(self._stats)
+            snapshot["size"] = self._size
+            snapshot["idle"] = len(self._idle)
+            snapshot["in_use"] = len(self._in_use)
+            snapshot["max_size"] = self.max_size
+            snapshot["journal_mode"] = self.profile.get("journal_mode")
+        snapshot["leaked"] = len(self.leaked_connections())
+        return snapshot
+
+    def close(self):
+        """Closes idle connections; busy ones are closed when returned."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for raw in idle:
+            raw.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# Describes the function that checked a connection out, for leak reports.
+def _caller_description():
+    """Returns 'function (file:line)' for the code that requested a connection."""
+    frame = sys._getframe(1)
+    here = frame.f_code.co_filename
+    while frame is not None and frame.f_code.co_filename == here:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+# Returns the shared pool for a database file, creating it on first use.
+def get_pool(path=None):
+    """Returns the connection pool for the given database path."""
+    path = path or DATABASE_PATH
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+
+# Points the default pool at another database file.
+def set_database_path(path):
+    """Changes the default database used by create_connection()."""
+    global DATABASE_PATH
+    DATABASE_PATH = path
+
+
+# Selects the storage profile used by pools created from now on.
+def set_storage_profile(name):
+    """Changes the default storage profile for new connection pools."""
+    global STORAGE_PROFILE
+    storage_profile(name)
+    STORAGE_PROFILE = name
+
+
+# Checks a connection out of the pool.
+def create_connection(path=None):
+    """Returns a pooled database connection; close it to give it back."""
+    return get_pool(path).acquire()
+
+
+# Checks out a connection whose statement errors are raised, not printed.
+def strict_connection(path=None):
+    """Like create_connection(), but execute_query() raises sqlite3.Error outside a transaction too.
+
+    For callers that report errors themselves, so a failed read is never
+    mistaken for an empty result.
+    """
+    conn = create_connection(path)
+    conn.raise_errors = True
+    return conn
+
+
+# Returns a pooled connection (or closes a plain one).
+def close_connection(conn):
+    """Closes a database connection."""
+    if conn:
+        conn.close()
+
+
+# Summarises pool counters for every database file in use.
+def pool_stats(path=None):
+    """Returns pool statistics for one database, or all of them."""
+    if path is not None:
+        return get_pool(path).stats()
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.path: pool.stats() for pool in pools}
+
+
+# Closes every pool, e.g. at shutdown or between benchmark runs.
+def close_all_pools():
+    """Closes all connection pools."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+# Closes the pool of one database file, e.g. before the file is copied.
+def close_pool(path=None):
+    """Closes the connection pool for path, if one is open."""
+    path = path or DATABASE_PATH
+    with _pools_lock:
+        pool = _pools.pop(path, None)
+    if pool:
+        pool.close()
+
+
+# Tells whether a connection is inside a transaction() block.
+def in_unit_of_work(conn):
+    """Returns True while statements on conn belong to an open transaction."""
+    return getattr(conn, "transaction_depth", 0) > 0
+
+
+# Retries an operation on a connection using its pool's busy settings.
+def _with_busy_retry(conn, operation):
+    """Runs operation() with the retry policy of the connection's pool."""
+    pool = getattr(conn, "_pool", None)
+    if pool is None:
+        return operation()
+    return retry_on_busy(operation, pool.busy_retries, pool.busy_backoff, pool)
+
+
+# Groups several statements into one atomic commit.
+@contextmanager
+def transaction(conn=None, immediate=True, path=None):
+    """Runs the enclosed statements as a single unit of work.
+
+    Statements issued through execute_query()/execute_many() inside the block
+    are committed together when it exits, or rolled back if it raises. Nested
+    blocks become savepoints. Without a connection, one is checked out of the
+    pool of path (default: DATABASE_PATH) for the duration of the block.
+    """
+    owned = conn is None
+    if owned:
+        conn = create_connection(path)
+    depth = conn.transaction_depth
+    savepoint = f"uow_{depth}"
+    try:
+        if depth == 0:
+            if not conn.in_transaction:
+                begin = "BEGIN IMMEDIATE" if immediate else "BEGIN"
+                _with_busy_retry(conn, lambda: conn.execute(begin))
+        else:
+            conn.execute(f"SAVEPOINT {savepoint}")
+        conn.transaction_depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            if depth == 0:
+                conn.rollback()
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            raise
+        else:
+            if depth == 0:
+                conn.commit()
+            else:
+                conn.execute(f"RELEASE {savepoint}")
+        finally:
+            conn.transaction_depth = depth
+    finally:
+        if owned:
+            close_connection(conn)
+
+
+# Defining the function executes queries  for executing SQL queries
+def execute_query(conn, query, params=None):
+    """Executes a SQL query.
+
+    Outside a transaction() block the statement is committed immediately,
+    retried while the database is busy, and errors are printed (or raised,
+    on a strict_connection()). Inside one, the commit is left to the block
+    and errors propagate so the whole unit of work rolls back.
+    """
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    try:
+        if in_unit_of_work(conn):
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+        else:
+            _with_busy_retry(conn, lambda: _execute_and_commit(conn, cursor.execute, query, params or None))
+        instrumentation.record_execute(cursor, query, params, time.perf_counter() - start)
+        return cursor
+    except sqlite3.Error as e:
+        instrumentation.record_execute(cursor, query, params, time.perf_counter() - start, error=True)
+        if in_unit_of_work(conn) or getattr(conn, "raise_errors", False):
+            raise
+        print(f"Database error: {e}")
+        return None
+
+
+# Executes one statement for every parameter tuple in a single pass.
+def execute_many(conn, query, seq_of_params):
+    """Executes a SQL statement once per parameter set, like execute_query()."""
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    try:
+        if in_unit_of_work(conn):
+            cursor.executemany(query, seq_of_params)
+        else:
+            # A generator can only be consumed once, so materialise it for retries.
+            seq_of_params = list(seq_of_params)
+            _with_busy_retry(conn, lambda: _execute_and_commit(conn, cursor.executemany, query, seq_of_params))
+        # No plan is captured for executemany, so no parameters are passed on.
+        instrumentation.record_execute(cursor, query, None, time.perf_counter() - start)
+        return cursor
+    except sqlite3.Error as e:
+        instrumentation.record_execute(cursor, query, None, time.perf_counter() - start, error=True)
+        if in_unit_of_work(conn) or getattr(conn, "raise_errors", False):
+            raise
+        print(f"Database error: {e}")
+        return None
+
+
+# Runs one autocommitted statement, undoing it if the commit cannot complete.
+def _execute_and_commit(conn, execute, query, params):
+    """Executes and commits; rolls back on failure so a retry starts clean."""
+    try:
+        if params is None:
+            execute(query)
+        else:
+            execute(query, params)
+        conn.commit()
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+# Fetches all rows of data from the result set of a previously executed SQL query.
+def fetch_all(cursor):
+    """Fetches all results from a cursor."""
+    if cursor:
+        start = time.perf_counter()
+        rows = cursor.fetchall()
+        instrumentation.record_fetch(cursor, time.perf_counter() - start, len(rows))
+        return rows
+    return None
+
+
+# Fetches a single row of data from the result set of a previously executed SQL query.
+def fetch_one(cursor):
+    """ Fetches a single result from a cursor."""
+    if cursor:
+        start = time.perf_counter()
+        row = cursor.fetchone()
+        instrumentation.record_fetch(cursor, time.perf_counter() - start, int(row is not None))
+        return row
+    return None
+
+
+# Fetches one page of a query using keyset (cursor-based) pagination.
+def fetch_page(conn, select, key, params=(), where=None, after=None, before=None, page_size=None):
+    """Returns (rows, has_more) for the page after or before a key value.
+
+    select is a SELECT ... FROM ... clause without WHERE/ORDER BY/LIMIT, and
+    key is a unique, indexed column that is also the first selected column.
+    With after, rows with a larger key are returned and has_more tells
+    whether a further page exists; with before, the rows just below the key
+    are returned (still in ascending order) and has_more tells whether an
+    earlier page exists. Each page costs an index seek, however deep it is.
+    """
+    page_size = page_size or PAGE_SIZE
+    conditions = [where] if where else []
+    params = tuple(params)
+    if after is not None:
+        conditions.append(f"{key} > ?")
+        params += (after,)
+    elif before is not None:
+        conditions.append(f"{key} < ?")
+        params += (before,)
+    direction = "DESC" if before is not None else "ASC"
+    query = select
+    if conditions:
+        query += " WHERE " + " AND ".join(f"({condition})" for condition in conditions)
+    query += f" ORDER BY {key} {direction} LIMIT ?"
+    cursor = execute_query(conn, query, params + (page_size + 1,))
+    rows = fetch_all(cursor) or []
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before is not None:
+        rows.reverse()
+    return rows, has_more
+
+
+# Streams the rows of a query in batches instead of materializing them all.
+def stream_query(query, params=(), batch_size=STREAM_BATCH_SIZE, path=None):
+    """Yields rows one at a time; the connection is held until the generator finishes."""
+    conn = create_connection(path)
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        close_connection(conn)
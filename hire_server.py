@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+"""Line-protocol server for the hiring flow, built on asyncio streams.
+
+Each request and response is one JSON object per line:
+
+    {"op": "login", "username": "Buke", "password": "..."}
+    {"op": "chefs", "after": 10}                  list chefs (keyset paged)
+    {"op": "recommend", "cuisine": "kenyan"}       top chefs by precomputed ranking (cuisine, limit optional)
+    {"op": "hire", "chef_id": 3}                   consumers
+    {"op": "status", "status": "pending"}          consumers (keyset paged)
+    {"op": "notifications", "after": 120}          chefs (keyset paged)
+    {"op": "inbox"}                                anyone: up to 100 items new since the last inbox call
+    {"op": "respond", "hire_id": 7, "response": "accept", "message": "See you"}
+    {"op": "metrics"}                              query timings, slow queries, pool and cache counters
+
+Replies carry "ok" plus the result, or "ok": false and an "error". An "id"
+field in a request is echoed back. Requests on one connection are answered
+in order; connections are served concurrently.
+
+    python3 hire_server.py --port 8765
+"""
+
+import os
+import json
+import asyncio
+import sqlite3
+import argparse
+
+import instrumentation
+from migrations import prepare_database
+from write_queue import create_write_queue
+from async_services import AsyncHiringService
+
+HOST = os.environ.get("FORKS_AND_FOLKS_HOST", "127.0.0.1")
+PORT = int(os.environ.get("FORKS_AND_FOLKS_PORT", "8765"))
+
+# Set to 0 to commit each hire and response on its own instead of in batches.
+WRITE_QUEUE = os.environ.get("FORKS_AND_FOLKS_WRITE_QUEUE", "1") != "0"
+
+# Longest request line accepted, in bytes.
+MAX_LINE = 64 * 1024
+
+# Most chefs one recommend request may ask for.
+MAX_RECOMMENDATIONS = 100
+
+
+# A request the client got wrong; reported back without closing the connection.
+class RequestError(Exception):
+    pass
+
+
+# Reads an optional integer field from a request.
+def _int_field(request, name, required=False):
+    value = request.get(name)
+    if value is None:
+        if required:
+            raise RequestError(f"{name} is required")
+        return None
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise RequestError(f"{name} must be an integer")
+    return value
+
+
+# Reads an optional string field from a request.
+def _str_field(request, name):
+    value = request.get(name)
+    if value is not None and not isinstance(value, str):
+        raise RequestError(f"{name} must be a string")
+    return value
+
+
+# Reads an optional true/false field from a request.
+def _bool_field(request, name, default):
+    value = request.get(name, default)
+    if not isinstance(value, bool):
+        raise RequestError(f"{name} must be true or false")
+    return value
+
+
+# Serves the hiring operations to connected clients.
+class HireServer:
+    """Dispatches JSON line requests to an AsyncHiringService."""
+
+    def __init__(self, service=None, write_queue=WRITE_QUEUE):
+        self.service = service or AsyncHiringService(write_queue=create_write_queue() if write_queue else None)
+        self.connections = 0
+        self.requests = 0
+
+    async def handle_connection(self, reader, writer):
+        """Answers requests from one client until it disconnects."""
+        self.connections += 1
+        session = None
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(b'{"ok": false, "error": "request line too long"}\n')
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                self.requests += 1
+                reply, session = await self.dispatch(line, session)
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, line, session):
+        """Runs one request; returns (reply, session after the request)."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            request_id = request.get("id")
+            op = request.get("op")
+            if op == "login":
+                session = await self.service.login(str(request.get("username", "")), str(request.get("password", "")))
+                if session is None:
+                    raise RequestError("invalid username or password")
+                reply = {"user_id": session.user_id, "role": session.role, "chef_id": session.chef_id}
+            elif op == "chefs":
+                chefs, has_more = await self.service.list_chefs(_int_field(request, "after"), _int_field(request, "before"))
+                reply = {"chefs": chefs, "has_more": has_more}
+            elif op == "recommend":
+                limit = _int_field(request, "limit")
+                limit = 10 if limit is None else limit
+                if not 1 <= limit <= MAX_RECOMMENDATIONS:
+                    raise RequestError(f"limit must be between 1 and {MAX_RECOMMENDATIONS}")
+                cuisine = _str_field(request, "cuisine")
+                chefs = await self.service.recommend_chefs(cuisine, limit)
+                reply = {"chefs": [chef._asdict() for chef in chefs]}
+            elif session is None:
+                raise RequestError("log in first")
+            elif op == "metrics":
+                # Statement text and query plans are not for anonymous clients.
+                reply = {"metrics": instrumentation.collect()}
+                if self.service.write_queue:
+                    reply["metrics"]["write_queue"] = self.service.write_queue.stats()
+            elif op == "hire":
+                self._require_role(session, "Consumer")
+                hire_id = await self.service.hire_chef(session.user_id, _int_field(request, "chef_id", required=True))
+                if hire_id is None:
+                    raise RequestError("chef not found")
+                reply = {"hire_id": hire_id}
+            elif op == "status":
+                self._require_role(session, "Consumer")
+                hires, has_more = await self.service.hiring_status(
+                    session.user_id, _int_field(request, "after"), _int_field(request, "before"), _str_field(request, "status"))
+                reply = {"hires": hires, "has_more": has_more}
+            elif op == "notifications":
+                self._require_role(session, "Chef")
+                hires, has_more = await self.service.notifications(
+                    session.chef_id, _int_field(request, "after"), _int_field(request, "before"), _str_field(request, "status"))
+                reply = {"hires": hires, "has_more": has_more}
+            elif op == "inbox":
+                if session.role == "Chef" and session.chef_id is None:
+                    raise RequestError("no chef profile")
+                reply = {"items": await self.service.check_inbox(session, _bool_field(request, "mark_seen", True))}
+            elif op == "respond":
+                self._require_role(session, "Chef")
+                updated = await self.service.respond_to_hire(
+                    _int_field(request, "hire_id", required=True), _str_field(request, "response"),
+                    str(request.get("message", "")), session.chef_id)
+                if not updated:
+                    raise RequestError("hire not found")
+                reply = {}
+            else:
+                raise RequestError(f"unknown op {op!r}")
+            reply["ok"] = True
+        except json.JSONDecodeError:
+            reply = {"ok": False, "error": "invalid JSON"}
+        except (RequestError, ValueError) as e:
+            reply = {"ok": False, "error": str(e)}
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            reply = {"ok": False, "error": "database error"}
+        if request_id is not None:
+            reply["id"] = request_id
+        return reply, session
+
+    @staticmethod
+    def _require_role(session, role):
+        if session.role != role or (role == "Chef" and session.chef_id is None):
+            raise RequestError(f"only a {role.lower()} can do that")
+
+    async def start(self, host=HOST, port=PORT):
+        """Starts listening; returns the asyncio.Server."""
+        return await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE)
+
+    def close(self):
+        """Stops the service's worker threads."""
+        self.service.close()
+
+
+# Runs the server until interrupted.
+async def serve(host=HOST, port=PORT, write_queue=WRITE_QUEUE):
+    """Listens on host:port and serves forever."""
+    server = HireServer(write_queue=write_queue)
+    listener = await server.start(host, port)
+    address = listener.sockets[0].getsockname()
+    print(f"Hire server listening on {address[0]}:{address[1]}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the hiring flow over a JSON line protocol.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--no-write-queue", dest="write_queue", action="store_false", default=WRITE_QUEUE,
+                        help="commit each hire and response on its own")
+    args = parser.parse_args(argv)
+    prepare_database()
+    try:
+        asyncio.run(serve(args.host, args.port, args.write_queue))
+    except KeyboardInterrupt:
+        print("Shutting down...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+
+import time
+import heapq
+import threading
+from collections import Counter
+from database import strict_connection, close_connection, execute_query, execute_many, fetch_all, fetch_one
+
+# Seconds between checks for recipes added by other processes.
+INDEX_REFRESH_SECONDS = 5.0
+
+# Rows read per batch when (re)building the index.
+BATCH_SIZE = 10000
+
+# Most values bound in one IN (...) list; SQLite caps variables per statement.
+MAX_IN_PARAMS = 500
+
+
+# Normalizes one ingredient name so "Chicken  Breast" and "chicken breast" match.
+def normalize_ingredient(name):
+    """Lower-cases an ingredient name and collapses whitespace."""
+    return " ".join(name.lower().split()).strip(" .;")
+
+
+# Splits the free-text Recipes.ingredients column into normalized names.
+def parse_ingredients(text):
+    """Returns the distinct normalized ingredient names in a comma-separated list."""
+    names = []
+    for part in (text or "").split(","):
+        name = normalize_ingredient(part)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+# Writes the Recipe_Ingredients rows for one recipe.
+def index_recipe_ingredients(conn, recipe_id, ingredients_text):
+    """Replaces the join-table rows for a recipe.
+
+    Call it inside the transaction that writes the recipe, and call
+    invalidate_ingredient_index() once that transaction has committed.
+    """
+    execute_query(conn, "DELETE FROM Recipe_Ingredients WHERE recipe_id = ?", (recipe_id,))
+    execute_many(conn, "INSERT OR IGNORE INTO Recipe_Ingredients (ingredient, recipe_id) VALUES (?, ?)",
+                 [(name, recipe_id) for name in parse_ingredients(ingredients_text)])
+
+
+# Fills Recipe_Ingredients from the text column of every recipe.
+def backfill_recipe_ingredients(conn, after_recipe_id=0):
+    """Indexes recipes with an id above after_recipe_id, in batches."""
+    last_id = after_recipe_id
+    while True:
+        rows = conn.execute(
+            "SELECT recipe_id, ingredients FROM Recipes WHERE recipe_id > ? ORDER BY recipe_id LIMIT ?",
+            (last_id, BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        execute_many(conn, "INSERT OR IGNORE INTO Recipe_Ingredients (ingredient, recipe_id) VALUES (?, ?)",
+                     [(name, recipe_id) for recipe_id, text in rows for name in parse_ingredients(text)])
+        last_id = rows[-1][0]
+
+
+# Fills Ingredients.normalized_name for rows written before the column existed.
+def backfill_normalized_names(conn):
+    """Sets normalized_name on every ingredient, in batches."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT ingredient_id, ingredient_name FROM Ingredients WHERE ingredient_id > ? ORDER BY ingredient_id LIMIT ?",
+            (last_id, BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        execute_many(conn, "UPDATE Ingredients SET normalized_name = ? WHERE ingredient_id = ?",
+                     [(normalize_ingredient(name), ingredient_id) for ingredient_id, name in rows])
+        last_id = rows[-1][0]
+
+
+
+class IngredientIndex:
+    """Maps each ingredient to the set of recipe ids that use it."""
+
+    def __init__(self):
+        self.postings = {}
+        self.sizes = {}
+        self.max_recipe_id = 0
+        self.checked_at = 0.0
+
+    def load(self, conn, after_recipe_id=0):
+        """Adds every recipe with an id above after_recipe_id."""
+        cursor = conn.execute(
+            "SELECT ingredient, recipe_id FROM Recipe_Ingredients WHERE recipe_id > ?",
+            (after_recipe_id,),
+        )
+        additions = {}
+        sizes = self.sizes
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            for ingredient, recipe_id in rows:
+                additions.setdefault(ingredient, []).append(recipe_id)
+                sizes[recipe_id] = sizes.get(recipe_id, 0) + 1
+                if recipe_id > self.max_recipe_id:
+                    self.max_recipe_id = recipe_id
+        # Replace posting sets instead of mutating them so concurrent
+        # searches never iterate a set that is changing size.
+        for ingredient, recipe_ids in additions.items():
+            existing = self.postings.get(ingredient)
+            self.postings[ingredient] = existing.union(recipe_ids) if existing else set(recipe_ids)
+        self.checked_at = time.monotonic()
+
+    def recipes_with_all(self, names):
+        """Returns the ids of recipes that use every one of the ingredients."""
+        sets = [self.postings.get(name, set()) for name in names]
+        if not sets:
+            return set()
+        sets.sort(key=len)
+        return set.intersection(*sets)
+
+    def recipes_with_any(self, names):
+        """Counts, per recipe, how many of the ingredients it uses."""
+        counts = Counter()
+        for name in names:
+            counts.update(self.postings.get(name, ()))
+        return counts
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+# Marks the in-memory index as needing a refresh before its next use.
+def invalidate_ingredient_index():
+    """Forces the next search to pick up recipes written since the last load."""
+    if _index is not None:
+        _index.checked_at = 0.0
+
+
+# Returns the shared index, loading it or topping it up when needed.
+def get_ingredient_index():
+    """Returns an IngredientIndex that reflects the current database."""
+    global _index
+    index = _index
+    if index is not None and time.monotonic() - index.checked_at < INDEX_REFRESH_SECONDS:
+        return index
+    with _index_lock:
+        conn = strict_connection()
+        try:
+            if _index is None:
+                index = IngredientIndex()
+                index.load(conn)
+                _index = index
+            else:
+                index = _index
+                # New recipes only ever get higher ids, so read just those.
+                latest = fetch_one(execute_query(conn, "SELECT MAX(recipe_id) FROM Recipe_Ingredients"))[0] or 0
+                if latest > index.max_recipe_id:
+                    index.load(conn, index.max_recipe_id)
+                index.checked_at = time.monotonic()
+        finally:
+            close_connection(conn)
+    return index
+
+
+# Looks up names and ingredient lists for a handful of recipe ids.
+def _recipe_details(recipe_ids):
+    """Returns {recipe_id: (recipe_name, ingredients)} for the given ids."""
+    if not recipe_ids:
+        return {}
+    conn = strict_connection()
+    try:
+        rows = _select_in(conn, "SELECT recipe_id, recipe_name, ingredients FROM Recipes WHERE recipe_id IN ({})",
+                          recipe_ids)
+    finally:
+        close_connection(conn)
+    return {recipe_id: (name, ingredients) for recipe_id, name, ingredients in rows}
+
+
+# Finds recipes that contain all (or any) of the given ingredients.
+def find_recipes_by_ingredients(ingredients, match="all", limit=20):
+    """Returns [(recipe_id, recipe_name, matched_count)] best matches first.
+
+    With match="all" only recipes using every ingredient are returned; with
+    match="any" recipes are ranked by how many of the ingredients they use.
+    """
+    names = parse_ingredients(",".join(ingredients))
+    index = get_ingredient_index()
+    if match == "all":
+        matches = heapq.nsmallest(limit, index.recipes_with_all(names))
+        counts = dict.fromkeys(matches, len(names))
+    elif match == "any":
+        counts = index.recipes_with_any(names)
+        matches = [recipe_id for recipe_id, _ in heapq.nlargest(limit, counts.items(), key=lambda item: (item[1], -item[0]))]
+    else:
+        raise ValueError("match must be 'all' or 'any'")
+    details = _recipe_details(matches)
+    return [(recipe_id, details[recipe_id][0], counts[recipe_id]) for recipe_id in matches if recipe_id in details]
+
+
+# Ranks recipes by how much of each one the pantry already covers.
+def recipes_from_pantry(pantry, limit=10):
+    """Returns [(recipe_id, recipe_name, coverage, missing)] best covered first.
+
+    coverage is the fraction of a recipe's ingredients found in the pantry and
+    missing lists the ingredients still to buy.
+    """
+    names = parse_ingredients(",".join(pantry))
+    index = get_ingredient_index()
+    counts = index.recipes_with_any(names)
+    sizes = index.sizes
+    best = heapq.nlargest(
+        limit,
+        counts.items(),
+        key=lambda item: (item[1] / sizes[item[0]], item[1], -item[0]),
+    )
+    details = _recipe_details([recipe_id for recipe_id, _ in best])
+    have = set(names)
+    results = []
+    for recipe_id, matched in best:
+        if recipe_id not in details:
+            continue
+        recipe_name, ingredients = details[recipe_id]
+        missing = [name for name in parse_ingredients(ingredients) if name not in have]
+        results.append((recipe_id, recipe_name, matched / sizes[recipe_id], missing))
+    return results
+
+
+# Other spellings under which a store may list a recipe ingredient.
+def ingredient_candidates(name):
+    """Returns normalized names to look up for an ingredient, best match first.
+
+    The name itself comes first, then its singular or plural, then the last
+    word on its own, so "eggs" finds "egg" and "pecorino cheese" falls back
+    to "cheese".
+    """
+    def number_variants(word):
+        if word.endswith("ies"):
+            return [word[:-3] + "y"]
+        if word.endswith("oes"):
+            return [word[:-2], word[:-1]]
+        if word.endswith("s") and not word.endswith("ss"):
+            return [word[:-1]]
+        if word.endswith("y") and word[-2:-1] not in ("", "a", "e", "i", "o", "u"):
+            return [word[:-1] + "ies"]
+        return [word + "es"] if word.endswith(("s", "x", "z", "ch", "sh", "o")) else [word + "s"]
+
+    words = name.split()
+    if not words:
+        return []
+    prefix = " ".join(words[:-1] + [""])
+    candidates = [name] + [prefix + variant for variant in number_variants(words[-1])]
+    if len(words) > 1:
+        candidates += [words[-1]] + number_variants(words[-1])
+    return list(dict.fromkeys(candidates))
+
+
+# Reads rows for a long list of values with a few bounded IN (...) queries.
+def _select_in(conn, query, values):
+    """Runs query, whose one {} is filled with placeholders, over values in chunks."""
+    values = list(values)
+    rows = []
+    for start in range(0, len(values), MAX_IN_PARAMS):
+        chunk = values[start:start + MAX_IN_PARAMS]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows.extend(fetch_all(execute_query(conn, query.format(placeholders), tuple(chunk))) or [])
+    return rows
+
+
+# Works out where to buy everything a set of recipes needs.
+def plan_shopping(recipe_ids):
+    """Returns (stops, unmatched) for buying every ingredient of the recipes.
+
+    stops is [(location, [(ingredient, ingredient_name, recipe_ids)])]: each
+    store to visit, with what to buy there under the name the store uses and
+    the recipes that need it. Stores are chosen greedily, the one selling the
+    most still-missing ingredients first, which keeps the number of stops
+    small. unmatched is [(ingredient, recipe_ids)] for ingredients no store
+    lists. Ingredients are matched on Ingredients.normalized_name, so case and
+    spacing do not matter; see ingredient_candidates() for the fallbacks.
+    """
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    if not recipe_ids:
+        return [], []
+    conn = strict_connection()
+    try:
+        needed = {}
+        for ingredient, recipe_id in _select_in(
+                conn, "SELECT ingredient, recipe_id FROM Recipe_Ingredients WHERE recipe_id IN ({})", recipe_ids):
+            needed.setdefault(ingredient, []).append(recipe_id)
+        candidates = {ingredient: ingredient_candidates(ingredient) for ingredient in needed}
+        lookups = {name for names in candidates.values() for name in names}
+        listings = {}
+        for normalized_name, ingredient_name, location in _select_in(
+                conn,
+                "SELECT normalized_name, ingredient_name, location FROM Ingredients "
+                "WHERE normalized_name IN ({}) AND location IS NOT NULL",
+                sorted(lookups)):
+            listings.setdefault(normalized_name, []).append((location, ingredient_name))
+    finally:
+        close_connection(conn)
+
+    # For each ingredient keep only the stores selling its best-ranked match.
+    offers = {}
+    unmatched = []
+    for ingredient in sorted(needed):
+        for name in candidates[ingredient]:
+            if name in listings:
+                for location, ingredient_name in listings[name]:
+                    offers.setdefault(location, {}).setdefault(ingredient, ingredient_name)
+                break
+        else:
+            unmatched.append((ingredient, sorted(needed[ingredient])))
+
+    stops = []
+    missing = set(needed) - {ingredient for ingredient, _ in unmatched}
+    while missing:
+        location, stock = min(offers.items(), key=lambda item: (-len(missing.intersection(item[1])), item[0]))
+        bought = sorted(missing.intersection(stock))
+        stops.append((location, [(ingredient, stock[ingredient], sorted(needed[ingredient])) for ingredient in bought]))
+        missing.difference_update(bought)
+        del offers[location]
+    return stops, unmatched
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+
+"""Statement timings, a slow-query log and per-action profiling.
+
+database.execute_query(), execute_many(), fetch_all() and fetch_one() report
+every statement here; menu actions decorated with @action are timed along
+with the database time spent inside them. Metrics are kept in memory and
+can be written out as JSON with dump_metrics(), or automatically at exit by
+setting FORKS_AND_FOLKS_METRICS_FILE.
+
+    python3 instrumentation.py report metrics.json
+    python3 instrumentation.py compare before.json after.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import sqlite3
+import functools
+import threading
+import weakref
+from collections import deque
+
+# Set to 0 to turn statement and action timing off.
+METRICS_ENABLED = os.environ.get("FORKS_AND_FOLKS_METRICS", "1") != "0"
+
+# Statements slower than this, in milliseconds, go to the slow-query log.
+SLOW_QUERY_MS = float(os.environ.get("FORKS_AND_FOLKS_SLOW_QUERY_MS", "50"))
+
+# Optional JSON Lines file that slow queries are appended to as they happen.
+SLOW_QUERY_LOG = os.environ.get("FORKS_AND_FOLKS_SLOW_QUERY_LOG")
+
+# Slow queries kept in memory for dump_metrics().
+SLOW_QUERY_KEEP = 100
+
+# Actions to run under cProfile: a comma-separated list of names, or "all".
+PROFILE_ACTIONS = {name.strip() for name in os.environ.get("FORKS_AND_FOLKS_PROFILE", "").split(",") if name.strip()}
+
+# Directory that cProfile output (.prof files, readable with pstats) is written to.
+PROFILE_DIR = os.environ.get("FORKS_AND_FOLKS_PROFILE_DIR", "profiles")
+
+# File the metrics are written to when the process exits, if set.
+METRICS_FILE = os.environ.get("FORKS_AND_FOLKS_METRICS_FILE")
+
+# Upper bounds, in milliseconds, of the latency histogram buckets; one more
+# bucket collects everything slower.
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+
+# Latency histogram and counters for one statement or action.
+class LatencyStats:
+    """Call count, errors, rows, total/max time and a bucketed histogram."""
+
+    __slots__ = ("calls", "errors", "rows", "total_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, ms, rows=0, error=False):
+        """Adds one measurement."""
+        self.calls += 1
+        self.errors += error
+        self.rows += max(rows, 0)
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of calls."""
+        wanted = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= wanted and count:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return 0.0
+
+    def as_dict(self):
+        """Returns the counters, the mean and estimated percentiles."""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "histogram_ms": dict(zip([str(bound) for bound in LATENCY_BUCKETS_MS] + ["inf"], self.buckets)),
+        }
+
+
+_lock = threading.Lock()
+_statements = {}
+_actions = {}
+_plans = {}
+_slow_queries = deque(maxlen=SLOW_QUERY_KEEP)
+_profiles = deque(maxlen=SLOW_QUERY_KEEP)
+# Row-returning statements are measured until their rows are fetched.
+_pending = weakref.WeakKeyDictionary()
+_local = threading.local()
+
+
+# Turns a statement into the key its metrics are grouped under; cached since
+# the same few statement strings are reported over and over.
+@functools.lru_cache(maxsize=1024)
+def normalize(query):
+    """Collapses whitespace and variable-length IN (?, ?, ...) lists."""
+    query = " ".join(query.split())
+    return re.sub(r"\bIN \(\?(, ?\?)+\)", "IN (?, ...)", query, flags=re.IGNORECASE)
+
+
+# Records a statement executed through database.execute_query()/execute_many().
+def record_execute(cursor, query, params, seconds, error=False):
+    """Observes DML now; holds row-returning statements until they are fetched."""
+    if not METRICS_ENABLED:
+        return
+    ms = seconds * 1000
+    if cursor is not None and not error and cursor.description is not None:
+        _pending[cursor] = (query, params, ms)
+        return
+    rows = cursor.rowcount if cursor is not None and not error else 0
+    _observe(query, ms, rows, error, cursor.connection if cursor is not None else None, params)
+
+
+# Records the rows fetched from a cursor and completes its measurement.
+def record_fetch(cursor, seconds, rows):
+    """Adds fetch time to the statement that produced the cursor."""
+    if not METRICS_ENABLED or cursor is None:
+        return
+    pending = _pending.pop(cursor, None)
+    if pending is None:
+        return
+    query, params, ms = pending
+    _observe(query, ms + seconds * 1000, rows, False, cursor.connection, params)
+
+
+# Adds one measurement and logs it if it was slow.
+def _observe(query, ms, rows, error, conn, params):
+    key = normalize(query)
+    with _lock:
+        stats = _statements.get(key)
+        if stats is None:
+            stats = _statements[key] = LatencyStats()
+        stats.observe(ms, rows, error)
+    totals = getattr(_local, "action", None)
+    if totals is not None:
+        totals["db_ms"] += ms
+        totals["statements"] += 1
+    if ms >= SLOW_QUERY_MS:
+        _log_slow_query(key, query, ms, rows, conn, params)
+
+
+# Captures the plan of a slow statement, once per statement.
+def _log_slow_query(key, query, ms, rows, conn, params):
+    plan = _plans.get(key)
+    if plan is None and conn is not None and isinstance(params, (tuple, list, dict, type(None))):
+        plan = _explain(conn, query, params)
+        _plans[key] = plan
+    entry = {
+        "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "statement": key,
+        "ms": round(ms, 3),
+        "rows": rows,
+        "plan": plan,
+    }
+    with _lock:
+        _slow_queries.append(entry)
+    if SLOW_QUERY_LOG:
+        try:
+            with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"Could not write slow query log: {e}")
+
+
+# Asks SQLite how it runs a statement.
+def _explain(conn, query, params):
+    """Returns the EXPLAIN QUERY PLAN detail lines, or None if unavailable."""
+    if not re.match(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", query, re.IGNORECASE):
+        return None
+    try:
+        rows = conn.execute("EXPLAIN QUERY PLAN " + query, params or ()).fetchall()
+    except sqlite3.Error:
+        return None
+    return [row[3] for row in rows]
+
+
+# Should this action run under cProfile?
+def _should_profile(name):
+    return "all" in PROFILE_ACTIONS or name in PROFILE_ACTIONS
+
+
+# Decorates a menu action so its wall time and database time are recorded.
+def action(function):
+    """Times each call, counts the statements it runs and optionally profiles it."""
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        profile = _should_profile(name)
+        if not METRICS_ENABLED and not profile:
+            return function(*args, **kwargs)
+        outer = getattr(_local, "action", None)
+        totals = _local.action = {"db_ms": 0.0, "statements": 0}
+        profiler = None
+        if profile:
+            # Imported on first use, like argparse in main(), to keep startup light.
+            import cProfile
+            profiler = cProfile.Profile()
+        start = time.perf_counter()
+        error = False
+        try:
+            if profiler is not None:
+                return profiler.runcall(function, *args, **kwargs)
+            return function(*args, **kwargs)
+        except BaseException:
+            error = True
+            raise
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            _local.action = outer
+            if outer is not None:
+                outer["db_ms"] += totals["db_ms"]
+                outer["statements"] += totals["statements"]
+            with _lock:
+                entry = _actions.get(name)
+                if entry is None:
+                    entry = _actions[name] = {"latency": LatencyStats(), "db_ms": 0.0, "statements": 0}
+                entry["latency"].observe(ms, error=error)
+                entry["db_ms"] += totals["db_ms"]
+                entry["statements"] += totals["statements"]
+            if profiler is not None:
+                _save_profile(name, profiler)
+
+    return wrapper
+
+
+# Writes one action's profile next to the others.
+def _save_profile(name, profiler):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{len(_profiles)}.prof")
+        profiler.dump_stats(path)
+    except OSError as e:
+        print(f"Could not write profile: {e}")
+        return
+    with _lock:
+        _profiles.append(path)
+
+
+# Returns the collected statement, action and slow-query metrics.
+def snapshot():
+    """Returns a JSON-serialisable copy of every metric."""
+    with _lock:
+        actions = {}
+        for name, entry in _actions.items():
+            actions[name] = entry["latency"].as_dict()
+            actions[name]["db_ms"] = round(entry["db_ms"], 3)
+            actions[name]["statements"] = entry["statements"]
+        return {
+            "collected_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "pid": os.getpid(),
+            "slow_query_ms": SLOW_QUERY_MS,
+            "statements": {key: stats.as_dict() for key, stats in _statements.items()},
+            "actions": actions,
+            "slow_queries": list(_slow_queries),
+            "profiles": list(_profiles),
+        }
+
+
+# Adds the connection pool and cache counters to the snapshot.
+def collect():
+    """Returns snapshot() plus pool_stats() and cache_stats()."""
+    # Imported here: database reports into this module, so it cannot be imported at load time.
+    from database import pool_stats
+    from cache import cache_stats
+    metrics = snapshot()
+    metrics["pool"] = pool_stats()
+    metrics["cache"] = cache_stats()
+    return metrics
+
+
+# Writes the metrics to a JSON file.
+def dump_metrics(path=None):
+    """Writes collect() to path (default FORKS_AND_FOLKS_METRICS_FILE); returns the path."""
+    path = path or METRICS_FILE
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(collect(), file, indent=2)
+    return path
+
+
+# Forgets everything collected so far.
+def reset():
+    """Clears all metrics, e.g. between benchmark runs."""
+    with _lock:
+        _statements.clear()
+        _actions.clear()
+        _plans.clear()
+        _slow_queries.clear()
+        _profiles.clear()
+
+
+if METRICS_FILE:
+    atexit.register(dump_metrics)
+
+
+# Prints the statements that took the most time.
+def print_report(metrics, top=15):
+    """Prints statements by total time, then actions."""
+    statements = sorted(metrics["statements"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+    print(f"{'total ms':>10}{'calls':>8}{'mean':>9}{'p95':>8}{'max':>9}{'rows':>9}  statement")
+    for key, stats in statements[:top]:
+        print(f"{stats['total_ms']:>10.1f}{stats['calls']:>8}{stats['mean_ms']:>9.3f}{stats['p95_ms']:>8}"
+              f"{stats['max_ms']:>9.2f}{stats['rows']:>9}  {key[:90]}")
+    if metrics["actions"]:
+        print(f"\n{'total ms':>10}{'calls':>8}{'db ms':>10}{'queries':>9}  action")
+        for name, stats in sorted(metrics["actions"].items(), key=lambda item: item[1]["total_ms"], reverse=True):
+            print(f"{stats['total_ms']:>10.1f}{stats['calls']:>8}{stats['db_ms']:>10.1f}{stats['statements']:>9}  {name}")
+    if metrics["slow_queries"]:
+        print(f"\n{len(metrics['slow_queries'])} slow queries (>= {metrics['slow_query_ms']} ms); latest:")
+        latest = metrics["slow_queries"][-1]
+        print(f"  {latest['ms']} ms: {latest['statement'][:90]}")
+        for line in latest["plan"] or []:
+            print(f"    {line}")
+
+
+# Prints statements whose mean latency grew between two dumps.
+def print_comparison(before, after, threshold=1.5):
+    """Lists statements at least `threshold` times slower on average; returns how many."""
+    regressions = 0
+    print(f"{'before ms':>10}{'after ms':>10}{'ratio':>8}  statement")
+    for key, stats in sorted(after["statements"].items(), key=lambda item: item[1]["total_ms"], reverse=True):
+        old = before["statements"].get(key)
+        if old is None or not old["mean_ms"]:
+            continue
+        ratio = stats["mean_ms"] / old["mean_ms"]
+        if ratio >= threshold:
+            regressions += 1
+            print(f"{old['mean_ms']:>10.3f}{stats['mean_ms']:>10.3f}{ratio:>8.2f}  {key[:90]}")
+    if not regressions:
+        print(f"No statement is {threshold}x slower.")
+    return regressions
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Summarise metrics written by dump_metrics().")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="show the most expensive statements and actions")
+    report.add_argument("file")
+    report.add_argument("--top", type=int, default=15)
+    compare = commands.add_parser("compare", help="list statements that got slower")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    compare.add_argument("--threshold", type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        with open(args.file, encoding="utf-8") as file:
+            print_report(json.load(file), args.top)
+        return 0
+    with open(args.before, encoding="utf-8") as file:
+        before = json.load(file)
+    with open(args.after, encoding="utf-8") as file:
+        after = json.load(file)
+    return 1 if print_comparison(before, after, args.threshold) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,816 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import zlib
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import database
+import sharding
+from database import create_connection, close_connection, execute_query, execute_many, fetch_all, fetch_one, transaction
+from passwords import hash_password
+from ingredient_search import backfill_normalized_names, backfill_recipe_ingredients
+from recipe_search import COMPACT_RECIPE_TRIGGERS, create_search_index, optimize_search_index, search_index_available
+from recipe_storage import move_instructions
+
+
+# Migration 1: the original tables and the sample data.
+def _base_schema(conn):
+    """Creates the database schema and populates it with dummy data."""
+    # Create the Users table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Users (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL CHECK (role IN ('Chef', 'Consumer'))
+        )
+    ''')
+    # Create the Recipes table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Recipes (
+            recipe_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_name TEXT NOT NULL UNIQUE,
+            ingredients TEXT,
+            instructions TEXT,
+            chef_id INTEGER,
+            FOREIGN KEY (chef_id) REFERENCES Users(user_id)
+        )
+    ''')
+
+    # Create the Ingredients table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Ingredients (
+            ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ingredient_name TEXT NOT NULL UNIQUE,
+            location TEXT
+        )
+    ''')
+
+    # Create the Chefs table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Chefs (
+            chef_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            portfolio_details TEXT,
+            FOREIGN KEY (user_id) REFERENCES Users(user_id)
+        )
+    ''')
+
+    # Create the Chef_Hires table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Chef_Hires (
+            hire_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chef_id INTEGER,
+            consumer_id INTEGER,
+            hire_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            response TEXT,
+            message TEXT,
+            FOREIGN KEY (chef_id) REFERENCES Users(user_id),
+            FOREIGN KEY (consumer_id) REFERENCES Users(user_id)
+        )
+    ''')
+
+    # Insert sample data
+    users = [
+        ('Gabriella', hash_password('password'), 'Consumer'),
+        ('Jessica', hash_password('password'), 'Consumer'),
+        ('Santhiana', hash_password('pass'), 'Chef'),
+        ('Buke', hash_password('pass'), 'Chef'),
+        ('Janviere', hash_password('password'), 'Consumer'),
+        ('Thierry', hash_password('pass'), 'Chef'),
+        ('Dhieu', hash_password('pass'), 'Chef'),
+        ('Herve', hash_password('password'), 'Consumer')
+    ]
+    execute_many(conn, "INSERT OR IGNORE INTO Users (username, password, role) VALUES (?, ?, ?)", users)
+
+    chefs = [
+        (3, 'Specializes in Burundian cuisine.'),
+        (4, 'Specializes in Kenyan cuisine.'),
+        (6, 'Specializes in Rwandan cuisine.'),
+        (7, 'Specializes in Sudani cuisine.')
+    ]
+    # Chefs.user_id has no unique constraint, so skip chefs that already exist
+    # instead of relying on OR IGNORE (which used to duplicate them).
+    execute_many(conn, '''
+        INSERT INTO Chefs (user_id, portfolio_details)
+        SELECT ?1, ?2 WHERE NOT EXISTS (SELECT 1 FROM Chefs WHERE user_id = ?1)
+    ''', chefs)
+
+    # Insert sample recipes
+    recipes = [
+        ("Spaghetti Carbonara", "spaghetti, eggs, pecorino cheese, pancetta, black pepper", "1. Cook pasta\n2. Fry pancetta\n3. Mix eggs and cheese\n4. Combine all ingredients\n", 3),
+        ("Classic Burger", "ground beef, burger buns, lettuce, tomato, onion, cheese", "1. Form patties\n2. Grill until done\n3. Assemble with toppings\n", 4),
+        ("Caesar Salad", "romaine lettuce, croutons, parmesan, caesar dressing", "1. Chop lettuce\n2. Add croutons and cheese\n3. Toss with dressing\n", 6),
+        ("Chocolate Chip Cookies", "flour, butter, sugar, eggs, chocolate chips", "1. Mix ingredients\n2. Form cookies\n3. Bake at 350F for 12 minutes\n", 7),
+        ("Chicken Stir Fry", "chicken breast, vegetables, soy sauce, oil, garlic", "1. Cut chicken\n2. Stir fry vegetables\n3. Add chicken and sauce\n", 4)
+    ]
+
+    execute_many(conn, '''
+        INSERT OR IGNORE INTO Recipes (recipe_name, ingredients, instructions, chef_id)
+        VALUES (?, ?, ?, ?)
+    ''', recipes)
+
+    # Insert sample ingredients
+    ingredients = [
+        ("Tomatoes", "Kimironko Market"),
+        ("Spaghetti", "250 Stores"),
+        ("Chicken Breast", "Farmer's Choice Butcher Shop"),
+        ("Flour", "Simba Kisimenti Supermarket"),
+        ("Lettuce", "Kimironko Market"),
+        ("Croutons", "T2000 Supermarket"),
+        ("Butter", "Zoe's Bakery"),
+        ("Ground Beef", "Kimironko Market"),
+        ("Cheese", "T2000 Supermarket"),
+        ("Chocolate Chips", "Zoe's Bakery"),
+        ("Buns", "250 Stores"),
+        ("Soy Sauce", "Simba Kimironko")
+    ]
+
+    execute_many(conn, '''
+        INSERT OR IGNORE INTO Ingredients (ingredient_name, location)
+        VALUES (?, ?)
+    ''', ingredients)
+
+
+# Migration 2: secondary indexes for the hire, chef and recipe lookups.
+def _lookup_indexes(conn):
+    """Indexes the foreign-key columns the menus filter and join on."""
+    execute_query(conn, "CREATE INDEX IF NOT EXISTS idx_chef_hires_chef_id ON Chef_Hires (chef_id)")
+    execute_query(conn, "CREATE INDEX IF NOT EXISTS idx_chef_hires_consumer_id ON Chef_Hires (consumer_id)")
+    execute_query(conn, "CREATE INDEX IF NOT EXISTS idx_chefs_user_id ON Chefs (user_id)")
+    execute_query(conn, "CREATE INDEX IF NOT EXISTS idx_recipes_chef_id ON Recipes (chef_id)")
+
+
+# Migration 3: normalized recipe/ingredient join table, backfilled from the text column.
+def _recipe_ingredients(conn):
+    """Creates Recipe_Ingredients and indexes every existing recipe."""
+    execute_query(conn, '''
+        CREATE TABLE IF NOT EXISTS Recipe_Ingredients (
+            ingredient TEXT NOT NULL,
+            recipe_id INTEGER NOT NULL,
+            PRIMARY KEY (ingredient, recipe_id),
+            FOREIGN KEY (recipe_id) REFERENCES Recipes(recipe_id)
+        ) WITHOUT ROWID
+    ''')
+    execute_query(conn, "CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe_id ON Recipe_Ingredients (recipe_id)")
+    execute_query(conn, '''
+        CREATE TRIGGER IF NOT EXISTS trg_recipes_delete_ingredients
+        AFTER DELETE ON Recipes
+        BEGIN
+            DELETE FROM Recipe_Ingredients WHERE recipe_id = old.recipe_id;
+        END
+    ''')
+    backfill_recipe_ingredients(conn)
+
+
+# Migration 4: FTS5 full-text index over recipes and chef portfolios.
+def _recipe_search_index(conn):
+    """Creates Recipe_Search and its sync triggers, then fills it."""
+    create_search_index(conn)
+
+
+# Migration 5: per-user inbox watermarks and status indexes for hires.
+def _hire_inbox(conn):
+    """Adds change_seq to Chef_Hires, the Inbox_State table and covering indexes."""
+    # Each response or message edit stamps the hire with the next value of a
+    # single counter, so "changed since" is a range scan on change_seq.
+    execute_query(conn, "ALTER TABLE Chef_Hires ADD COLUMN change_seq INTEGER")
+    execute_query(conn, '''
+        CREATE TABLE IF NOT EXISTS Hire_Sequence (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL
+        )
+    ''')
+    execute_query(conn, "UPDATE Chef_Hires SET change_seq = hire_id WHERE response IS NOT NULL")
+    execute_query(conn, "INSERT INTO Hire_Sequence (id, value) SELECT 1, COALESCE(MAX(change_seq), 0) FROM Chef_Hires")
+    execute_query(conn, '''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_hires_change_seq
+        AFTER UPDATE OF response, message ON Chef_Hires
+        BEGIN
+            UPDATE Hire_Sequence SET value = value + 1 WHERE id = 1;
+            UPDATE Chef_Hires SET change_seq = (SELECT value FROM Hire_Sequence WHERE id = 1)
+            WHERE hire_id = new.hire_id;
+        END
+    ''')
+    # Chefs are notified of new hires (watermark: hire_id); consumers of
+    # answers to theirs (watermark: change_seq).
+    execute_query(conn, '''
+        CREATE TABLE IF NOT EXISTS Inbox_State (
+            user_id INTEGER PRIMARY KEY,
+            last_seen_hire_id INTEGER NOT NULL DEFAULT 0,
+            last_seen_change_seq INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES Users(user_id)
+        )
+    ''')
+    execute_query(conn, "CREATE INDEX IF NOT EXISTS idx_chef_hires_consumer_changes ON Chef_Hires (consumer_id, change_seq)")
+    # Status-filtered lists; the chef one covers every column the notification list reads.
+    execute_query(conn, '''
+        CREATE INDEX IF NOT EXISTS idx_chef_hires_chef_status
+        ON Chef_Hires (chef_id, response, hire_id, consumer_id, hire_date)
+    ''')
+    execute_query(conn, "CREATE INDEX IF NOT EXISTS idx_chef_hires_consumer_status ON Chef_Hires (consumer_id, response, hire_id)")
+
+
+# Migration 6: normalized ingredient names for matching recipes to stores.
+def _ingredient_normalized_names(conn):
+    """Adds Ingredients.normalized_name, fills it and indexes it."""
+    # Writers store normalize_ingredient(ingredient_name). The triggers cover
+    # rows written without it, with a close SQL approximation.
+    execute_query(conn, "ALTER TABLE Ingredients ADD COLUMN normalized_name TEXT")
+    backfill_normalized_names(conn)
+    execute_query(conn, '''
+        CREATE TRIGGER IF NOT EXISTS trg_ingredients_normalized_name_insert
+        AFTER INSERT ON Ingredients
+        WHEN new.normalized_name IS NULL
+        BEGIN
+            UPDATE Ingredients SET normalized_name = lower(trim(new.ingredient_name, ' .;'))
+            WHERE ingredient_id = new.ingredient_id;
+        END
+    ''')
+    execute_query(conn, '''
+        CREATE TRIGGER IF NOT EXISTS trg_ingredients_normalized_name_update
+        AFTER UPDATE OF ingredient_name ON Ingredients
+        WHEN new.normalized_name IS old.normalized_name
+        BEGIN
+            UPDATE Ingredients SET normalized_name = lower(trim(new.ingredient_name, ' .;'))
+            WHERE ingredient_id = new.ingredient_id;
+        END
+    ''')
+    # Covers the shopping-plan lookup, which reads name and location by normalized name.
+    execute_query(conn, '''
+        CREATE INDEX IF NOT EXISTS idx_ingredients_normalized_name
+        ON Ingredients (normalized_name, location, ingredient_name)
+    ''')
+
+
+# Cuisines recognised in portfolio text when tagging chefs.
+CUISINE_KEYWORDS = [
+    "brazilian", "burundian", "chinese", "congolese", "ethiopian", "french", "ghanaian", "greek", "indian",
+    "italian", "japanese", "kenyan", "korean", "lebanese", "mexican", "moroccan", "nigerian", "rwandan",
+    "spanish", "sudanese", "sudani", "tanzanian", "thai", "turkish", "ugandan", "vegan", "vegetarian",
+]
+
+# Ranking score of a Chef_Stats row: the acceptance rate, pulled towards 50%
+# as if every chef started with six answers so one lucky accept does not top
+# the list; discounted by slow answers (half at one day; a chef with no timed
+# answers counts as one day) and by a backlog of pending requests; with a
+# bonus of up to 50% for published recipes.
+CHEF_SCORE = '''
+    (accepted + 3.0) / (accepted + declined + 6.0)
+    / (1.0 + COALESCE(response_seconds / NULLIF(timed_responses, 0), 86400.0) / 86400.0)
+    / (1.0 + pending / 20.0)
+    * (1.0 + MIN(recipes, 50) / 100.0)
+'''
+
+
+# Migration 7: per-chef ranking aggregates kept current by triggers.
+def _chef_ranking(conn):
+    """Adds responded_at, Chef_Stats, Chef_Cuisines and their triggers, then fills them."""
+    execute_query(conn, "ALTER TABLE Chef_Hires ADD COLUMN responded_at DATETIME")
+    execute_query(conn, '''
+        CREATE TABLE IF NOT EXISTS Chef_Stats (
+            chef_id INTEGER PRIMARY KEY,
+            hires INTEGER NOT NULL DEFAULT 0,
+            pending INTEGER NOT NULL DEFAULT 0,
+            accepted INTEGER NOT NULL DEFAULT 0,
+            declined INTEGER NOT NULL DEFAULT 0,
+            timed_responses INTEGER NOT NULL DEFAULT 0,
+            response_seconds REAL NOT NULL DEFAULT 0,
+            recipes INTEGER NOT NULL DEFAULT 0,
+            score REAL NOT NULL DEFAULT 0,
+            FOREIGN KEY (chef_id) REFERENCES Chefs(chef_id)
+        )
+    ''')
+    execute_query(conn, "CREATE INDEX IF NOT EXISTS idx_chef_stats_score ON Chef_Stats (score DESC, chef_id)")
+    execute_query(conn, "CREATE TABLE IF NOT EXISTS Cuisine_Keywords (keyword TEXT PRIMARY KEY)")
+    execute_many(conn, "INSERT OR IGNORE INTO Cuisine_Keywords (keyword) VALUES (?)",
+                 [(keyword,) for keyword in CUISINE_KEYWORDS])
+    # The chef's score is copied here so a cuisine's top chefs are one index range.
+    execute_query(conn, '''
+        CREATE TABLE IF NOT EXISTS Chef_Cuisines (
+            chef_id INTEGER NOT NULL,
+            cuisine TEXT NOT NULL,
+            score REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (chef_id, cuisine),
+            FOREIGN KEY (chef_id) REFERENCES Chefs(chef_id)
+        ) WITHOUT ROWID
+    ''')
+    execute_query(conn, "CREATE INDEX IF NOT EXISTS idx_chef_cuisines_score ON Chef_Cuisines (cuisine, score DESC, chef_id)")
+
+    # Backfill from the existing rows. Older answers have no responded_at and
+    # so do not count towards response time.
+    execute_query(conn, '''
+        INSERT INTO Chef_Stats (chef_id, hires, pending, accepted, declined, recipes)
+        SELECT Chefs.chef_id,
+               COALESCE(hires.total, 0), COALESCE(hires.pending, 0),
+               COALESCE(hires.accepted, 0), COALESCE(hires.declined, 0),
+               (SELECT COUNT(*) FROM Recipes WHERE Recipes.chef_id = Chefs.user_id)
+        FROM Chefs
+        LEFT JOIN (
+            SELECT chef_id, COUNT(*) AS total, SUM(response IS NULL) AS pending,
+                   SUM(response IS 'accept') AS accepted, SUM(response IS 'decline') AS declined
+            FROM Chef_Hires GROUP BY chef_id
+        ) AS hires ON hires.chef_id = Chefs.chef_id
+    ''')
+    execute_query(conn, f"UPDATE Chef_Stats SET score = {CHEF_SCORE}")
+    execute_query(conn, '''
+        INSERT OR IGNORE INTO Chef_Cuisines (chef_id, cuisine, score)
+        SELECT Chefs.chef_id, Cuisine_Keywords.keyword, Chef_Stats.score
+        FROM Chefs
+        INNER JOIN Cuisine_Keywords ON instr(lower(Chefs.portfolio_details), Cuisine_Keywords.keyword) > 0
+        INNER JOIN Chef_Stats ON Chef_Stats.chef_id = Chefs.chef_id
+    ''')
+
+    # Each hire, answer or recipe adjusts one chef's counters in place; the
+    # score follows from the counters, and the cuisine rows from the score.
+    execute_query(conn, f'''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_stats_score
+        AFTER UPDATE OF hires, pending, accepted, declined, timed_responses, response_seconds, recipes ON Chef_Stats
+        BEGIN
+            UPDATE Chef_Stats SET score = {CHEF_SCORE} WHERE chef_id = new.chef_id;
+        END
+    ''')
+    execute_query(conn, '''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_stats_cuisines
+        AFTER UPDATE OF score ON Chef_Stats
+        BEGIN
+            UPDATE Chef_Cuisines SET score = new.score WHERE chef_id = new.chef_id;
+        END
+    ''')
+    hire_delta = '''
+        UPDATE Chef_Stats SET
+            hires = hires {sign} 1,
+            pending = pending {sign} ({row}.response IS NULL),
+            accepted = accepted {sign} ({row}.response IS 'accept'),
+            declined = declined {sign} ({row}.response IS 'decline'),
+            timed_responses = timed_responses {sign} ({row}.responded_at IS NOT NULL),
+            response_seconds = response_seconds {sign}
+                COALESCE((julianday({row}.responded_at) - julianday({row}.hire_date)) * 86400, 0)
+        WHERE chef_id = {row}.chef_id;
+    '''
+    execute_query(conn, f'''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_stats_hire_insert
+        AFTER INSERT ON Chef_Hires
+        BEGIN
+            {hire_delta.format(sign="+", row="new")}
+        END
+    ''')
+    execute_query(conn, f'''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_stats_hire_update
+        AFTER UPDATE OF chef_id, response, responded_at, hire_date ON Chef_Hires
+        BEGIN
+            {hire_delta.format(sign="-", row="old")}
+            {hire_delta.format(sign="+", row="new")}
+        END
+    ''')
+    execute_query(conn, f'''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_stats_hire_delete
+        AFTER DELETE ON Chef_Hires
+        BEGIN
+            {hire_delta.format(sign="-", row="old")}
+        END
+    ''')
+    # Recipes.chef_id holds the author's user id.
+    recipe_delta = '''
+        UPDATE Chef_Stats SET recipes = recipes {sign} 1
+        WHERE chef_id IN (SELECT chef_id FROM Chefs WHERE user_id = {row}.chef_id);
+    '''
+    execute_query(conn, f'''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_stats_recipe_insert
+        AFTER INSERT ON Recipes
+        BEGIN
+            {recipe_delta.format(sign="+", row="new")}
+        END
+    ''')
+    execute_query(conn, f'''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_stats_recipe_update
+        AFTER UPDATE OF chef_id ON Recipes
+        BEGIN
+            {recipe_delta.format(sign="-", row="old")}
+            {recipe_delta.format(sign="+", row="new")}
+        END
+    ''')
+    execute_query(conn, f'''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_stats_recipe_delete
+        AFTER DELETE ON Recipes
+        BEGIN
+            {recipe_delta.format(sign="-", row="old")}
+        END
+    ''')
+    tag_cuisines = '''
+        INSERT OR IGNORE INTO Chef_Cuisines (chef_id, cuisine, score)
+        SELECT new.chef_id, keyword, (SELECT score FROM Chef_Stats WHERE chef_id = new.chef_id)
+        FROM Cuisine_Keywords
+        WHERE instr(lower(new.portfolio_details), keyword) > 0;
+    '''
+    execute_query(conn, f'''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_stats_chef_insert
+        AFTER INSERT ON Chefs
+        BEGIN
+            INSERT OR IGNORE INTO Chef_Stats (chef_id, recipes)
+            VALUES (new.chef_id, (SELECT COUNT(*) FROM Recipes WHERE chef_id = new.user_id));
+            UPDATE Chef_Stats SET score = {CHEF_SCORE} WHERE chef_id = new.chef_id;
+            {tag_cuisines}
+        END
+    ''')
+    execute_query(conn, f'''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_cuisines_portfolio_update
+        AFTER UPDATE OF portfolio_details ON Chefs
+        BEGIN
+            DELETE FROM Chef_Cuisines WHERE chef_id = new.chef_id;
+            {tag_cuisines}
+        END
+    ''')
+    execute_query(conn, '''
+        CREATE TRIGGER IF NOT EXISTS trg_chef_stats_chef_delete
+        AFTER DELETE ON Chefs
+        BEGIN
+            DELETE FROM Chef_Cuisines WHERE chef_id = old.chef_id;
+            DELETE FROM Chef_Stats WHERE chef_id = old.chef_id;
+        END
+    ''')
+
+
+# Drops Recipes.instructions on SQLite before 3.35, which has no ALTER TABLE DROP COLUMN.
+def _rebuild_recipes_without_instructions(conn):
+    """Copies Recipes into a table without the column and puts it in the old one's place."""
+    # Indexes and triggers go with the dropped table; keep their SQL to recreate them.
+    extras = fetch_all(execute_query(conn, '''
+        SELECT sql FROM sqlite_master
+        WHERE tbl_name = 'Recipes' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    ''')) or []
+    sequence = fetch_one(execute_query(conn, "SELECT seq FROM sqlite_sequence WHERE name = 'Recipes'"))
+    execute_query(conn, '''
+        CREATE TABLE Recipes_new (
+            recipe_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipe_name TEXT NOT NULL UNIQUE,
+            ingredients TEXT,
+            chef_id INTEGER,
+            FOREIGN KEY (chef_id) REFERENCES Users(user_id)
+        )
+    ''')
+    execute_query(conn, '''
+        INSERT INTO Recipes_new (recipe_id, recipe_name, ingredients, chef_id)
+        SELECT recipe_id, recipe_name, ingredients, chef_id FROM Recipes
+    ''')
+    execute_query(conn, "DROP TABLE Recipes")
+    # Triggers on Chefs name Recipes and would fail the rename's schema check
+    # until it is done; the legacy rename leaves them to find the new table.
+    execute_query(conn, "PRAGMA legacy_alter_table = ON")
+    try:
+        execute_query(conn, "ALTER TABLE Recipes_new RENAME TO Recipes")
+    finally:
+        execute_query(conn, "PRAGMA legacy_alter_table = OFF")
+    if sequence:
+        # Ids of deleted recipes stay retired, as they were before the copy.
+        execute_query(conn, "UPDATE sqlite_sequence SET seq = ? WHERE name = 'Recipes'", sequence)
+    for (sql,) in extras:
+        execute_query(conn, sql)
+
+
+# Migration 8: instruction text moved out of Recipes into a compressed side table.
+def _compressed_instructions(conn):
+    """Creates Recipe_Instructions, moves the text there and drops Recipes.instructions."""
+    # body is a zlib BLOB, or TEXT when compressing would not save space.
+    execute_query(conn, '''
+        CREATE TABLE IF NOT EXISTS Recipe_Instructions (
+            recipe_id INTEGER PRIMARY KEY,
+            body NOT NULL,
+            FOREIGN KEY (recipe_id) REFERENCES Recipes(recipe_id)
+        )
+    ''')
+    move_instructions(conn)
+    # A column cannot be dropped while triggers still read it.
+    execute_query(conn, "DROP TRIGGER IF EXISTS trg_recipes_search_insert")
+    execute_query(conn, "DROP TRIGGER IF EXISTS trg_recipes_search_update")
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        execute_query(conn, "ALTER TABLE Recipes DROP COLUMN instructions")
+    else:
+        _rebuild_recipes_without_instructions(conn)
+    if search_index_available(conn):
+        for statement in COMPACT_RECIPE_TRIGGERS:
+            execute_query(conn, statement)
+    execute_query(conn, '''
+        CREATE TRIGGER IF NOT EXISTS trg_recipes_delete_instructions
+        AFTER DELETE ON Recipes
+        BEGIN
+            DELETE FROM Recipe_Instructions WHERE recipe_id = old.recipe_id;
+        END
+    ''')
+
+
+# Spellings tagged as another cuisine keyword; "sudani" is also found inside every "sudanese".
+CUISINE_SPELLINGS = {"sudani": "sudanese"}
+
+
+# Migration 9: keywords that are spellings of one cuisine tag it once.
+def _cuisine_spellings(conn):
+    """Adds Cuisine_Keywords.cuisine, retags chefs by it and points the tagging triggers at it."""
+    execute_query(conn, "ALTER TABLE Cuisine_Keywords ADD COLUMN cuisine TEXT")
+    execute_query(conn, "UPDATE Cuisine_Keywords SET cuisine = keyword")
+    execute_many(conn, "UPDATE Cuisine_Keywords SET cuisine = ? WHERE keyword = ?",
+                 [(cuisine, keyword) for keyword, cuisine in CUISINE_SPELLINGS.items()])
+    # A chef already tagged with the cuisine keeps that row; the duplicate goes.
+    spellings = "SELECT keyword FROM Cuisine_Keywords WHERE cuisine != keyword"
+    execute_query(conn, f'''
+        UPDATE OR IGNORE Chef_Cuisines
+        SET cuisine = (SELECT cuisine FROM Cuisine_Keywords WHERE keyword = Chef_Cuisines.cuisine)
+        WHERE cuisine IN ({spellings})
+    ''')
+    execute_query(conn, f"DELETE FROM Chef_Cuisines WHERE cuisine IN ({spellings})")
+    tag_cuisines = '''
+        INSERT OR IGNORE INTO Chef_Cuisines (chef_id, cuisine, score)
+        SELECT new.chef_id, cuisine, (SELECT score FROM Chef_Stats WHERE chef_id = new.chef_id)
+        FROM Cuisine_Keywords
+        WHERE instr(lower(new.portfolio_details), keyword) > 0;
+    '''
+    execute_query(conn, "DROP TRIGGER IF EXISTS trg_chef_stats_chef_insert")
+    execute_query(conn, "DROP TRIGGER IF EXISTS trg_chef_cuisines_portfolio_update")
+    execute_query(conn, f'''
+        CREATE TRIGGER trg_chef_stats_chef_insert
+        AFTER INSERT ON Chefs
+        BEGIN
+            INSERT OR IGNORE INTO Chef_Stats (chef_id, recipes)
+            VALUES (new.chef_id, (SELECT COUNT(*) FROM Recipes WHERE chef_id = new.user_id));
+            UPDATE Chef_Stats SET score = {CHEF_SCORE} WHERE chef_id = new.chef_id;
+            {tag_cuisines}
+        END
+    ''')
+    execute_query(conn, f'''
+        CREATE TRIGGER trg_chef_cuisines_portfolio_update
+        AFTER UPDATE OF portfolio_details ON Chefs
+        BEGIN
+            DELETE FROM Chef_Cuisines WHERE chef_id = new.chef_id;
+            {tag_cuisines}
+        END
+    ''')
+
+
+# Migration 10: one Chefs row per chef user.
+def _unique_chefs(conn):
+    """Merges duplicate Chefs rows into the lowest chef_id of each user and makes user_id unique."""
+    # The original create_database() inserted the sample chefs again on every
+    # start, so databases from before the migrations hold several rows per user.
+    duplicates = '''
+        SELECT chef_id FROM Chefs
+        WHERE user_id IS NOT NULL
+          AND chef_id NOT IN (SELECT MIN(chef_id) FROM Chefs WHERE user_id IS NOT NULL GROUP BY user_id)
+    '''
+    # The ranking triggers move each hire's counts to the kept chef, and drop
+    # the removed chefs' Chef_Stats and Chef_Cuisines rows.
+    execute_query(conn, f'''
+        UPDATE Chef_Hires
+        SET chef_id = (
+            SELECT MIN(kept.chef_id) FROM Chefs AS kept
+            INNER JOIN Chefs AS duplicate ON duplicate.user_id = kept.user_id
+            WHERE duplicate.chef_id = Chef_Hires.chef_id
+        )
+        WHERE chef_id IN ({duplicates})
+    ''')
+    execute_query(conn, f"DELETE FROM Chefs WHERE chef_id IN ({duplicates})")
+    execute_query(conn, "DROP INDEX IF EXISTS idx_chefs_user_id")
+    execute_query(conn, "CREATE UNIQUE INDEX IF NOT EXISTS idx_chefs_user_id ON Chefs (user_id)")
+
+
+# Ordered list of (version, description, function). Append new migrations;
+# never renumber or edit one that has shipped.
+MIGRATIONS = [
+    (1, "base schema and sample data", _base_schema),
+    (2, "indexes on hire, chef and recipe foreign keys", _lookup_indexes),
+    (3, "Recipe_Ingredients join table", _recipe_ingredients),
+    (4, "Recipe_Search full-text index", _recipe_search_index),
+    (5, "hire inbox watermarks and status indexes", _hire_inbox),
+    (6, "normalized ingredient names", _ingredient_normalized_names),
+    (7, "chef ranking aggregates", _chef_ranking),
+    (8, "compressed recipe instructions", _compressed_instructions),
+    (9, "cuisine spellings", _cuisine_spellings),
+    (10, "duplicate chefs merged, Chefs.user_id unique", _unique_chefs),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# Identifies the schema the migrations above produce.
+def schema_fingerprint(migrations=MIGRATIONS):
+    """Returns a positive 31-bit checksum of every migration's version and description."""
+    text = "\n".join(f"{version}:{description}" for version, description, _ in migrations)
+    return zlib.crc32(text.encode("utf-8")) & 0x7FFFFFFF
+
+
+# Stored in PRAGMA user_version once a database is fully migrated. SQLite
+# keeps user_version in the file header, so checking it reads no table.
+SCHEMA_FINGERPRINT = schema_fingerprint()
+
+# Fully migrated database that new instances are copied from, if it exists.
+TEMPLATE_PATH = os.environ.get("FORKS_AND_FOLKS_TEMPLATE_DB", "forks_and_folks.template.db")
+
+
+# Creates the bookkeeping table that records applied migrations.
+def _ensure_version_table(conn):
+    """Creates schema_version if it does not exist yet."""
+    execute_query(conn, '''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+# Reads the schema version of a database.
+def current_version(conn):
+    """Returns the highest applied migration, or 0 for a new database."""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        # No schema_version table: a new database or one made before migrations.
+        return 0
+    return row[0] or 0
+
+
+# Tells whether a database already has the latest schema.
+def schema_is_current(conn):
+    """Compares the fingerprint in the file header with SCHEMA_FINGERPRINT."""
+    return conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_FINGERPRINT
+
+
+# Applies every migration newer than the database, each in its own transaction.
+def migrate(path=None, target=None):
+    """Brings the database up to date and returns the versions applied."""
+    target = LATEST_VERSION if target is None else target
+    conn = create_connection(path)
+    try:
+        # Fast path: an up-to-date database costs a read of the file header.
+        if schema_is_current(conn):
+            return []
+        applied = []
+        if current_version(conn) < target:
+            for version, description, migration in MIGRATIONS:
+                if version > target:
+                    break
+                with transaction(conn):
+                    _ensure_version_table(conn)
+                    # Re-check inside the write lock in case another process got here first.
+                    if current_version(conn) >= version:
+                        continue
+                    migration(conn)
+                    execute_query(conn, "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                                  (version, description))
+                applied.append(version)
+        # Also stamps databases that were migrated before the fingerprint existed.
+        if current_version(conn) >= LATEST_VERSION:
+            execute_query(conn, f"PRAGMA user_version = {SCHEMA_FINGERPRINT}")
+        return applied
+    finally:
+        close_connection(conn)
+
+
+# Opens a database file for reading only, without the connection pool.
+def _connect_read_only(path):
+    return sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+
+
+# Tells whether a template file exists and holds the latest schema.
+def template_is_current(template):
+    """Returns True if template can be cloned as a fully migrated database."""
+    if not template or not os.path.exists(template):
+        return False
+    conn = _connect_read_only(template)
+    try:
+        return schema_is_current(conn)
+    finally:
+        conn.close()
+
+
+# Builds the template that new instances are cloned from.
+def build_template(path=TEMPLATE_PATH):
+    """Creates a fully migrated, indexed and analyzed database at path.
+
+    Sample data, password hashes, search indexes and query-planner
+    statistics are all in place, so a clone is ready to serve at once.
+    """
+    if os.path.exists(path):
+        raise ValueError(f"{path} already exists; remove it to rebuild the template.")
+    migrate(path)
+    conn = create_connection(path)
+    try:
+        with transaction(conn):
+            optimize_search_index(conn)
+            execute_query(conn, "ANALYZE")
+    finally:
+        close_connection(conn)
+    # Pack the file and leave WAL mode, so the template is one small file and
+    # reading it never creates -wal/-shm files; clones switch back on connect.
+    database.close_pool(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        conn.close()
+    return path
+
+
+# Copies a template to a new database file with the SQLite backup API.
+def clone_template(template, path):
+    """Writes a copy of template to path; returns False if path appeared meanwhile.
+
+    The copy is made next to path and linked into place, so another process
+    starting at the same moment never sees a half-written database. Where
+    the file system has no hard links, path is claimed first and the copy is
+    written straight into it; the backup is one write transaction there, so
+    a process opening it sees either an empty or a complete database.
+    """
+    fd, partial = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".partial")
+    os.close(fd)
+    try:
+        _backup(template, partial)
+        os.link(partial, path)
+    except FileExistsError:
+        return False
+    except OSError:
+        # EPERM, EXDEV, ENOTSUP and the like: no hard links here.
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            return False
+        os.close(fd)
+        _backup(template, path)
+    finally:
+        os.remove(partial)
+    return True
+
+
+# Copies a database file with the SQLite backup API.
+def _backup(source_path, target_path):
+    source = _connect_read_only(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+# Gets the database ready at startup with as little work as possible.
+def prepare_database(path=None, template=TEMPLATE_PATH):
+    """Returns "current", "cloned" or "migrated", depending on what was needed.
+
+    A database whose fingerprint matches is used as it is. A missing one is
+    cloned from template when the template holds the latest schema.
+    Anything else goes through migrate().
+    """
+    path = path or database.DATABASE_PATH
+    if sharding.enabled() and path == database.DATABASE_PATH:
+        return _prepare_shards(path)
+    cloned = not os.path.exists(path) and template_is_current(template) and clone_template(template, path)
+    applied = migrate(path)
+    if applied:
+        return "migrated"
+    return "cloned" if cloned else "current"
+
+
+# Brings the catalog and every shard of a sharded deployment up to date.
+def _prepare_shards(catalog):
+    """Returns "migrated" if any file needed migrations, else "current".
+
+    Shard directories are created by sharding.py; a missing file means the
+    directory is incomplete, and no sample data is invented for it.
+    """
+    paths = [catalog] + sharding.shard_paths()
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        raise ValueError(f"Sharded database is missing {', '.join(missing)}.")
+    applied = [migrate(path) for path in paths]
+    return "migrated" if any(applied) else "current"
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Apply schema migrations or build the template database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade = commands.add_parser("migrate", help="bring a database up to date")
+    upgrade.add_argument("--db", help=f"database file (default: {database.DATABASE_PATH})")
+    template = commands.add_parser("build-template", help="build the database new instances are cloned from")
+    template.add_argument("path", nargs="?", default=TEMPLATE_PATH)
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "migrate":
+            applied = migrate(args.db)
+            print(f"Applied migrations {applied}." if applied else "Already up to date.")
+        else:
+            build_template(args.path)
+            print(f"Template written to {args.path} (schema {LATEST_VERSION}, fingerprint {SCHEMA_FINGERPRINT}).")
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        return 2
+    finally:
+        database.close_all_pools()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import os
+import hmac
+import base64
+import hashlib
+
+# Scheme used for new hashes: "scrypt" or "pbkdf2_sha256".
+PASSWORD_SCHEME = os.environ.get("FORKS_AND_FOLKS_PASSWORD_SCHEME", "scrypt")
+
+# scrypt cost: n is the CPU/memory cost (a power of two), r the block size,
+# p the parallelism. Memory per hash is roughly 128 * n * r bytes.
+SCRYPT_N = int(os.environ.get("FORKS_AND_FOLKS_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.environ.get("FORKS_AND_FOLKS_SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("FORKS_AND_FOLKS_SCRYPT_P", "1"))
+
+# PBKDF2-HMAC-SHA256 iteration count.
+PBKDF2_ITERATIONS = int(os.environ.get("FORKS_AND_FOLKS_PBKDF2_ITERATIONS", "600000"))
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Threads used by verify_password_async(); hashlib releases the GIL while
+# it runs scrypt and PBKDF2, so threads verify in parallel across cores.
+VERIFY_WORKERS = int(os.environ.get("FORKS_AND_FOLKS_VERIFY_WORKERS", str(os.cpu_count() or 2)))
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+# Derives a key with scrypt.
+def _scrypt(password, salt, n, r, p):
+    """Returns the scrypt key for a password."""
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p + 1024 * 1024, dklen=KEY_BYTES)
+
+
+# Derives a key with PBKDF2-HMAC-SHA256.
+def _pbkdf2(password, salt, iterations):
+    """Returns the PBKDF2 key for a password."""
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, dklen=KEY_BYTES)
+
+
+# Hashes a password with a random salt using the configured scheme.
+def hash_password(password, scheme=None, **cost):
+    """Returns an encoded, salted hash: scheme$cost...$salt$key.
+
+    cost overrides the configured parameters (n/r/p for scrypt, iterations
+    for pbkdf2_sha256).
+    """
+    scheme = scheme or PASSWORD_SCHEME
+    salt = os.urandom(SALT_BYTES)
+    if scheme == "scrypt":
+        n, r, p = cost.get("n", SCRYPT_N), cost.get("r", SCRYPT_R), cost.get("p", SCRYPT_P)
+        key = _scrypt(password, salt, n, r, p)
+        return f"scrypt${n}${r}${p}${_b64encode(salt)}${_b64encode(key)}"
+    if scheme == "pbkdf2_sha256":
+        iterations = cost.get("iterations", PBKDF2_ITERATIONS)
+        key = _pbkdf2(password, salt, iterations)
+        return f"pbkdf2_sha256${iterations}${_b64encode(salt)}${_b64encode(key)}"
+    raise ValueError(f"Unknown password scheme {scheme!r}")
+
+
+# Tells whether a stored hash predates salted hashing.
+def is_legacy_hash(stored_password):
+    """Returns True for the old unsalted SHA-256 hex digests."""
+    return "$" not in stored_password
+
+
+# Verifies a hashed password against a provided password.
+def verify_password(stored_password, provided_password):
+    """Verifies a password against any supported hash, in constant time."""
+    if not stored_password:
+        return False
+    if is_legacy_hash(stored_password):
+        candidate = hashlib.sha256(provided_password.encode()).hexdigest()
+        return hmac.compare_digest(stored_password, candidate)
+    scheme, *fields = stored_password.split("$")
+    try:
+        if scheme == "scrypt":
+            n, r, p, salt, key = fields
+            candidate = _scrypt(provided_password, _b64decode(salt), int(n), int(r), int(p))
+        elif scheme == "pbkdf2_sha256":
+            iterations, salt, key = fields
+            candidate = _pbkdf2(provided_password, _b64decode(salt), int(iterations))
+        else:
+            return False
+    except ValueError:
+        # Malformed hash: treat as a failed login rather than crashing.
+        return False
+    return hmac.compare_digest(_b64decode(key), candidate)
+
+
+# Tells whether a stored hash should be replaced with one at the current settings.
+def needs_rehash(stored_password):
+    """Returns True for legacy hashes and hashes made with other settings."""
+    if is_legacy_hash(stored_password):
+        return True
+    scheme, *fields = stored_password.split("$")
+    if scheme != PASSWORD_SCHEME:
+        return True
+    if scheme == "scrypt":
+        return fields[:3] != [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+    return fields[0] != str(PBKDF2_ITERATIONS)
+
+
+# A hash of a random password, verified against when a username does not
+# exist so failed logins take the same time either way.
+_DUMMY_HASH = None
+
+
+# Burns the same time as a real verification.
+def dummy_verify(provided_password):
+    """Runs a verification that always fails, to hide unknown usernames."""
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = hash_password(_b64encode(os.urandom(SALT_BYTES)))
+    verify_password(_DUMMY_HASH, provided_password)
+    return False
+
+
+_executor = None
+
+
+# Returns the shared verification thread pool, starting it on first use.
+def _verify_executor():
+    global _executor
+    if _executor is None:
+        # Imported here: most processes never verify asynchronously, and
+        # concurrent.futures adds to every startup.
+        from concurrent.futures import ThreadPoolExecutor
+        _executor = ThreadPoolExecutor(max_workers=VERIFY_WORKERS, thread_name_prefix="verify")
+    return _executor
+
+
+# Verifies a password on the worker pool so the caller is not blocked.
+def verify_password_async(stored_password, provided_password):
+    """Returns a concurrent.futures.Future resolving to verify_password(...)."""
+    return _verify_executor().submit(verify_password, stored_password, provided_password)
+
+
+# dummy_verify() on the worker pool.
+def dummy_verify_async(provided_password):
+    """Returns a concurrent.futures.Future resolving to False after a full-cost check."""
+    return _verify_executor().submit(dummy_verify, provided_password)
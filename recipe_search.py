@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+import re
+import sqlite3
+from database import strict_connection, close_connection, execute_query, fetch_all
+
+# Relative weight of each indexed column in the bm25 ranking, in column order:
+# recipe_name, ingredients, instructions, portfolio_details.
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+# Markers placed around matched terms in snippets.
+HIGHLIGHT_START = "["
+HIGHLIGHT_END = "]"
+
+# Tokens shown around a match in a snippet.
+SNIPPET_TOKENS = 12
+
+# Portfolio of the chef who wrote a recipe; Recipes.chef_id holds the chef's user id.
+_PORTFOLIO_OF_NEW_RECIPE = "(SELECT portfolio_details FROM Chefs WHERE user_id = new.chef_id ORDER BY chef_id LIMIT 1)"
+
+# Virtual table and the triggers that keep it in step with Recipes and Chefs.
+SEARCH_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS Recipe_Search USING fts5(
+        recipe_name, ingredients, instructions, portfolio_details,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_recipes_search_insert
+    AFTER INSERT ON Recipes
+    BEGIN
+        INSERT INTO Recipe_Search (rowid, recipe_name, ingredients, instructions, portfolio_details)
+        VALUES (new.recipe_id, new.recipe_name, new.ingredients, new.instructions, {_PORTFOLIO_OF_NEW_RECIPE});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_recipes_search_update
+    AFTER UPDATE ON Recipes
+    BEGIN
+        DELETE FROM Recipe_Search WHERE rowid = old.recipe_id;
+        INSERT INTO Recipe_Search (rowid, recipe_name, ingredients, instructions, portfolio_details)
+        VALUES (new.recipe_id, new.recipe_name, new.ingredients, new.instructions, {_PORTFOLIO_OF_NEW_RECIPE});
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_recipes_search_delete
+    AFTER DELETE ON Recipes
+    BEGIN
+        DELETE FROM Recipe_Search WHERE rowid = old.recipe_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_chefs_search_insert
+    AFTER INSERT ON Chefs
+    BEGIN
+        UPDATE Recipe_Search SET portfolio_details = new.portfolio_details
+        WHERE rowid IN (SELECT recipe_id FROM Recipes WHERE chef_id = new.user_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_chefs_search_update
+    AFTER UPDATE OF portfolio_details ON Chefs
+    BEGIN
+        UPDATE Recipe_Search SET portfolio_details = new.portfolio_details
+        WHERE rowid IN (SELECT recipe_id FROM Recipes WHERE chef_id = new.user_id);
+    END
+    ''',
+]
+
+# Recipes triggers used once instruction text has moved to Recipe_Instructions
+# (migration 8). They index names, ingredients and portfolios;
+# recipe_storage.store_instructions() adds the instructions.
+COMPACT_RECIPE_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_recipes_search_insert
+    AFTER INSERT ON Recipes
+    BEGIN
+        INSERT INTO Recipe_Search (rowid, recipe_name, ingredients, portfolio_details)
+        VALUES (new.recipe_id, new.recipe_name, new.ingredients, {_PORTFOLIO_OF_NEW_RECIPE});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_recipes_search_update
+    AFTER UPDATE ON Recipes
+    BEGIN
+        UPDATE Recipe_Search
+        SET rowid = new.recipe_id, recipe_name = new.recipe_name, ingredients = new.ingredients,
+            portfolio_details = {_PORTFOLIO_OF_NEW_RECIPE}
+        WHERE rowid = old.recipe_id;
+    END
+    ''',
+]
+
+
+# Creates the FTS5 index and fills it from the existing recipes.
+def create_search_index(conn):
+    """Builds Recipe_Search; returns False when SQLite lacks FTS5."""
+    try:
+        execute_query(conn, SEARCH_SCHEMA[0])
+    except sqlite3.OperationalError as e:
+        if "fts5" not in str(e):
+            raise
+        # This SQLite build has no FTS5; search_recipes() falls back to LIKE.
+        return False
+    for statement in SEARCH_SCHEMA[1:]:
+        execute_query(conn, statement)
+    execute_query(conn, "DELETE FROM Recipe_Search")
+    execute_query(conn, '''
+        INSERT INTO Recipe_Search (rowid, recipe_name, ingredients, instructions, portfolio_details)
+        SELECT Recipes.recipe_id, Recipes.recipe_name, Recipes.ingredients, Recipes.instructions,
+               (SELECT portfolio_details FROM Chefs WHERE Chefs.user_id = Recipes.chef_id ORDER BY chef_id LIMIT 1)
+        FROM Recipes
+    ''')
+    return True
+
+
+# Merges the search index into one segment after a bulk load.
+def optimize_search_index(conn):
+    """Rewrites Recipe_Search compactly, dropping the space left by replaced rows."""
+    if search_index_available(conn):
+        execute_query(conn, "INSERT INTO Recipe_Search (Recipe_Search) VALUES ('optimize')")
+
+
+# Tells whether the database has the FTS5 search table.
+def search_index_available(conn):
+    """Returns True if Recipe_Search exists in this database."""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'Recipe_Search'").fetchone()
+    return row is not None
+
+
+# Turns free text typed by a user into a safe FTS5 query.
+def build_match_query(text, prefix=True, operator="AND"):
+    """Quotes each word of the input, optionally as a prefix, joined by operator."""
+    terms = re.findall(r"\w+", text)
+    suffix = "*" if prefix else ""
+    return f" {operator} ".join(f'"{term}"{suffix}' for term in terms)
+
+
+# Searches recipes by name, ingredients, instructions and chef portfolio.
+def search_recipes(text, limit=10, prefix=True):
+    """Returns [(recipe_id, recipe_name, snippet)] ranked best first.
+
+    Every word must match (as a prefix unless prefix=False); if nothing
+    matches all words, recipes matching any of them are returned instead.
+    """
+    if not re.search(r"\w", text):
+        return []
+    conn = strict_connection()
+    try:
+        if not search_index_available(conn):
+            return _search_recipes_like(conn, text, limit)
+        weights = ", ".join(str(weight) for weight in COLUMN_WEIGHTS)
+        query = f'''
+            SELECT rowid, recipe_name,
+                   snippet(Recipe_Search, -1, ?, ?, '...', ?)
+            FROM Recipe_Search
+            WHERE Recipe_Search MATCH ?
+            ORDER BY bm25(Recipe_Search, {weights})
+            LIMIT ?
+        '''
+        results = []
+        for operator in ("AND", "OR"):
+            match = build_match_query(text, prefix, operator)
+            cursor = execute_query(conn, query, (HIGHLIGHT_START, HIGHLIGHT_END, SNIPPET_TOKENS, match, limit))
+            results = fetch_all(cursor) or []
+            if results:
+                break
+        return results
+    finally:
+        close_connection(conn)
+
+
+# Fallback for SQLite builds without FTS5.
+def _search_recipes_like(conn, text, limit):
+    """Substring search over recipe names and ingredients."""
+    pattern = f"%{text.strip()}%"
+    cursor = execute_query(conn, '''
+        SELECT recipe_id, recipe_name, ingredients
+        FROM Recipes
+        WHERE recipe_name LIKE ? OR ingredients LIKE ?
+        LIMIT ?
+    ''', (pattern, pattern, limit))
+    return fetch_all(cursor) or []
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+"""Compressed storage for recipe instructions.
+
+Recipes keeps only the columns that lists and searches read (name,
+ingredients, chef). Instruction text lives in Recipe_Instructions, one row
+per recipe, and is read only when a recipe's details are opened. It is
+stored zlib-compressed as a BLOB, or as plain TEXT when compressing would
+not make it smaller; unpack_instructions() reads either.
+"""
+
+import zlib
+from database import execute_many
+from recipe_search import search_index_available
+
+# zlib level for instruction text: 6 is zlib's default trade of size for speed.
+COMPRESSION_LEVEL = 6
+
+# Recipes read per batch when moving instructions out of the Recipes table.
+BATCH_SIZE = 10000
+
+
+# Compresses instruction text for storage.
+def pack_instructions(text):
+    """Returns zlib-compressed UTF-8 bytes, or text itself when that is no larger."""
+    if text is None:
+        return None
+    data = text.encode("utf-8")
+    packed = zlib.compress(data, COMPRESSION_LEVEL)
+    return packed if len(packed) < len(data) else text
+
+
+# Reverses pack_instructions().
+def unpack_instructions(value):
+    """Returns the instruction text of a stored BLOB or TEXT value."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+# Writes the instructions of recipes that already exist in Recipes.
+def store_instructions(conn, rows):
+    """Stores [(recipe_id, text)], replacing earlier text, and updates the search index.
+
+    Rows with no text are skipped. Call it inside the transaction that
+    writes the recipes.
+    """
+    rows = [(recipe_id, text) for recipe_id, text in rows if text is not None]
+    if not rows:
+        return
+    execute_many(conn, "INSERT OR REPLACE INTO Recipe_Instructions (recipe_id, body) VALUES (?, ?)",
+                 [(recipe_id, pack_instructions(text)) for recipe_id, text in rows])
+    # The Recipes triggers index names and ingredients; the text is only known here.
+    if search_index_available(conn):
+        execute_many(conn, "UPDATE Recipe_Search SET instructions = ? WHERE rowid = ?",
+                     [(text, recipe_id) for recipe_id, text in rows])
+
+
+# Copies Recipes.instructions into Recipe_Instructions, compressed.
+def move_instructions(conn):
+    """Packs the instructions of every recipe, in batches; Recipe_Search already has the text."""
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT recipe_id, instructions FROM Recipes WHERE recipe_id > ? ORDER BY recipe_id LIMIT ?",
+            (last_id, BATCH_SIZE),
+        ).fetchall()
+        if not rows:
+            break
+        execute_many(conn, "INSERT OR REPLACE INTO Recipe_Instructions (recipe_id, body) VALUES (?, ?)",
+                     [(recipe_id, pack_instructions(text)) for recipe_id, text in rows if text is not None])
+        last_id = rows[-1][0]
@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+
+"""Data operations behind every menu action.
+
+Nothing here reads input or prints, so the same functions back the
+interactive menus in create_environment.py, the asyncio hire server,
+bulk jobs and benchmarks. Each call checks out a connection, runs its
+statements and returns it, so no connection is held while a user types.
+In sharded mode (see sharding.py) user data is read from and written to
+the shard that holds it, and reads spanning users are merged across shards.
+Invalid arguments raise ValueError. Reads use database.strict_connection()
+and writes run in transaction(), so database errors always reach the
+caller as sqlite3.Error: a failed read is never returned (or cached) as
+an empty result.
+"""
+
+import sqlite3
+from typing import NamedTuple
+from dataclasses import dataclass
+from database import (
+    strict_connection,
+    close_connection,
+    execute_query,
+    fetch_all,
+    fetch_one,
+    fetch_page,
+    transaction,
+)
+import sharding
+from cache import invalidate, read_through
+from ingredient_search import index_recipe_ingredients, invalidate_ingredient_index
+from recipe_storage import store_instructions, unpack_instructions
+from passwords import dummy_verify, hash_password, needs_rehash, verify_password
+
+# Most inbox items returned by one check; the rest wait for the next one.
+INBOX_LIMIT = 100
+
+# Answers a chef may give to a hiring request.
+RESPONSES = ("accept", "decline")
+
+# Roles a user can sign up with.
+ROLES = ("Chef", "Consumer")
+
+
+# Everything the menus need to know about the logged-in user.
+@dataclass(frozen=True)
+class Session:
+    """The logged-in user's ids and role, resolved once at login."""
+    user_id: int
+    username: str
+    role: str
+    chef_id: int = None
+
+
+# A user's login record: who they are and the stored password hash.
+class Credentials(NamedTuple):
+    user_id: int
+    username: str
+    password: str
+    role: str
+    chef_id: int
+
+    def session(self):
+        """Returns the Session of a user whose password checked out."""
+        return Session(self.user_id, self.username, self.role, self.chef_id)
+
+
+# One ranked chef, with the aggregates behind the ranking.
+class ChefRecommendation(NamedTuple):
+    chef_id: int
+    username: str
+    portfolio_details: str
+    score: float
+    acceptance_rate: float  # None until the chef has answered a request
+    avg_response_hours: float  # None until an answer has been timed
+    pending: int
+    recipes: int
+
+
+# The full text of one recipe, as shown on its detail page.
+class Recipe(NamedTuple):
+    recipe_name: str
+    ingredients: str
+    instructions: str
+
+
+# Registers a new user and, for chefs, their portfolio.
+def signup(username, password, role, portfolio_details=""):
+    """Creates the user; returns the new user_id, or None if the username is taken.
+
+    The user and chef rows are committed together or not at all. The
+    password is hashed before the transaction starts, so the write lock is
+    held only for the two inserts. In sharded mode the catalog's unique
+    username decides who gets a name; the user's shard then gets the same
+    rows, with the password.
+    """
+    if role not in ROLES:
+        raise ValueError(f"Role must be one of {', '.join(ROLES)}.")
+    hashed_password = hash_password(password)
+    try:
+        with transaction() as conn:
+            cursor = execute_query(conn, "INSERT INTO Users (username, password, role) VALUES (?, ?, ?)",
+                                   (username, "" if sharding.enabled() else hashed_password, role))
+            user_id = cursor.lastrowid
+            chef_id = None
+            if role == "Chef":
+                chef_id = execute_query(conn, "INSERT INTO Chefs (user_id, portfolio_details) VALUES (?, ?)",
+                                        (user_id, portfolio_details)).lastrowid
+    except sqlite3.IntegrityError:
+        return None
+    if sharding.enabled():
+        _add_user_to_shard(user_id, username, hashed_password, role, chef_id, portfolio_details)
+    if role == "Chef":
+        invalidate("chefs")
+    return user_id
+
+
+# Copies a new user from the catalog directory to their shard.
+def _add_user_to_shard(user_id, username, hashed_password, role, chef_id, portfolio_details):
+    """Inserts the user (and chef) rows on the user's shard with the catalog's ids.
+
+    If that fails the catalog rows are deleted again, so the username is
+    free and no half-created user is left behind.
+    """
+    try:
+        with transaction(path=sharding.user_database(user_id)) as conn:
+            execute_query(conn, "INSERT INTO Users (user_id, username, password, role) VALUES (?, ?, ?, ?)",
+                          (user_id, username, hashed_password, role))
+            if chef_id is not None:
+                execute_query(conn, "INSERT INTO Chefs (chef_id, user_id, portfolio_details) VALUES (?, ?, ?)",
+                              (chef_id, user_id, portfolio_details))
+    except BaseException:
+        with transaction() as conn:
+            execute_query(conn, "DELETE FROM Chefs WHERE user_id = ?", (user_id,))
+            execute_query(conn, "DELETE FROM Users WHERE user_id = ?", (user_id,))
+        raise
+
+
+# Logs in a user and returns their session.
+def login(username, password):
+    """Logs in a user; returns a Session, or None if the credentials are wrong."""
+    credentials = find_credentials(username)
+    if credentials is None:
+        # Spend the same time as a real check so unknown usernames are not revealed.
+        return dummy_verify(password) or None
+    if not verify_password(credentials.password, password):
+        return None
+    if needs_rehash(credentials.password):
+        upgrade_password_hash(credentials.user_id, credentials.password, password)
+    return credentials.session()
+
+
+# Looks up the login record of a username, without checking the password.
+def find_credentials(username):
+    """Returns Credentials, or None if there is no such user."""
+    conn = strict_connection()
+    # One indexed lookup resolves the user and, for chefs, their chef_id.
+    query = '''
+        SELECT Users.user_id, Users.username, Users.password, Users.role, Chefs.chef_id
+        FROM Users
+        LEFT JOIN Chefs ON Chefs.user_id = Users.user_id
+        WHERE Users.username = ?
+        ORDER BY Chefs.chef_id
+        LIMIT 1
+    '''
+    try:
+        user = fetch_one(execute_query(conn, query, (username,)))
+    finally:
+        close_connection(conn)
+    if not user:
+        return None
+    credentials = Credentials(*user)
+    if sharding.enabled():
+        # The catalog knows the name; only the user's shard holds the password.
+        credentials = credentials._replace(password=_shard_password(credentials.user_id))
+    return credentials
+
+
+# Reads a user's password hash from their shard.
+def _shard_password(user_id):
+    """Returns the stored hash, or "" (which matches no password) if the shard lacks the user."""
+    conn = strict_connection(sharding.user_database(user_id))
+    try:
+        row = fetch_one(execute_query(conn, "SELECT password FROM Users WHERE user_id = ?", (user_id,)))
+    finally:
+        close_connection(conn)
+    return row[0] if row else ""
+
+
+# Replaces a legacy or outdated password hash after a successful login.
+def upgrade_password_hash(user_id, old_hash, password):
+    """Stores a hash at the current settings unless the password changed meanwhile."""
+    conn = strict_connection(sharding.user_database(user_id))
+    query = "UPDATE Users SET password = ? WHERE user_id = ? AND password = ?"
+    try:
+        execute_query(conn, query, (hash_password(password), user_id, old_hash))
+    finally:
+        close_connection(conn)
+
+
+# Fetches one page of recipe names for the list view.
+@read_through("recipes")
+def fetch_recipe_page(after=None, before=None):
+    """Returns ([(recipe_id, recipe_name)], has_more)."""
+    conn = strict_connection()
+    try:
+        return fetch_page(conn, "SELECT recipe_id, recipe_name FROM Recipes", "recipe_id",
+                          after=after, before=before)
+    finally:
+        close_connection(conn)
+
+
+# Loads the full text of one recipe when its details are opened.
+@read_through("recipes")
+def fetch_recipe(recipe_id):
+    """Returns a Recipe, or None if there is no such recipe."""
+    conn = strict_connection()
+    # The instructions are stored apart from Recipes, compressed; only this view reads them.
+    query = '''
+        SELECT Recipes.recipe_name, Recipes.ingredients, Recipe_Instructions.body
+        FROM Recipes
+        LEFT JOIN Recipe_Instructions ON Recipe_Instructions.recipe_id = Recipes.recipe_id
+        WHERE Recipes.recipe_id = ?
+    '''
+    try:
+        recipe = fetch_one(execute_query(conn, query, (recipe_id,)))
+    finally:
+        close_connection(conn)
+    if not recipe:
+        return None
+    recipe_name, ingredients, instructions = recipe
+    return Recipe(recipe_name, ingredients, unpack_instructions(instructions))
+
+
+# Stores a chef's new recipe.
+def create_recipe(author_id, recipe_name, ingredients, instructions):
+    """Inserts the recipe and its ingredient index rows; returns the recipe_id.
+
+    author_id is the chef's user_id, which is what Recipes.chef_id holds.
+    """
+    if not recipe_name.strip():
+        raise ValueError("Recipe name must not be empty.")
+    recipe_query = "INSERT INTO Recipes (recipe_name, ingredients, chef_id) VALUES (?, ?, ?)"
+    with transaction() as conn:
+        cursor = execute_query(conn, recipe_query, (recipe_name, ingredients, author_id))
+        recipe_id = cursor.lastrowid
+        store_instructions(conn, [(recipe_id, instructions)])
+        index_recipe_ingredients(conn, recipe_id, ingredients)
+    if sharding.enabled():
+        # The recipe is in the catalog; the count that feeds the ranking is on the chef's shard.
+        with transaction(path=sharding.user_database(author_id)) as conn:
+            execute_query(conn, '''
+                UPDATE Chef_Stats SET recipes = recipes + 1
+                WHERE chef_id IN (SELECT chef_id FROM Chefs WHERE user_id = ?)
+            ''', (author_id,))
+    invalidate("recipes")
+    invalidate_ingredient_index()
+    return recipe_id
+
+
+# Fetches one page of ingredients and their locations.
+@read_through("ingredients")
+def fetch_ingredient_page(after=None, before=None):
+    """Returns ([(ingredient_id, ingredient_name, location)], has_more)."""
+    conn = strict_connection()
+    try:
+        return fetch_page(conn, "SELECT ingredient_id, ingredient_name, location FROM Ingredients",
+                          "ingredient_id", after=after, before=before)
+    finally:
+        close_connection(conn)
+
+
+# Fetches one page of chefs and their portfolios.
+@read_through("chefs")
+def fetch_chef_page(after=None, before=None):
+    """Returns ([(chef_id, username, portfolio_details)], has_more)."""
+    conn = strict_connection()
+    select = '''
+        SELECT Chefs.chef_id, Users.username, Chefs.portfolio_details
+        FROM Chefs
+        INNER JOIN Users ON Chefs.user_id = Users.user_id
+    '''
+    try:
+        return fetch_page(conn, select, "Chefs.chef_id", after=after, before=before)
+    finally:
+        close_connection(conn)
+
+
+# Loads a chef's portfolio text.
+def fetch_portfolio(chef_id):
+    """Returns the portfolio details, or None if there is no such chef."""
+    conn = strict_connection()
+    try:
+        portfolio = fetch_one(execute_query(conn, "SELECT portfolio_details FROM Chefs WHERE chef_id = ?", (chef_id,)))
+    finally:
+        close_connection(conn)
+    return portfolio[0] if portfolio else None
+
+
+# Replaces a chef's portfolio text.
+def update_portfolio(chef_id, portfolio_details):
+    """Returns True if the chef exists and was updated.
+
+    In sharded mode the catalog copy, which is listed and searched, is
+    updated first, then the shard copy the cuisine tags are derived from.
+    """
+    query = "UPDATE Chefs SET portfolio_details = ? WHERE chef_id = ?"
+    with transaction() as conn:
+        updated = execute_query(conn, query, (portfolio_details, chef_id)).rowcount == 1
+    if updated and sharding.enabled():
+        with transaction(path=sharding.chef_database(chef_id)) as conn:
+            execute_query(conn, query, (portfolio_details, chef_id))
+    if updated:
+        invalidate("chefs")
+    return updated
+
+
+# Columns of a ChefRecommendation, read from Chef_Stats.
+_RECOMMENDATION_COLUMNS = '''
+    Chef_Stats.chef_id, Users.username, Chefs.portfolio_details, Chef_Stats.score,
+    Chef_Stats.accepted, Chef_Stats.declined, Chef_Stats.timed_responses, Chef_Stats.response_seconds,
+    Chef_Stats.pending, Chef_Stats.recipes
+'''
+
+
+# Ranks chefs by their precomputed score, optionally within one cuisine.
+def recommend_chefs(cuisine=None, limit=10):
+    """Returns the top `limit` chefs as ChefRecommendations, best first.
+
+    Scores live in Chef_Stats and Chef_Cuisines, kept current by triggers on
+    every hire, answer and recipe, so this reads `limit` rows off an index
+    however many hires have accumulated. Sharded, each shard returns its
+    own top `limit` and the best of those are kept.
+    """
+    if cuisine:
+        query = f'''
+            SELECT {_RECOMMENDATION_COLUMNS}
+            FROM Chef_Cuisines
+            INNER JOIN Chef_Stats ON Chef_Stats.chef_id = Chef_Cuisines.chef_id
+            INNER JOIN Chefs ON Chefs.chef_id = Chef_Stats.chef_id
+            INNER JOIN Users ON Users.user_id = Chefs.user_id
+            WHERE Chef_Cuisines.cuisine = ?
+            ORDER BY Chef_Cuisines.score DESC, Chef_Cuisines.chef_id
+            LIMIT ?
+        '''
+        params = (cuisine.strip().lower(), limit)
+    else:
+        query = f'''
+            SELECT {_RECOMMENDATION_COLUMNS}
+            FROM Chef_Stats
+            INNER JOIN Chefs ON Chefs.chef_id = Chef_Stats.chef_id
+            INNER JOIN Users ON Users.user_id = Chefs.user_id
+            ORDER BY Chef_Stats.score DESC, Chef_Stats.chef_id
+            LIMIT ?
+        '''
+        params = (limit,)
+    rows = [row for shard_rows in sharding.gather(query, params) for row in shard_rows]
+    rows = sorted(rows, key=lambda row: (-row[3], row[0]))[:limit]
+    recommendations = []
+    for chef_id, username, portfolio, score, accepted, declined, timed, seconds, pending, recipes in rows:
+        answered = accepted + declined
+        recommendations.append(ChefRecommendation(
+            chef_id, username, portfolio, score,
+            accepted / answered if answered else None,
+            seconds / timed / 3600 if timed else None,
+            pending, recipes))
+    return recommendations
+
+
+# Lists the cuisines chefs can be recommended for.
+def list_cuisines():
+    """Returns the cuisines chefs are tagged with, alphabetically."""
+    conn = strict_connection()
+    try:
+        rows = fetch_all(execute_query(conn, "SELECT DISTINCT cuisine FROM Cuisine_Keywords ORDER BY cuisine")) or []
+    finally:
+        close_connection(conn)
+    return [row[0] for row in rows]
+
+
+# Guesses which cuisine a consumer likes from their recent hires.
+def favourite_cuisine(consumer_id, recent=20):
+    """Returns the cuisine most common among the chefs of the consumer's last hires, or None."""
+    # Each shard lists the cuisines of its latest hires; the newest `recent` hires overall are counted.
+    query = '''
+        SELECT recent.hire_id, Chef_Cuisines.cuisine
+        FROM (SELECT hire_id, chef_id FROM Chef_Hires WHERE consumer_id = ? ORDER BY hire_id DESC LIMIT ?) AS recent
+        LEFT JOIN Chef_Cuisines ON Chef_Cuisines.chef_id = recent.chef_id
+    '''
+    rows = [row for shard_rows in sharding.gather(query, (consumer_id, recent)) for row in shard_rows]
+    latest = set(sorted({hire_id for hire_id, _ in rows}, reverse=True)[:recent])
+    counts = {}
+    for hire_id, cuisine in rows:
+        if hire_id in latest and cuisine is not None:
+            counts[cuisine] = counts.get(cuisine, 0) + 1
+    return min(counts, key=lambda cuisine: (-counts[cuisine], cuisine)) if counts else None
+
+
+# Records a hiring request from a consumer to a chef.
+def hire_chef(consumer_id, chef_id, conn=None):
+    """Validates the chef and inserts the hire in one transaction.
+
+    Returns the new hire_id, or None if there is no such chef. Inside a
+    transaction already open on conn, the hire becomes a savepoint of it;
+    in sharded mode conn must be open on the chef's shard.
+    """
+    try:
+        path = sharding.chef_database(chef_id)
+    except LookupError:
+        return None
+    with transaction(conn, path=path) as conn:
+        chef = fetch_one(execute_query(conn, "SELECT chef_id FROM Chefs WHERE chef_id = ?", (chef_id,)))
+        if not chef:
+            return None
+        if sharding.enabled():
+            hire_id = sharding.next_hire_id(conn, path)
+            execute_query(conn, "INSERT INTO Chef_Hires (hire_id, chef_id, consumer_id) VALUES (?, ?, ?)",
+                          (hire_id, chef[0], consumer_id))
+            return hire_id
+        cursor = execute_query(conn, "INSERT INTO Chef_Hires (chef_id, consumer_id) VALUES (?, ?)",
+                               (chef[0], consumer_id))
+        return cursor.lastrowid
+
+
+# Chef_Hires condition for each status a hire list can be filtered by.
+STATUS_FILTERS = {
+    "pending": "Chef_Hires.response IS NULL",
+    "accepted": "Chef_Hires.response = 'accept'",
+    "declined": "Chef_Hires.response = 'decline'",
+}
+
+
+# Builds the WHERE clause for a hire list filtered by owner and status.
+def _hire_filter(owner_column, status):
+    """Returns the condition for owner_column = ? plus an optional status."""
+    where = f"Chef_Hires.{owner_column} = ?"
+    if status in (None, "all"):
+        return where
+    if status not in STATUS_FILTERS:
+        raise ValueError(f"Status must be one of all, {', '.join(STATUS_FILTERS)}.")
+    return f"{where} AND {STATUS_FILTERS[status]}"
+
+
+# Fetches one page of a consumer's hiring requests and the chefs' answers.
+def fetch_hire_status_page(consumer_id, after=None, before=None, status=None):
+    """Returns ([(hire_id, chef_name, response, message, hire_date)], has_more).
+
+    A hire is stored with its chef, so when sharded every shard is asked
+    for its page and the pages are merged.
+    """
+    # Chef_Hires.chef_id refers to Chefs.chef_id, so reach the chef's name through Chefs.
+    select = '''
+        SELECT Chef_Hires.hire_id, Users.username AS chef_name, Chef_Hires.response, Chef_Hires.message, Chef_Hires.hire_date
+        FROM Chef_Hires
+        INNER JOIN Chefs ON Chef_Hires.chef_id = Chefs.chef_id
+        INNER JOIN Users ON Chefs.user_id = Users.user_id
+    '''
+    return sharding.gather_page(select, "Chef_Hires.hire_id", params=(consumer_id,),
+                                where=_hire_filter("consumer_id", status), after=after, before=before)
+
+
+# How hire lists name the consumer: joined from Users or, when sharded, as
+# an id for sharding.resolve_usernames() to replace, since the consumer
+# may live on another shard than the chef's hires.
+def _consumer_name():
+    """Returns (column, join) to put in a query over Chef_Hires."""
+    if sharding.enabled():
+        return "Chef_Hires.consumer_id AS consumer_name", ""
+    return "Users.username AS consumer_name", "INNER JOIN Users ON Chef_Hires.consumer_id = Users.user_id"
+
+
+# Fetches one page of the hiring requests sent to a chef.
+def fetch_notification_page(chef_id, after=None, before=None, status=None):
+    """Returns ([(hire_id, consumer_name, hire_date, response)], has_more)."""
+    try:
+        conn = strict_connection(sharding.chef_database(chef_id))
+    except LookupError:
+        return [], False
+    column, join = _consumer_name()
+    select = f'''
+        SELECT Chef_Hires.hire_id, {column}, Chef_Hires.hire_date, Chef_Hires.response
+        FROM Chef_Hires
+        {join}
+    '''
+    try:
+        rows, has_more = fetch_page(conn, select, "Chef_Hires.hire_id", params=(chef_id,),
+                                    where=_hire_filter("chef_id", status), after=after, before=before)
+    finally:
+        close_connection(conn)
+    return (sharding.resolve_usernames(rows, 1) if sharding.enabled() else rows), has_more
+
+
+# Queries that read what is new for a user, keyed on their inbox watermark.
+# A sharded consumer has a watermark on each shard, as change_seq counts per file.
+_NEW_FOR_CHEF = '''
+    SELECT Chef_Hires.hire_id, {column}, Chef_Hires.hire_date, Chef_Hires.response
+    FROM Chef_Hires
+    {join}
+    WHERE Chef_Hires.chef_id = ?
+      AND Chef_Hires.hire_id > COALESCE((SELECT last_seen_hire_id FROM Inbox_State WHERE user_id = ?), 0)
+    ORDER BY Chef_Hires.hire_id
+'''
+
+_NEW_FOR_CONSUMER = '''
+    SELECT Chef_Hires.hire_id, Users.username AS chef_name, Chef_Hires.response, Chef_Hires.message,
+           Chef_Hires.hire_date, Chef_Hires.change_seq
+    FROM Chef_Hires
+    INNER JOIN Chefs ON Chef_Hires.chef_id = Chefs.chef_id
+    INNER JOIN Users ON Chefs.user_id = Users.user_id
+    WHERE Chef_Hires.consumer_id = ?
+      AND Chef_Hires.change_seq > COALESCE((SELECT last_seen_change_seq FROM Inbox_State WHERE user_id = ?), 0)
+    ORDER BY Chef_Hires.change_seq
+'''
+
+
+# Counts the inbox items a user has not seen yet.
+def count_unread(session):
+    """Returns the number of new hires (chefs) or new answers (consumers)."""
+    if session.role == "Chef":
+        query = f"SELECT COUNT(*) FROM ({_NEW_FOR_CHEF.format(column='Chef_Hires.consumer_id', join='')})"
+        params = (session.chef_id, session.user_id)
+        paths = [sharding.chef_database(session.chef_id)]
+    else:
+        query = f"SELECT COUNT(*) FROM ({_NEW_FOR_CONSUMER})"
+        params = (session.user_id, session.user_id)
+        paths = None
+    return sum(rows[0][0] for rows in sharding.gather(query, params, paths))
+
+
+# Returns what is new for a user since their last check.
+def check_inbox(session, mark_seen=True, limit=INBOX_LIMIT):
+    """Returns the hires a chef has not seen, or the answers a consumer has not seen.
+
+    Chefs get [(hire_id, consumer_name, hire_date, response)]; consumers get
+    [(hire_id, chef_name, response, message, hire_date)]. Only rows past the
+    user's watermark are read, so the cost follows the number of new items,
+    not the length of the history. At most `limit` items are returned; with
+    mark_seen the watermark moves past them, so the next check continues
+    where this one stopped. A sharded consumer's answers are read shard by
+    shard, each past its own watermark, until `limit` is reached.
+    """
+    if session.role == "Chef":
+        path = sharding.chef_database(session.chef_id)
+        column, join = _consumer_name()
+        query = _NEW_FOR_CHEF.format(column=column, join=join) + " LIMIT ?"
+        rows = sharding.gather(query, (session.chef_id, session.user_id, limit), [path])[0]
+        if mark_seen and rows:
+            mark_inbox_seen(session.user_id, "last_seen_hire_id", rows[-1][0], path)
+        return sharding.resolve_usernames(rows, 1) if sharding.enabled() else rows
+    rows = []
+    for path in sharding.all_databases():
+        if len(rows) >= limit:
+            break
+        shard_rows = sharding.gather(_NEW_FOR_CONSUMER + " LIMIT ?",
+                                     (session.user_id, session.user_id, limit - len(rows)), [path])[0]
+        if mark_seen and shard_rows:
+            mark_inbox_seen(session.user_id, "last_seen_change_seq", shard_rows[-1][-1], path)
+        rows.extend(row[:-1] for row in shard_rows)
+    return rows
+
+
+# Moves a user's inbox watermark forward.
+def mark_inbox_seen(user_id, column, watermark, path=None):
+    """Advances last_seen_hire_id or last_seen_change_seq in the database at path; never moves it back."""
+    if column not in ("last_seen_hire_id", "last_seen_change_seq"):
+        raise ValueError(f"Unknown inbox watermark {column!r}")
+    # MAX() keeps two overlapping checks from moving the watermark backwards.
+    query = f'''
+        INSERT INTO Inbox_State (user_id, {column}) VALUES (?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET {column} = MAX({column}, excluded.{column})
+    '''
+    with transaction(path=path) as conn:
+        execute_query(conn, query, (user_id, watermark))
+
+
+# Stores a chef's answer to a hiring request.
+def respond_to_hire(hire_id, response, message, chef_id=None, conn=None):
+    """Records the response; returns True if the hire was updated.
+
+    With chef_id, only a hire addressed to that chef can be answered. Like
+    hire_chef(), it joins a transaction already open on conn (in sharded
+    mode, on the chef's shard). A sharded call with neither chef_id nor
+    conn looks for the hire on each shard in turn.
+    """
+    if response not in RESPONSES:
+        raise ValueError(f"Response must be one of {', '.join(RESPONSES)}.")
+    # responded_at keeps the first answer's time, for the chef's response-time ranking.
+    query = '''
+        UPDATE Chef_Hires SET response = ?, message = ?, responded_at = COALESCE(responded_at, CURRENT_TIMESTAMP)
+        WHERE hire_id = ?
+    '''
+    params = (response, message, hire_id)
+    if chef_id is not None:
+        query += " AND chef_id = ?"
+        params += (chef_id,)
+    if conn is not None or chef_id is not None:
+        try:
+            paths = [sharding.chef_database(chef_id) if chef_id is not None else None]
+        except LookupError:
+            return False
+    else:
+        paths = sharding.all_databases()
+    for path in paths:
+        with transaction(conn, path=path) as shard_conn:
+            if execute_query(shard_conn, query, params).rowcount == 1:
+                return True
+    return False
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+
+"""Optional sharded mode: user data spread over several SQLite files.
+
+A sharded deployment is one directory holding:
+
+    catalog.db      recipes, ingredients, the search indexes, and a
+                    directory of every user and chef (ids, usernames, roles,
+                    portfolios; no passwords)
+    shard-00.db...  the users with user_id % N == i (with their passwords),
+                    their Chefs rows, every hire sent to those chefs, the
+                    chefs' ranking rows and the users' inbox watermarks
+    shards.json     the shard files, in shard order
+
+A chef's hires live on the chef's shard, so hiring, answering, the chef's
+notifications and the ranking triggers each touch one file, and hires to
+chefs on different shards commit in parallel instead of queuing for one
+write lock. Reads that cover several chefs -- a consumer's hires, their
+inbox and favourite cuisine, the recommendation list -- are scatter-gathered:
+each shard is queried and the results merged. Every file keeps the full
+schema, so migrations and triggers run unchanged on each of them.
+
+Set FORKS_AND_FOLKS_SHARD_DIR to the directory to run sharded; catalog.db
+then becomes the default database, and services.py routes each operation
+through the functions below. Without it, every function here resolves to
+the single default database, so the services have one code path.
+
+    python3 sharding.py convert forks_and_folks.db shards/ --shards 4
+    python3 sharding.py init shards/ --shards 4
+
+Limits: the shard count is fixed when the directory is created. Signup and
+portfolio edits write the catalog and then a shard; there is no transaction
+spanning files, so a failed shard write is undone on the catalog by hand.
+Hire ids stay unique (each shard hands out ids in its own residue class)
+but are ordered only within a shard, so merged lists are in id order,
+which is nearly but not exactly the order the hires were made.
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import database
+from database import strict_connection, close_connection, execute_query, fetch_all, fetch_one, fetch_page
+from recipe_search import SEARCH_SCHEMA
+
+# Name of the catalog file and of the shard list inside a shard directory.
+CATALOG_FILE = "catalog.db"
+MANIFEST_FILE = "shards.json"
+
+# Directory of the active sharded deployment, or None for a single database.
+_directory = database.SHARD_DIR
+
+# Shard file paths, read from the manifest on first use.
+_shards = None
+
+# chef_id -> the chef's user_id; a chef never changes users, so entries never go stale.
+_chef_users = {}
+
+# Highest hire id handed out by this process, on any shard; see next_hire_id().
+_last_hire_id = 0
+
+
+# Switches sharded mode on for a shard directory, or off.
+def configure(directory):
+    """Routes user data to the shards in directory; None goes back to one database.
+
+    Turning sharding on also makes the directory's catalog the default
+    database. Turning it off leaves the default database for the caller to set.
+    """
+    global _directory, _shards
+    _directory = directory
+    _shards = None
+    _chef_users.clear()
+    if directory:
+        database.set_database_path(os.path.join(directory, CATALOG_FILE))
+
+
+# Tells whether user data is sharded.
+def enabled():
+    """Returns True when a shard directory is configured."""
+    return _directory is not None
+
+
+# Lists the shard files of the configured directory.
+def shard_paths():
+    """Returns the shard database paths, in shard order."""
+    global _shards
+    if _shards is None:
+        with open(os.path.join(_directory, MANIFEST_FILE), encoding="utf-8") as file:
+            manifest = json.load(file)
+        _shards = [os.path.join(_directory, name) for name in manifest["shards"]]
+    return _shards
+
+
+# Every database that can hold user data.
+def all_databases():
+    """Returns the shard paths, or [None] (the default database) when not sharded."""
+    return shard_paths() if enabled() else [None]
+
+
+# Finds the shard of a user.
+def user_database(user_id):
+    """Returns the shard path holding user_id, or None when not sharded."""
+    if not enabled():
+        return None
+    paths = shard_paths()
+    return paths[user_id % len(paths)]
+
+
+# Finds the shard of a chef, which also holds the hires sent to them.
+def chef_database(chef_id):
+    """Returns the shard path holding chef_id, or None when not sharded.
+
+    Raises LookupError when sharded and the catalog has no such chef.
+    """
+    if not enabled():
+        return None
+    user_id = _chef_users.get(chef_id)
+    if user_id is None:
+        conn = strict_connection()
+        try:
+            row = fetch_one(execute_query(conn, "SELECT user_id FROM Chefs WHERE chef_id = ?", (chef_id,)))
+        finally:
+            close_connection(conn)
+        if row is None:
+            raise LookupError(f"No chef with id {chef_id!r}")
+        user_id = _chef_users[chef_id] = row[0]
+    return user_database(user_id)
+
+
+# Picks the id of the next hire written to a shard.
+def next_hire_id(conn, path):
+    """Returns an unused hire id for the shard at path; call it inside the hire's transaction.
+
+    Shard i of N only hands out ids equal to i modulo N, so ids never clash
+    across shards. Starting above the highest id this process has seen on
+    any shard keeps ids from one server roughly in the order hires arrive.
+    """
+    global _last_hire_id
+    paths = shard_paths()
+    row = fetch_one(execute_query(conn, "SELECT seq FROM sqlite_sequence WHERE name = 'Chef_Hires'"))
+    candidate = max(row[0] if row else 0, _last_hire_id) + 1
+    hire_id = candidate + (paths.index(path) - candidate) % len(paths)
+    _last_hire_id = max(_last_hire_id, hire_id)
+    return hire_id
+
+
+# Runs one query on every database that holds user data.
+def gather(query, params=(), paths=None):
+    """Returns a list with the rows from each database, in shard order."""
+    results = []
+    for path in paths or all_databases():
+        conn = strict_connection(path)
+        try:
+            results.append(fetch_all(execute_query(conn, query, params)) or [])
+        finally:
+            close_connection(conn)
+    return results
+
+
+# database.fetch_page() across every shard.
+def gather_page(select, key, params=(), where=None, after=None, before=None, page_size=None):
+    """Returns (rows, has_more) like fetch_page(), with rows from all shards merged by key.
+
+    Each shard returns its own page; the merged page is the first (or, with
+    before, the last) page_size of those, and another page exists if any
+    shard had one or rows were left over. The key must be the first column.
+    """
+    pages = []
+    for path in all_databases():
+        conn = strict_connection(path)
+        try:
+            pages.append(fetch_page(conn, select, key, params, where, after, before, page_size))
+        finally:
+            close_connection(conn)
+    if len(pages) == 1:
+        return pages[0]
+    page_size = page_size or database.PAGE_SIZE
+    rows = sorted((row for shard_rows, _ in pages for row in shard_rows), key=lambda row: row[0])
+    has_more = len(rows) > page_size or any(more for _, more in pages)
+    return (rows[-page_size:] if before is not None else rows[:page_size]), has_more
+
+
+# Replaces user ids in query results with usernames from the catalog.
+def resolve_usernames(rows, column):
+    """Returns rows with the user id at index column replaced by that user's name.
+
+    Shard queries cannot join a user stored on another shard, so they
+    select the id and the names are read from the catalog directory.
+    """
+    user_ids = sorted({row[column] for row in rows})
+    if not user_ids:
+        return rows
+    placeholders = ", ".join("?" * len(user_ids))
+    conn = strict_connection()
+    try:
+        names = dict(fetch_all(execute_query(
+            conn, f"SELECT user_id, username FROM Users WHERE user_id IN ({placeholders})", user_ids)) or [])
+    finally:
+        close_connection(conn)
+    return [row[:column] + (names.get(row[column]),) + row[column + 1:] for row in rows]
+
+
+# Copies a database file consistently, even while it is in use.
+def _copy_database(source, target):
+    """Writes a copy of source to target with the SQLite backup API."""
+    source_conn = sqlite3.connect(Path(os.path.abspath(source)).as_uri() + "?mode=ro", uri=True)
+    target_conn = sqlite3.connect(target)
+    try:
+        source_conn.backup(target_conn)
+    finally:
+        target_conn.close()
+        source_conn.close()
+
+
+# Splits a single database into a catalog file and shard files.
+def convert(source, directory, count):
+    """Writes catalog.db, shard-00.db ... and shards.json into directory; returns the shard paths.
+
+    source is brought up to date first and is not changed otherwise. The
+    manifest is written last, so a directory without one is incomplete.
+    """
+    import migrations
+    if count < 1:
+        raise ValueError("The shard count must be at least 1.")
+    if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+        raise ValueError(f"{directory} already holds a sharded database.")
+    migrations.migrate(source)
+    database.close_pool(source)
+    os.makedirs(directory, exist_ok=True)
+
+    catalog = os.path.join(directory, CATALOG_FILE)
+    _copy_database(source, catalog)
+    conn = sqlite3.connect(catalog)
+    try:
+        with conn:
+            # The catalog keeps users and chefs only as a directory; the rest lives on the shards.
+            conn.execute("UPDATE Users SET password = ''")
+            conn.execute("DELETE FROM Chef_Hires")
+            conn.execute("DELETE FROM Inbox_State")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    names = [f"shard-{index:02d}.db" for index in range(count)]
+    for index, name in enumerate(names):
+        path = os.path.join(directory, name)
+        _copy_database(source, path)
+        conn = sqlite3.connect(path)
+        try:
+            with conn:
+                # Recipe counts feed the ranking; keep them before the catalog rows go.
+                recipes = conn.execute("SELECT recipes, chef_id FROM Chef_Stats").fetchall()
+                if _has_table(conn, "Recipe_Search"):
+                    # Deleted FTS5 rows leave their index data behind; an empty table takes none.
+                    conn.execute("DROP TABLE Recipe_Search")
+                    conn.execute(SEARCH_SCHEMA[0])
+                conn.execute("DELETE FROM Recipes")
+                conn.execute("DELETE FROM Ingredients")
+                conn.execute("DELETE FROM Users WHERE user_id % ? != ?", (count, index))
+                conn.execute("DELETE FROM Chefs WHERE user_id % ? != ?", (count, index))
+                conn.execute("DELETE FROM Chef_Hires WHERE chef_id NOT IN (SELECT chef_id FROM Chefs)")
+                conn.execute("DELETE FROM Inbox_State WHERE user_id % ? != ?", (count, index))
+                conn.executemany("UPDATE Chef_Stats SET recipes = ? WHERE chef_id = ?", recipes)
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as file:
+        json.dump({"shards": names}, file, indent=2)
+    return [os.path.join(directory, name) for name in names]
+
+
+# Tells whether a table exists, for optional features such as FTS5.
+def _has_table(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+# Creates a new sharded deployment with the sample data.
+def init(directory, count):
+    """Builds a fully migrated database and converts it into directory; returns the shard paths."""
+    import migrations
+    with tempfile.TemporaryDirectory() as scratch:
+        source = os.path.join(scratch, "source.db")
+        migrations.migrate(source)
+        try:
+            return convert(source, directory, count)
+        finally:
+            database.close_pool(source)
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Create a sharded Forks and Folks database directory.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    converter = commands.add_parser("convert", help="split an existing database into shards")
+    converter.add_argument("source")
+    converter.add_argument("directory")
+    converter.add_argument("--shards", type=int, default=4)
+    creator = commands.add_parser("init", help="create a new sharded database with the sample data")
+    creator.add_argument("directory")
+    creator.add_argument("--shards", type=int, default=4)
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "convert":
+            paths = convert(args.source, args.directory, args.shards)
+        else:
+            paths = init(args.directory, args.shards)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        return 2
+    finally:
+        database.close_all_pools()
+    print(f"Wrote {CATALOG_FILE} and {len(paths)} shards to {args.directory}. "
+          f"Run with FORKS_AND_FOLKS_SHARD_DIR={args.directory}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
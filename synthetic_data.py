@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+"""Deterministic synthetic data at production-like scale.
+
+Fills a database with users, chefs, recipes, ingredients and hires on top
+of the normal schema and sample data. The same seed and counts always
+produce the same rows, so benchmark runs are comparable.
+
+    python3 synthetic_data.py synthetic.db --scale 100k --seed 7
+    python3 synthetic_data.py synthetic.db --users 5000 --hires 50000
+"""
+
+import sys
+import time
+import random
+import argparse
+from itertools import islice
+from datetime import datetime, timedelta
+
+import database
+from database import create_connection, close_connection, transaction
+from migrations import migrate
+from passwords import hash_password
+from ingredient_search import normalize_ingredient, parse_ingredients
+from recipe_search import optimize_search_index
+from recipe_storage import store_instructions
+
+# Row counts per named scale; the name is roughly the size of Chef_Hires,
+# the largest table.
+SCALES = {
+    "10k": {"users": 2000, "chefs": 200, "recipes": 2000, "ingredients": 500, "hires": 10000},
+    "100k": {"users": 20000, "chefs": 2000, "recipes": 20000, "ingredients": 5000, "hires": 100000},
+    "1m": {"users": 200000, "chefs": 20000, "recipes": 200000, "ingredients": 50000, "hires": 1000000},
+}
+
+# Every synthetic user logs in with this password.
+DEFAULT_PASSWORD = "password"
+
+# Rows handed to executemany at a time.
+CHUNK_SIZE = 50000
+
+# Hire dates are spread over this many days before this date.
+HIRE_DAYS = 365
+HIRE_EPOCH = datetime(2024, 1, 1)
+
+BASE_INGREDIENTS = [
+    "rice", "beans", "lentils", "chickpeas", "flour", "sugar", "salt", "black pepper", "butter", "olive oil",
+    "eggs", "milk", "cream", "yogurt", "cheese", "chicken breast", "beef", "lamb", "pork", "tilapia",
+    "shrimp", "tofu", "onion", "garlic", "ginger", "tomato", "potato", "sweet potato", "cassava", "plantain",
+    "spinach", "kale", "cabbage", "carrot", "bell pepper", "chili", "cucumber", "avocado", "mango", "banana",
+    "lemon", "lime", "coconut milk", "peanuts", "sesame", "cumin", "coriander", "turmeric", "cinnamon", "cardamom",
+    "paprika", "thyme", "basil", "parsley", "mint", "honey", "vinegar", "soy sauce", "stock", "pasta",
+]
+QUALIFIERS = [
+    "fresh", "dried", "smoked", "roasted", "ground", "chopped", "organic", "local", "wild", "young",
+    "aged", "pickled", "toasted", "sun-dried", "frozen", "red", "green", "white", "brown", "sweet",
+]
+CUISINES = [
+    "Burundian", "Kenyan", "Rwandan", "Sudanese", "Ugandan", "Tanzanian", "Ethiopian", "Nigerian", "Ghanaian",
+    "Moroccan", "Italian", "French", "Indian", "Thai", "Japanese", "Mexican", "Lebanese", "Brazilian",
+]
+DISHES = [
+    "stew", "curry", "soup", "salad", "pilau", "skewers", "flatbread", "pasta", "risotto", "tagine",
+    "grill", "roast", "porridge", "fritters", "dumplings", "pie", "tart", "cake", "pudding", "wrap",
+]
+ADJECTIVES = [
+    "Classic", "Spicy", "Smoky", "Creamy", "Crispy", "Hearty", "Zesty", "Golden", "Rustic", "Quick",
+    "Festive", "Herbed", "Slow-cooked", "Street-style", "Grandma's", "Weeknight", "Coastal", "Highland",
+]
+STEPS = [
+    "Rinse and prepare the {a}.", "Heat oil and soften the {a}.", "Season with {b} and cook for {n} minutes.",
+    "Add the {a} and {b} and stir well.", "Simmer gently for {n} minutes.", "Bake at {t} degrees for {n} minutes.",
+    "Let rest for {n} minutes before serving.", "Garnish with {b} and serve warm.",
+]
+MARKETS = ["Kimironko Market", "Nyabugogo Market", "City Market", "Farmers' Co-op", "Corner Grocery",
+           "Supermarket", "Spice Stall", "Fish Market", "Butcher", "Bakery"]
+MESSAGES = {"accept": ["See you then!", "Happy to cook for you.", "Confirmed, looking forward to it."],
+            "decline": ["Sorry, I am fully booked.", "Not available that week.", "Unfortunately I cannot."]}
+
+
+# Resolves a named scale and explicit overrides into row counts.
+def resolve_counts(scale="10k", **overrides):
+    """Returns {users, chefs, recipes, ingredients, hires}."""
+    counts = dict(SCALES[scale])
+    counts.update({name: value for name, value in overrides.items() if value is not None})
+    if counts["chefs"] > counts["users"]:
+        raise ValueError("There cannot be more chefs than users.")
+    return counts
+
+
+# Returns the i-th synthetic ingredient name; names are unique for every i.
+def ingredient_name(i):
+    per_round = len(QUALIFIERS) * len(BASE_INGREDIENTS)
+    name = f"{QUALIFIERS[(i // len(BASE_INGREDIENTS)) % len(QUALIFIERS)]} {BASE_INGREDIENTS[i % len(BASE_INGREDIENTS)]}"
+    return name if i < per_round else f"{name} {i // per_round + 1}"
+
+
+# Inserts rows from a generator in CHUNK_SIZE batches.
+def _insert(conn, query, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == CHUNK_SIZE:
+            conn.executemany(query, batch)
+            batch = []
+    if batch:
+        conn.executemany(query, batch)
+
+
+# Returns the next id an AUTOINCREMENT table will hand out.
+def _next_id(conn, table, column):
+    # AUTOINCREMENT never reuses ids, so deleted rows still count.
+    used = conn.execute(f"SELECT MAX({column}) FROM {table}").fetchone()[0] or 0
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    return max(used, row[0] if row else 0) + 1
+
+
+# Usernames generate() gives to the i-th chef and the i-th consumer.
+def chef_username(i):
+    return f"chef{i}"
+
+
+def consumer_username(i):
+    return f"consumer{i}"
+
+
+# Fills the database at `path` with synthetic rows.
+def generate(path=None, scale="10k", seed=42, password=DEFAULT_PASSWORD, **overrides):
+    """Generates data and returns a summary with the counts, ids and timings.
+
+    Every synthetic user shares one password hash, computed once: hashing
+    each of a million passwords would take hours and measure nothing.
+    """
+    counts = resolve_counts(scale, **overrides)
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    migrate(path)
+    hashed = hash_password(password)
+    conn = create_connection(path)
+    try:
+        with transaction(conn):
+            if conn.execute("SELECT 1 FROM Users WHERE username IN (?, ?)",
+                            (chef_username(0), consumer_username(0))).fetchone():
+                raise ValueError("This database already has synthetic data; generate into a new file.")
+            first_user = _next_id(conn, "Users", "user_id")
+            chefs, consumers = counts["chefs"], counts["users"] - counts["chefs"]
+            # Chefs first, so chef user ids are first_user .. first_user + chefs - 1.
+            _insert(conn, "INSERT INTO Users (username, password, role) VALUES (?, ?, 'Chef')",
+                    ((chef_username(i), hashed) for i in range(chefs)))
+            _insert(conn, "INSERT INTO Users (username, password, role) VALUES (?, ?, 'Consumer')",
+                    ((consumer_username(i), hashed) for i in range(consumers)))
+            chef_user_ids = range(first_user, first_user + chefs)
+            consumer_ids = range(first_user + chefs, first_user + chefs + consumers)
+
+            first_chef = _next_id(conn, "Chefs", "chef_id")
+            _insert(conn, "INSERT INTO Chefs (user_id, portfolio_details) VALUES (?, ?)",
+                    ((user_id, f"Specializes in {rng.choice(CUISINES)} cuisine. {rng.randint(1, 30)} years of "
+                               f"experience, known for {rng.choice(DISHES)} and {rng.choice(DISHES)}.")
+                     for user_id in chef_user_ids))
+            chef_ids = range(first_chef, first_chef + chefs)
+
+            names = [ingredient_name(i) for i in range(counts["ingredients"])]
+            _insert(conn, "INSERT OR IGNORE INTO Ingredients (ingredient_name, location, normalized_name) VALUES (?, ?, ?)",
+                    ((name, rng.choice(MARKETS), normalize_ingredient(name)) for name in names))
+
+            # A few staples appear in most recipes, like a real catalog.
+            staples = names[:max(1, len(names) // 20)]
+
+            first_recipe = _next_id(conn, "Recipes", "recipe_id")
+
+            def recipes():
+                for i in range(counts["recipes"]):
+                    chosen = rng.sample(staples, min(len(staples), rng.randint(1, 3)))
+                    chosen += rng.sample(names, rng.randint(2, 6))
+                    steps = [rng.choice(STEPS).format(a=rng.choice(chosen), b=rng.choice(chosen),
+                                                      n=rng.randint(5, 90), t=rng.choice((160, 180, 200, 220)))
+                             for _ in range(rng.randint(3, 7))]
+                    name = f"{rng.choice(ADJECTIVES)} {rng.choice(CUISINES)} {rng.choice(DISHES)} #{i + 1}"
+                    instructions = "\n".join(f"{n}. {step}" for n, step in enumerate(steps, 1))
+                    yield ((first_recipe + i, name, ", ".join(dict.fromkeys(chosen)),
+                            rng.choice(chef_user_ids) if chefs else None), instructions)
+
+            generated = recipes()
+            while True:
+                batch = list(islice(generated, CHUNK_SIZE))
+                if not batch:
+                    break
+                conn.executemany("INSERT INTO Recipes (recipe_id, recipe_name, ingredients, chef_id) VALUES (?, ?, ?, ?)",
+                                 [row for row, _ in batch])
+                store_instructions(conn, [(row[0], instructions) for row, instructions in batch])
+            _insert(conn, "INSERT OR IGNORE INTO Recipe_Ingredients (ingredient, recipe_id) VALUES (?, ?)",
+                    ((ingredient, recipe_id)
+                     for recipe_id, text in conn.execute("SELECT recipe_id, ingredients FROM Recipes WHERE recipe_id >= ?",
+                                                         (first_recipe,)).fetchall()
+                     for ingredient in parse_ingredients(text)))
+
+            sequence = conn.execute("SELECT value FROM Hire_Sequence WHERE id = 1").fetchone()[0]
+
+            def hires():
+                nonlocal sequence
+                # Popularity follows a power law: a few chefs get most requests.
+                weights = [1 / (rank + 1) for rank in range(chefs)]
+                cumulative, total = [], 0.0
+                for weight in weights:
+                    total += weight
+                    cumulative.append(total)
+                # Chefs differ in how often they accept and how fast they answer.
+                accept_rates = {chef_id: rng.uniform(0.4, 0.95) for chef_id in chef_ids}
+                answer_hours = {chef_id: rng.choice((1, 4, 12, 24, 72)) for chef_id in chef_ids}
+                for _ in range(counts["hires"]):
+                    chef_id = rng.choices(chef_ids, cum_weights=cumulative)[0]
+                    hire_date = HIRE_EPOCH - timedelta(seconds=rng.randrange(HIRE_DAYS * 86400))
+                    response = message = change_seq = responded_at = None
+                    if rng.random() >= 0.5:
+                        response = "accept" if rng.random() < accept_rates[chef_id] else "decline"
+                        message = rng.choice(MESSAGES[response])
+                        sequence += 1
+                        change_seq = sequence
+                        delay = timedelta(hours=rng.expovariate(1 / answer_hours[chef_id]))
+                        responded_at = (hire_date + delay).strftime("%Y-%m-%d %H:%M:%S")
+                    yield (chef_id, rng.choice(consumer_ids), hire_date.strftime("%Y-%m-%d %H:%M:%S"),
+                           response, message, change_seq, responded_at)
+
+            if chefs and consumers:
+                _insert(conn, '''
+                    INSERT INTO Chef_Hires (chef_id, consumer_id, hire_date, response, message, change_seq, responded_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', hires())
+            conn.execute("UPDATE Hire_Sequence SET value = ? WHERE id = 1", (sequence,))
+            # Adding instructions after each recipe row leaves replaced entries in the index.
+            optimize_search_index(conn)
+    finally:
+        close_connection(conn)
+    return {
+        "counts": counts,
+        "seed": seed,
+        "chef_ids": [chef_ids.start, chef_ids.stop],
+        "chef_user_ids": [chef_user_ids.start, chef_user_ids.stop],
+        "consumer_ids": [consumer_ids.start, consumer_ids.stop],
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill a database with deterministic synthetic data.")
+    parser.add_argument("database")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    for name in ("users", "chefs", "recipes", "ingredients", "hires"):
+        parser.add_argument(f"--{name}", type=int, help=f"override the scale's {name} count")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = generate(args.database, args.scale, args.seed, users=args.users, chefs=args.chefs,
+                           recipes=args.recipes, ingredients=args.ingredients, hires=args.hires)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 2
+    finally:
+        database.close_all_pools()
+    counts = ", ".join(f"{value} {name}" for name, value in summary["counts"].items())
+    print(f"Generated {counts} in {summary['seconds']:.1f}s (seed {summary['seed']}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+"""Coalesces hires and chef responses into batched transactions.
+
+Callers submit writes and get a concurrent.futures.Future back. One writer
+thread takes whatever has queued up, up to WRITE_BATCH_SIZE operations, and
+runs them in a single transaction; writes that arrive while a batch commits
+form the next one, so batches grow with the load and a lone write does not
+wait. WRITE_BATCH_DELAY_MS can make the writer linger for more. Each
+operation runs in its own savepoint, so one that fails (or finds no such
+chef or hire) is rolled back alone while the rest commit.
+Futures resolve only after the batch has committed, with the same values
+services.hire_chef() and services.respond_to_hire() return.
+
+    queue = WriteQueue()
+    hire_id = queue.hire_chef(consumer_id, chef_id).result()
+    queue.close()
+"""
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+import services
+import sharding
+from database import create_connection, close_connection, transaction
+
+# Most operations committed in one transaction.
+WRITE_BATCH_SIZE = int(os.environ.get("FORKS_AND_FOLKS_WRITE_BATCH_SIZE", "256"))
+
+# How long the first write of a batch waits for others to join it, in
+# milliseconds. Waiting only pays off when commits are slower than the
+# delay; by default a batch is whatever queued up during the last commit.
+# Clients that wait for each reply can never fill a batch beyond their own
+# number, so with them any delay only adds latency (benchmarks/write_queue.py).
+WRITE_BATCH_DELAY_MS = float(os.environ.get("FORKS_AND_FOLKS_WRITE_BATCH_DELAY_MS", "0"))
+
+# Tells the writer thread to finish what is queued and stop.
+_STOP = object()
+
+
+# Runs queued write operations in batched transactions on one thread.
+class WriteQueue:
+    """A background writer for hires and responses; see the module docstring."""
+
+    def __init__(self, path=None, batch_size=WRITE_BATCH_SIZE, batch_delay_ms=WRITE_BATCH_DELAY_MS):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay_ms / 1000
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.operations = 0
+        self.failed_batches = 0
+        self.largest_batch = 0
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, function, *args):
+        """Queues function(*args, conn=batch_connection); returns a Future of its result."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("write queue is closed")
+            self._queue.put((future, function, args))
+        return future
+
+    def hire_chef(self, consumer_id, chef_id):
+        """Returns a Future of the new hire_id, or of None if there is no such chef."""
+        return self.submit(services.hire_chef, consumer_id, chef_id)
+
+    def respond_to_hire(self, hire_id, response, message, chef_id=None):
+        """Returns a Future of True if the hire was updated.
+
+        An invalid response raises ValueError here, before anything is queued.
+        """
+        if response not in services.RESPONSES:
+            raise ValueError(f"Response must be one of {', '.join(services.RESPONSES)}.")
+        return self.submit(services.respond_to_hire, hire_id, response, message, chef_id)
+
+    def stats(self):
+        """Returns counters for batches, operations and batch sizes."""
+        return {
+            "batches": self.batches,
+            "operations": self.operations,
+            "failed_batches": self.failed_batches,
+            "largest_batch": self.largest_batch,
+            "mean_batch": self.operations / self.batches if self.batches else 0.0,
+        }
+
+    def close(self):
+        """Commits everything already queued, then stops the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def _collect(self):
+        """Blocks for one operation, then gathers more until the batch is full or due."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.batch_delay
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        """Runs one batch in a transaction and resolves its futures after the commit."""
+        outcomes = []
+        conn = None
+        try:
+            conn = create_connection(self.path)
+            with transaction(conn):
+                for future, function, args in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    # The nested transaction() inside each service call is a
+                    # savepoint, so a failing operation is undone on its own.
+                    try:
+                        outcomes.append((future, True, function(*args, conn=conn)))
+                    except Exception as e:
+                        outcomes.append((future, False, e))
+        except Exception as e:
+            # No connection, or the commit itself failed: nothing in the batch was written.
+            self.failed_batches += 1
+            for future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            close_connection(conn)
+        self.batches += 1
+        self.operations += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for future, succeeded, value in outcomes:
+            if succeeded:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+# A Future that already holds value, for writes that can be answered without queueing.
+def _resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+# One WriteQueue per shard, so each shard's writes commit on their own thread.
+class ShardedWriteQueue:
+    """Routes each write to the queue of the shard it belongs to; see sharding.py.
+
+    A hire or response is written to the chef's shard, so batches on
+    different shards commit in parallel. Responses without a chef_id
+    cannot be routed and are rejected.
+    """
+
+    def __init__(self, paths, batch_size=WRITE_BATCH_SIZE, batch_delay_ms=WRITE_BATCH_DELAY_MS):
+        self.queues = {path: WriteQueue(path, batch_size, batch_delay_ms) for path in paths}
+
+    def hire_chef(self, consumer_id, chef_id):
+        """Returns a Future of the new hire_id, or of None if there is no such chef."""
+        try:
+            path = sharding.chef_database(chef_id)
+        except LookupError:
+            return _resolved(None)
+        return self.queues[path].hire_chef(consumer_id, chef_id)
+
+    def respond_to_hire(self, hire_id, response, message, chef_id=None):
+        """Returns a Future of True if the hire was updated; chef_id is required."""
+        if chef_id is None:
+            raise ValueError("A sharded write queue needs the chef_id of a response.")
+        try:
+            path = sharding.chef_database(chef_id)
+        except LookupError:
+            return _resolved(False)
+        return self.queues[path].respond_to_hire(hire_id, response, message, chef_id)
+
+    def stats(self):
+        """Returns the counters of all shard queues added together."""
+        totals = {"batches": 0, "operations": 0, "failed_batches": 0, "largest_batch": 0}
+        for write_queue in self.queues.values():
+            stats = write_queue.stats()
+            for name in ("batches", "operations", "failed_batches"):
+                totals[name] += stats[name]
+            totals["largest_batch"] = max(totals["largest_batch"], stats["largest_batch"])
+        totals["mean_batch"] = totals["operations"] / totals["batches"] if totals["batches"] else 0.0
+        return totals
+
+    def close(self):
+        """Commits everything already queued on every shard, then stops the writers."""
+        for write_queue in self.queues.values():
+            write_queue.close()
+
+
+# Builds the write queue that fits the configured database layout.
+def create_write_queue(**options):
+    """Returns a ShardedWriteQueue in sharded mode, otherwise a WriteQueue on the default database."""
+    if sharding.enabled():
+        return ShardedWriteQueue(sharding.shard_paths(), **options)
+    return WriteQueue(**options)